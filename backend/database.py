@@ -1,9 +1,13 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+import asyncio
 import os
 import certifi
+import importlib.util
 import logging
+from typing import Any, Dict, List, Optional
 from dotenv import load_dotenv
 from urllib.parse import quote_plus
+from db_monitoring import command_monitor, pool_monitor
 
 load_dotenv()
 
@@ -29,24 +33,140 @@ if not MONGODB_URL:
     else:
         MONGODB_URL = f"mongodb://{host}/{DATABASE_NAME}"
 
-async_client = AsyncIOMotorClient(MONGODB_URL, tlsCAFile=certifi.where())
-database = async_client[DATABASE_NAME]
+# ---------------------------------------------------------------------------
+# Connection pool and wire compression. Unset values keep the driver default.
+# ---------------------------------------------------------------------------
+MONGO_MAX_POOL_SIZE = os.getenv("MONGO_MAX_POOL_SIZE")
+MONGO_MIN_POOL_SIZE = os.getenv("MONGO_MIN_POOL_SIZE")
+MONGO_MAX_IDLE_TIME_MS = os.getenv("MONGO_MAX_IDLE_TIME_MS")
+MONGO_WAIT_QUEUE_TIMEOUT_MS = os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS")
+# Preference-ordered; the server picks the first one it also supports
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "zstd,snappy,zlib")
+MONGO_ZLIB_LEVEL = os.getenv("MONGO_ZLIB_LEVEL")
 
-forms_collection = database.forms
-questions_collection = database.questions
-options_collection = database.options
+# Compressors that need an optional package to be installed
+_COMPRESSOR_MODULES = {"zstd": "zstandard", "snappy": "snappy", "zlib": None}
+
+
+def available_compressors(requested: str) -> List[str]:
+    """Filter a comma-separated compressor list down to the ones usable here."""
+    compressors = []
+    for name in (c.strip().lower() for c in requested.split(",") if c.strip()):
+        if name not in _COMPRESSOR_MODULES:
+            logger.warning(f"Ignoring unknown MongoDB compressor '{name}'")
+            continue
+        module = _COMPRESSOR_MODULES[name]
+        if module and importlib.util.find_spec(module) is None:
+            logger.info(f"MongoDB compressor '{name}' unavailable ({module} not installed)")
+            continue
+        compressors.append(name)
+    return compressors
+
+
+def client_options() -> Dict[str, Any]:
+    """Keyword arguments for AsyncIOMotorClient built from the environment."""
+    options: Dict[str, Any] = {
+        "tlsCAFile": certifi.where(),
+        "event_listeners": [pool_monitor, command_monitor],
+    }
+    for key, value in [
+        ("maxPoolSize", MONGO_MAX_POOL_SIZE),
+        ("minPoolSize", MONGO_MIN_POOL_SIZE),
+        ("maxIdleTimeMS", MONGO_MAX_IDLE_TIME_MS),
+        ("waitQueueTimeoutMS", MONGO_WAIT_QUEUE_TIMEOUT_MS),
+        ("zlibCompressionLevel", MONGO_ZLIB_LEVEL),
+    ]:
+        if value not in (None, ""):
+            options[key] = int(value)
+    compressors = available_compressors(MONGO_COMPRESSORS)
+    if compressors:
+        options["compressors"] = ",".join(compressors)
+    return options
+
+
+_async_client: Optional[AsyncIOMotorClient] = None
+
+
+def get_client() -> AsyncIOMotorClient:
+    """Create the shared Motor client on first use rather than at import time."""
+    global _async_client
+    if _async_client is None:
+        options = client_options()
+        _async_client = AsyncIOMotorClient(MONGODB_URL, **options)
+        logger.info(
+            f"MongoDB client created (maxPoolSize={options.get('maxPoolSize', 'default')}, "
+            f"minPoolSize={options.get('minPoolSize', 'default')}, compressors={options.get('compressors', 'none')})"
+        )
+    return _async_client
+
+
+def get_database():
+    return get_client()[DATABASE_NAME]
+
+
+class _LazyCollection:
+    """Module-level collection handle that resolves the client on first attribute access."""
+
+    def __init__(self, name: str):
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(get_database()[self._name], attr)
+
+
+forms_collection = _LazyCollection("forms")
+questions_collection = _LazyCollection("questions")
+options_collection = _LazyCollection("options")
+# Small bookkeeping documents, e.g. the forms catalogue revision used for ETags
+counters_collection = _LazyCollection("counters")
+
+
+def pool_settings() -> Dict[str, Any]:
+    """Effective pool/compression settings, without credentials."""
+    options = client_options()
+    return {k: v for k, v in options.items() if k not in ("tlsCAFile", "event_listeners")}
+
+
+async def ensure_indexes() -> None:
+    """Create the indexes the list and per-form queries rely on (no-op if present)."""
+    await forms_collection.create_index([("created_at", -1), ("_id", -1)])
+    # Only forms stored with a fingerprint take part in upload deduplication
+    await forms_collection.create_index(
+        "fingerprint", unique=True, partialFilterExpression={"fingerprint": {"$type": "string"}}
+    )
+    await forms_collection.create_index("source_sha256", partialFilterExpression={"source_sha256": {"$type": "string"}})
+    await questions_collection.create_index([("form_id", 1), ("order", 1)])
+    await options_collection.create_index([("form_id", 1), ("order", 1), ("_id", 1)])
 
 
 async def connect_to_mongo() -> None:
     """Connect to MongoDB."""
     try:
-        await async_client.admin.command("ping")
+        await get_client().admin.command("ping")
         logger.info("Connected to MongoDB")
     except Exception as e:
         logger.error("Failed to connect to MongoDB")
         raise e
+    try:
+        await ensure_indexes()
+    except Exception as e:
+        logger.error(f"Failed to create MongoDB indexes: {e}")
+
+
+async def warm_pool() -> int:
+    """Open MONGO_MIN_POOL_SIZE connections now rather than on the first requests that need them."""
+    size = int(MONGO_MIN_POOL_SIZE or 0)
+    if size <= 0:
+        return 0
+    # Concurrent commands each check out their own connection
+    admin = get_client().admin
+    await asyncio.gather(*(admin.command("ping") for _ in range(size)))
+    return size
 
 
 async def close_mongo_connection() -> None:
     """Close MongoDB connection."""
-    async_client.close()
+    global _async_client
+    if _async_client is not None:
+        _async_client.close()
+        _async_client = None
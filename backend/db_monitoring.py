@@ -0,0 +1,131 @@
+"""
+pymongo monitoring listeners for connection-pool and command instrumentation.
+
+The driver publishes these events from its own threads, so every counter is
+guarded by a lock. Snapshots are served by GET /api/metrics/db and tell
+whether bulk-upload bursts are waiting on the pool (checkout wait time,
+connections in use, checkout timeouts) or on the server (command latency).
+"""
+
+import threading
+from typing import Any, Dict
+
+from pymongo import monitoring
+
+
+class _Timing:
+    __slots__ = ("count", "total_ms", "max_ms")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, ms: float) -> None:
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 3),
+        }
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Tracks pool size, connections in use and checkout wait time."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.open_connections = 0
+        self.in_use = 0
+        self.max_in_use = 0
+        self.checkout_failures: Dict[str, int] = {}
+        self.checkout_wait = _Timing()
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections = max(0, self.open_connections - 1)
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures[event.reason] = self.checkout_failures.get(event.reason, 0) + 1
+            if event.duration is not None:
+                self.checkout_wait.add(event.duration * 1000)
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.in_use += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+            if event.duration is not None:
+                self.checkout_wait.add(event.duration * 1000)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.in_use = max(0, self.in_use - 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "open_connections": self.open_connections,
+                "in_use": self.in_use,
+                "max_in_use": self.max_in_use,
+                "checkout_wait": self.checkout_wait.snapshot(),
+                "checkout_failures": dict(self.checkout_failures),
+            }
+
+
+class CommandMonitor(monitoring.CommandListener):
+    """Tracks per-command server round-trip latency and failures."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency: Dict[str, _Timing] = {}
+        self.failures: Dict[str, int] = {}
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        with self._lock:
+            self.latency.setdefault(event.command_name, _Timing()).add(event.duration_micros / 1000)
+
+    def failed(self, event):
+        with self._lock:
+            self.latency.setdefault(event.command_name, _Timing()).add(event.duration_micros / 1000)
+            self.failures[event.command_name] = self.failures.get(event.command_name, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                name: {**timing.snapshot(), "failures": self.failures.get(name, 0)}
+                for name, timing in sorted(self.latency.items())
+            }
+
+
+pool_monitor = PoolMonitor()
+command_monitor = CommandMonitor()
@@ -0,0 +1,59 @@
+"""
+Gunicorn settings for serving the API from several worker processes:
+
+    cd backend && gunicorn main:app -c gunicorn.conf.py
+
+Each worker is a uvicorn event loop (uvloop and httptools are used when
+installed). State that must be shared between workers is moved out of the
+processes unless already configured: rate-limit counters and upload
+progress events go to SQLite files on this host, every worker writes its
+own metrics file, which the
+master merges into metrics.txt when the worker exits. Workers also write
+registry snapshots next to it, which /metrics merges so a scrape sees all
+of them whichever worker answers.
+"""
+
+import multiprocessing
+import os
+import tempfile
+
+bind = os.getenv("BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+# Recycle workers after this many requests (0 = never), with jitter so they do not all restart at once
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") or None
+
+# Read by the workers when they import the app
+os.environ.setdefault("RATELIMIT_STORAGE_URL", f"sqlite:///{os.path.join(tempfile.gettempdir(), 'mform_rate_limits.sqlite3')}")
+os.environ.setdefault("METRICS_PER_WORKER", "true")
+# Upload progress streams may reach any worker (see services/upload_progress.py)
+os.environ.setdefault("UPLOAD_PROGRESS_PATH", os.path.join(tempfile.gettempdir(), "mform_upload_progress.sqlite3"))
+# Sizes each worker's batch process pool (see services/batch_pool.py)
+os.environ.setdefault("WEB_CONCURRENCY", str(workers))
+
+
+def on_starting(server):
+    from metrics import clear_worker_snapshots
+    from utils import merge_worker_metrics
+    # Files left behind by workers of a previous run that did not exit cleanly
+    merged = merge_worker_metrics()
+    if merged:
+        server.log.info(f"Merged {merged} metric lines left by earlier workers")
+    clear_worker_snapshots()
+
+
+def child_exit(server, worker):
+    from metrics import retire_worker_snapshot
+    from utils import merge_worker_metrics
+    merge_worker_metrics(worker.pid)
+    retire_worker_snapshot(worker.pid)
+
+
+def on_exit(server):
+    from utils import merge_worker_metrics
+    merge_worker_metrics()
@@ -0,0 +1,103 @@
+"""
+Import cost of the app, for keeping cold starts short.
+
+main.py imports this module first. It notes when the app started importing
+so the startup hook can report how long the import took and warn when it
+exceeds STARTUP_IMPORT_BUDGET_MS. With IMPORT_TIME_REPORT=true it also
+times every module imported from then on (the same numbers as
+`python -X importtime`, without restarting the interpreter with a flag),
+and startup logs the most expensive ones.
+
+Heavy libraries (pandas, and openpyxl/xlrd through it) are imported on the
+first request that parses a workbook, so the report of a normal start
+should not list them.
+"""
+
+import logging
+import os
+import sys
+import time
+from typing import Dict, List, Tuple
+
+IMPORT_TIME_REPORT = os.getenv("IMPORT_TIME_REPORT", "false").strip().lower() in ("1", "true", "yes")
+# Modules listed by the report, most expensive (self time) first
+IMPORT_TIME_REPORT_TOP = int(os.getenv("IMPORT_TIME_REPORT_TOP", "25"))
+# Warn at startup when importing the app took longer than this (0 = never)
+STARTUP_IMPORT_BUDGET_MS = float(os.getenv("STARTUP_IMPORT_BUDGET_MS", "0"))
+
+logger = logging.getLogger(__name__)
+
+_started = time.perf_counter()
+_finished = None
+# module -> (self seconds, cumulative seconds)
+_timings: Dict[str, Tuple[float, float]] = {}
+# Time spent importing children, for each import in progress
+_stack: List[float] = []
+
+
+def _timed(name: str, exec_module):
+    def exec_timed(module):
+        _stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return exec_module(module)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = _stack.pop()
+            if _stack:
+                _stack[-1] += elapsed
+            _timings[name] = (elapsed - children, elapsed)
+    return exec_timed
+
+
+class _TimingFinder:
+    """Meta path finder that defers to the real finders and times the loader they return."""
+
+    def find_spec(self, name, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is None:
+                continue
+            loader = spec.loader
+            # Built-in and frozen importers are classes shared by every module they load
+            if loader is not None and not isinstance(loader, type) and hasattr(loader, "exec_module"):
+                loader.exec_module = _timed(name, loader.exec_module)
+            return spec
+        return None
+
+
+def install() -> None:
+    if not any(isinstance(f, _TimingFinder) for f in sys.meta_path):
+        sys.meta_path.insert(0, _TimingFinder())
+
+
+def finished() -> float:
+    """Mark the app as imported; returns the import time in seconds"""
+    global _finished
+    if _finished is None:
+        _finished = time.perf_counter() - _started
+    return _finished
+
+
+def report(top: int = IMPORT_TIME_REPORT_TOP) -> List[Dict[str, float]]:
+    """Most expensive modules imported since install(), by self time"""
+    rows = sorted(_timings.items(), key=lambda item: item[1][0], reverse=True)[:top]
+    return [{"module": name, "self_ms": s * 1000, "cumulative_ms": c * 1000} for name, (s, c) in rows]
+
+
+def log_startup() -> float:
+    """Log the app's import time (and the per-module report); returns it in ms"""
+    import_ms = finished() * 1000
+    logger.info(f"App imported in {import_ms:.0f} ms")
+    if STARTUP_IMPORT_BUDGET_MS and import_ms > STARTUP_IMPORT_BUDGET_MS:
+        logger.warning(f"App import took {import_ms:.0f} ms, over the {STARTUP_IMPORT_BUDGET_MS:.0f} ms startup budget")
+    if IMPORT_TIME_REPORT:
+        lines = [f"{r['self_ms']:9.1f} {r['cumulative_ms']:9.1f}  {r['module']}" for r in report()]
+        logger.info("Import time report (self ms, cumulative ms):\n" + "\n".join(lines))
+    return import_ms
+
+
+if IMPORT_TIME_REPORT:
+    install()
@@ -1,30 +1,57 @@
-from fastapi import FastAPI, UploadFile, HTTPException, File, Request
+import import_timing
+from fastapi import FastAPI, UploadFile, HTTPException, File, Request, Query, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from starlette.datastructures import UploadFile as StarletteUploadFile
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
-from services.xlsform_parser import XLSFormParser
-from services.database_service import DatabaseService
-from models.form import FormValidation
-from database import connect_to_mongo, close_mongo_connection
+from services.form_repository import FORMS_PAGE_SIZE, get_form_repository
+from services.form_cache import form_cache
+from services.search_index import SEARCH_PAGE_SIZE, search_index
+from services.admission import LANE_BULK, LANE_INTERACTIVE, UPLOAD_REQUEST_CONCURRENCY, AdmissionRejected, admission, estimate_decoded_size, run_in_lane
+from services.upload_jobs import JOB_TIMING_KEYS, UploadJobManager
+from services.resumable_uploads import ResumableUploadError, ResumableUploadManager
+from services.batch_pool import BATCH_MAX_FILES, batch_pool, parse_workbook, validate_workbook
+from services.upload_progress import upload_progress, valid_progress_id
+from services.warmup import warmup
+from services.compression import COMPRESSION_ENCODINGS, COMPRESSION_MIN_SIZE, CompressionMiddleware, available_encodings, compression_stats, strip_etag_encoding
+from services.db_template_builder import DBTemplateBuilder
+from services.zip_batches import ZIP_MAX_FILES, ArchiveMemberError, extract_member, workbook_members
+from models.form import BatchFileValidation, FormValidation, ResumableUploadRequest
+from database import pool_settings
+from db_monitoring import command_monitor, pool_monitor
+from metrics import PROMETHEUS_CONTENT_TYPE, registry as metrics_registry
 from utils import log_metric
 import logging
 import asyncio
-from typing import List, Optional
+import hashlib
+import importlib
+import json
+import zipfile
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator, List, Optional, Tuple
 import time
 import os
-import pandas as pd
+import sys
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
+import services.rate_limit_storage  # noqa: F401 - registers sqlite:// for RATELIMIT_STORAGE_URL
+
+if TYPE_CHECKING:
+    from services.xlsform_parser import XLSFormParser
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50 MB hard limit
+MAX_FORMS_PAGE_SIZE = 1000
+# How often requests that process workbooks check whether their client is still there
+DISCONNECT_POLL_SECONDS = float(os.getenv("DISCONNECT_POLL_SECONDS", "0.5"))
 
 # ---------------------------------------------------------------------------
 # Rate limiter
 # ---------------------------------------------------------------------------
+# Counters live in RATELIMIT_STORAGE_URL (default memory://, i.e. per process)
 limiter = Limiter(key_func=get_remote_address)
 
 app = FastAPI(title="mForm Bulk Upload API")
@@ -52,6 +79,12 @@ app.add_middleware(
     max_age=600,
 )
 
+# ---------------------------------------------------------------------------
+# Response compression — br/zstd/gzip by Accept-Encoding, for complete
+# responses of COMPRESSION_MIN_SIZE bytes or more and every streamed one.
+# ---------------------------------------------------------------------------
+app.add_middleware(CompressionMiddleware)
+
 # ---------------------------------------------------------------------------
 # File-size guard — reads at most MAX_FILE_SIZE+1 bytes so huge files are
 # rejected before the parser ever touches them.
@@ -81,6 +114,61 @@ async def _check_file_size(upload: UploadFile, filename: str) -> int:
     return len(chunk)
 
 
+# ---------------------------------------------------------------------------
+# Admission control — workbooks are decoded only while the global concurrency
+# limit and memory budget allow; a full queue is answered with 503. Validate
+# and preview run in the interactive lane, uploads and updates in the bulk
+# lane, where clients (by address) take turns.
+# ---------------------------------------------------------------------------
+def _check_admission(files: int = 1, lane: str = LANE_INTERACTIVE) -> None:
+    try:
+        admission.check_queue(files, lane)
+    except AdmissionRejected as e:
+        log_metric("admission_rejected_files", files)
+        raise HTTPException(
+            status_code=503,
+            detail={
+                "error": "Server busy",
+                "message": "Too many workbooks are being processed right now. Please retry shortly.",
+                "error_type": "SERVER_BUSY",
+                "retry_after": e.retry_after,
+            },
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+
+# ---------------------------------------------------------------------------
+# Client disconnects — work for a response nobody will read is cancelled:
+# admission waits end, batch pool files not yet started are dropped, queued
+# database writes are skipped and a form written after the cancel is deleted.
+# ---------------------------------------------------------------------------
+@asynccontextmanager
+async def _cancel_on_disconnect(request: Request):
+    """Cancel the enclosed work (with 499) if the client disconnects; use after the body is read."""
+    task = asyncio.current_task()
+    disconnected = False
+
+    async def watch():
+        nonlocal disconnected
+        while not await request.is_disconnected():
+            await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+        disconnected = True
+        task.cancel()
+
+    watcher = asyncio.create_task(watch())
+    try:
+        yield
+    except asyncio.CancelledError:
+        if not disconnected:
+            raise
+        task.uncancel()
+        log_metric("disconnect_cancelled_requests", 1)
+        logger.info(f"Client disconnected; cancelled {request.method} {request.url.path}")
+        raise HTTPException(status_code=499, detail="Client closed request")
+    finally:
+        watcher.cancel()
+
+
 # ---------------------------------------------------------------------------
 # Map internal exception messages to user-friendly error details without
 # leaking stack traces, file paths, or connection strings.
@@ -123,7 +211,49 @@ def _parse_error_detail(error_message: str, filename: str) -> dict:
 
 
 # ---------------------------------------------------------------------------
-db_service = DatabaseService()
+# Conditional GET helpers. ETags are derived from revision counters that
+# the form repository maintains on every write, so a match can be answered with
+# 304 before any form, question or option document is loaded.
+# Compressed bodies carry an encoding-specific ETag (see services.compression).
+# ---------------------------------------------------------------------------
+def _etag_matches(request: Request, etag: str) -> Optional[str]:
+    """The If-None-Match validator (without W/) that matches `etag`, if any"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    for candidate in (c.strip() for c in header.split(",")):
+        if candidate == "*":
+            return etag
+        if strip_etag_encoding(candidate) == etag:
+            return candidate.removeprefix("W/")
+    return None
+
+
+def _conditional_json(request: Request, etag: str, body) -> Response:
+    """200 with `body`, or 304 (body None) echoing the representation the client holds"""
+    if body is None:
+        matched = _etag_matches(request, etag) or etag
+        return Response(status_code=304, headers={"ETag": matched, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"})
+    return JSONResponse(body, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
+# ---------------------------------------------------------------------------
+# The workbook parser pulls in pandas, which costs more to import than the
+# rest of the app together; it is loaded by the first request that needs it,
+# so a cold instance answers read-only endpoints without it. Stored forms are
+# turned into tempData by DBTemplateBuilder, which does not need pandas.
+# ---------------------------------------------------------------------------
+async def _parser() -> "XLSFormParser":
+    if "services.xlsform_parser" not in sys.modules:
+        # Import off the event loop so requests arriving meanwhile are not stalled
+        await asyncio.to_thread(importlib.import_module, "services.xlsform_parser")
+    from services.xlsform_parser import XLSFormParser
+    return XLSFormParser()
+
+
+# ---------------------------------------------------------------------------
+db_service = get_form_repository()
+db_template_builder = DBTemplateBuilder()
 
 startup_time: Optional[float] = None
 
@@ -132,20 +262,29 @@ startup_time: Optional[float] = None
 async def startup_event() -> None:
     global startup_time
     startup_time = time.time()
+    metrics_registry.start()
+    log_metric("app_import_time_ms", round(import_timing.log_startup(), 1))
     asyncio.create_task(_connect_with_log())
 
 
 async def _connect_with_log() -> None:
     try:
-        await connect_to_mongo()
+        await db_service.connect()
         log_metric("cold_startup_time", time.strftime("%Y-%m-%d %H:%M:%S"))
     except Exception:
-        logger.error("MongoDB connection failed at startup")
+        logger.error("Database connection failed at startup")
+        warmup.connect_failed()
+        return
+    # Parse a bundled workbook and open the pool before real requests need them
+    await warmup.connected(db_service, _parser)
 
 
 @app.on_event("shutdown")
 async def shutdown_event() -> None:
-    await close_mongo_connection()
+    await upload_jobs.stop()
+    batch_pool.shutdown()
+    await db_service.close()
+    await metrics_registry.stop()
 
 
 # ---------------------------------------------------------------------------
@@ -166,9 +305,11 @@ async def validate_file(request: Request, file: UploadFile = File(...)):
             options_count=0,
         )
     await _check_file_size(file, file.filename)
+    _check_admission()
     try:
-        parser = XLSFormParser()
-        validation_result = await parser.validate_file(file)
+        parser = await _parser()
+        async with _cancel_on_disconnect(request), admission.admit(estimate_decoded_size(file.size)):
+            validation_result = await parser.validate_file(file)
         return FormValidation(**validation_result)
     except HTTPException:
         raise
@@ -223,10 +364,12 @@ async def parse_file(request: Request):
         )
 
     await _check_file_size(upload, filename)
+    _check_admission()
 
     try:
-        parser = XLSFormParser()
-        result = await parser.parse_file_only(upload)
+        parser = await _parser()
+        async with _cancel_on_disconnect(request), admission.admit(estimate_decoded_size(upload.size)):
+            result = await parser.parse_file_only(upload)
 
         if isinstance(result, dict) and result.get("valid") is False:
             raise HTTPException(
@@ -250,33 +393,180 @@ async def parse_file(request: Request):
         raise HTTPException(status_code=400, detail=_parse_error_detail(error_message, filename))
 
 
-@app.post("/api/upload")
-@limiter.limit("30/minute")
-async def upload_files(request: Request, files: List[UploadFile] = File(...)):
-    """Parse and save multiple uploaded XLSForm files concurrently."""
-    parser = XLSFormParser()
+# ---------------------------------------------------------------------------
+# Batch validate / parse: many files per request, decoded on the batch worker
+# pool; per-file results come back in input order.
+# ---------------------------------------------------------------------------
+def _check_batch_size(files: List[UploadFile]) -> None:
+    if len(files) > BATCH_MAX_FILES:
+        raise HTTPException(
+            status_code=413,
+            detail={"error": "Too many files", "message": f"A batch may contain at most {BATCH_MAX_FILES} files.", "error_type": "TOO_MANY_FILES"},
+        )
+    _check_admission(len(files))
+
+
+async def _run_on_batch_pool(fn, file: UploadFile):
+    async with admission.admit(estimate_decoded_size(file.size)):
+        return await batch_pool.run(fn, await file.read(), file.filename)
 
-    async def process_file(file: UploadFile):
+
+@app.post("/api/validate/batch", response_model=List[BatchFileValidation])
+@limiter.limit("20/minute")
+async def validate_files(request: Request, files: List[UploadFile] = File(...)):
+    """Validate many Excel files in parallel; one report per file, in input order."""
+    _check_batch_size(files)
+
+    async def validate_one(file: UploadFile) -> BatchFileValidation:
+        invalid = {"valid": False, "sheets": [], "form_metadata": {}, "questions_count": 0, "options_count": 0, "file_name": file.filename}
+        if not file.filename or not file.filename.endswith((".xls", ".xlsx")):
+            return BatchFileValidation(**invalid, message="Invalid file format. Only .xls/.xlsx files are allowed.")
         try:
-            await _check_file_size(file, file.filename or "")
-            return await parser.parse_file(file)
+            await _check_file_size(file, file.filename)
+            return BatchFileValidation(**await _run_on_batch_pool(validate_workbook, file), file_name=file.filename)
         except HTTPException as exc:
-            return {"error": exc.detail, "filename": file.filename, "error_type": "FILE_ERROR"}
+            return BatchFileValidation(**invalid, message=exc.detail["message"])
         except Exception as e:
-            logger.error(f"Error processing file {file.filename}: {e}")
-            if hasattr(e, "validation_errors") and hasattr(e, "validation_warnings"):
-                return {
-                    "error": "Validation failed",
-                    "message": "File failed validation.",
-                    "error_type": "VALIDATION_ERROR",
-                    "filename": file.filename,
-                    "errors": e.validation_errors,
-                    "warnings": e.validation_warnings,
-                }
-            return {"error": "Processing failed", "filename": file.filename, "error_type": "PROCESSING_ERROR"}
+            logger.error(f"Error validating file {file.filename}: {e}")
+            return BatchFileValidation(**invalid, message="File validation failed. Check the file format and try again.")
+
+    async with _cancel_on_disconnect(request):
+        return await asyncio.gather(*(validate_one(f) for f in files))
+
+
+@app.post("/api/forms/parse/batch")
+@limiter.limit("20/minute")
+async def parse_files(request: Request, files: List[UploadFile] = File(...)):
+    """Parse many Excel files to tempData in parallel without saving; failures are returned as error objects."""
+    _check_batch_size(files)
+
+    async def parse_one(file: UploadFile):
+        filename = file.filename or ""
+        if not filename.endswith((".xls", ".xlsx")):
+            ext = filename.rsplit(".", 1)[-1] if "." in filename else "unknown"
+            return {
+                "error": "Invalid file format",
+                "message": f"Only Excel files (.xls, .xlsx) are supported. Received: '.{ext}'",
+                "error_type": "INVALID_FILE_FORMAT",
+                "file_name": filename,
+            }
+        try:
+            await _check_file_size(file, filename)
+            result = await _run_on_batch_pool(parse_workbook, file)
+        except HTTPException as exc:
+            return {**exc.detail, "file_name": filename}
+        except Exception as e:
+            logger.error(f"Error parsing file {filename}: {e}")
+            return _parse_error_detail(str(e), filename)
+        if isinstance(result, dict) and result.get("valid") is False:
+            return {
+                "error": "Validation failed",
+                "message": result.get("message", "File validation failed"),
+                "error_type": "VALIDATION_ERROR",
+                "file_name": filename,
+                "errors": result.get("errors", []),
+                "warnings": result.get("warnings", []),
+            }
+        return result
+
+    start = time.time()
+    async with _cancel_on_disconnect(request):
+        results = await asyncio.gather(*(parse_one(f) for f in files))
+    log_metric("parse_batch_time", time.time() - start)
+    return results
+
+
+async def _process_upload(parser: "XLSFormParser", file: UploadFile, dedup: Optional[bool] = None, progress=None):
+    """Parse and save one uploaded file; failures are returned as an error dict."""
+    try:
+        if progress is not None:
+            progress("size_check", "started", None)
+        start = time.time()
+        try:
+            await _check_file_size(file, file.filename or "")
+        except HTTPException:
+            if progress is not None:
+                progress("size_check", "failed", time.time() - start)
+            raise
+        if progress is not None:
+            progress("size_check", "completed", time.time() - start)
+        return await parser.parse_file(file, dedup=dedup, progress=progress)
+    except HTTPException as exc:
+        return {"error": exc.detail, "filename": file.filename, "error_type": "FILE_ERROR"}
+    except Exception as e:
+        logger.error(f"Error processing file {file.filename}: {e}")
+        if hasattr(e, "validation_errors") and hasattr(e, "validation_warnings"):
+            return {
+                "error": "Validation failed",
+                "message": "File failed validation.",
+                "error_type": "VALIDATION_ERROR",
+                "filename": file.filename,
+                "errors": e.validation_errors,
+                "warnings": e.validation_warnings,
+            }
+        return {"error": "Processing failed", "filename": file.filename, "error_type": "PROCESSING_ERROR"}
+
+
+@app.post("/api/upload")
+@limiter.limit("30/minute")
+async def upload_files(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    dedup: Optional[bool] = Query(None, description="Return the stored form for already-uploaded contents (default: UPLOAD_DEDUP)"),
+    progress_id: Optional[str] = Query(None, description="Publish per-file, per-stage progress to GET /api/upload/progress/{progress_id}"),
+):
+    """Parse and save multiple uploaded XLSForm files concurrently.
+
+    At most UPLOAD_REQUEST_CONCURRENCY files of the request are processed at
+    once, each only after global admission.
+    """
+    if progress_id is not None and not valid_progress_id(progress_id):
+        raise HTTPException(status_code=400, detail="progress_id must be 8-64 letters, digits, '-' or '_'")
+    # Only the files this request can have in flight ever wait for admission
+    concurrency = min(len(files), UPLOAD_REQUEST_CONCURRENCY)
+    _check_admission(concurrency, LANE_BULK)
+    log_metric("admission_queue_depth", admission.queue_depth())
+    client = get_remote_address(request)
+    parser = await _parser()
+    request_slots = asyncio.Semaphore(UPLOAD_REQUEST_CONCURRENCY)
+    # Forms, questions and options of the files in flight together are written
+    # together once they have all submitted (or failed).
+    write_batch = db_service.write_batch()
+
+    channel = upload_progress.start(progress_id) if progress_id else None
+    if channel is not None:
+        channel.publish("batch_started", {"total": len(files), "filenames": [f.filename for f in files]})
+
+    async def process_file(index: int, file: UploadFile):
+        async with request_slots, admission.admit(estimate_decoded_size(file.size), LANE_BULK, client):
+            if channel is None:
+                with write_batch.slot():
+                    return await _process_upload(parser, file, dedup)
+            channel.publish("file_started", {"index": index, "filename": file.filename})
+            start = time.time()
+            with write_batch.slot():
+                result = await _process_upload(
+                    parser, file, dedup,
+                    progress=lambda stage, status, seconds: channel.stage(index, file.filename, stage, status, seconds),
+                )
+            event = {"index": index, "filename": file.filename, "file_time": time.time() - start}
+            if isinstance(result, dict):
+                event.update(status="failed", error_type=result.get("error_type"))
+            else:
+                event.update(status="completed", form_id=result.id, timings={k: result.metadata[k] for k in JOB_TIMING_KEYS if k in result.metadata})
+            channel.publish("file_completed", event)
+            return result
 
     batch_start = time.time()
-    results = await asyncio.gather(*(process_file(f) for f in files))
+    results: list = []
+    try:
+        async with _cancel_on_disconnect(request):
+            with write_batch:
+                results = await asyncio.gather(*(process_file(i, f) for i, f in enumerate(files)))
+    finally:
+        if channel is not None:
+            failed = sum(1 for r in results if isinstance(r, dict))
+            channel.finish({"total": len(files), "succeeded": len(results) - failed, "failed": failed, "batch_time": time.time() - batch_start})
     batch_time = time.time() - batch_start
     log_metric("all_forms_batch_process_time", batch_time)
     log_metric("total_forms", len(files))
@@ -285,30 +575,317 @@ async def upload_files(request: Request, files: List[UploadFile] = File(...)):
     return results
 
 
+@app.get("/api/upload/progress/{progress_id}")
+@limiter.limit("120/minute")
+async def stream_upload_progress(request: Request, progress_id: str):
+    """Server-Sent Events for the /api/upload batch sent with ?progress_id=, replayed from Last-Event-ID."""
+    if not valid_progress_id(progress_id):
+        raise HTTPException(status_code=400, detail="progress_id must be 8-64 letters, digits, '-' or '_'")
+    last_event_id = request.headers.get("last-event-id", "0")
+    return StreamingResponse(
+        upload_progress.stream(progress_id, int(last_event_id) if last_event_id.isdigit() else 0),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# ---------------------------------------------------------------------------
+# ZIP batches: one archive instead of hundreds of multipart parts. Members
+# are extracted one at a time and results stream back as NDJSON, one line per
+# file as it finishes, then a summary line.
+# ---------------------------------------------------------------------------
+@app.post("/api/upload/zip")
+@limiter.limit("10/minute")
+async def upload_zip(
+    request: Request,
+    file: UploadFile = File(...),
+    dedup: Optional[bool] = Query(None, description="Return the stored form for already-uploaded contents (default: UPLOAD_DEDUP)"),
+):
+    """Parse and save every workbook in a ZIP archive, streaming one NDJSON result line per file."""
+    try:
+        archive = zipfile.ZipFile(file.file)
+    except zipfile.BadZipFile:
+        raise HTTPException(
+            status_code=400,
+            detail={"error": "Invalid archive", "message": f"'{file.filename}' is not a valid ZIP archive.", "error_type": "INVALID_ARCHIVE"},
+        )
+    members = workbook_members(archive)
+    if len(members) > ZIP_MAX_FILES:
+        raise HTTPException(
+            status_code=413,
+            detail={"error": "Too many files", "message": f"Archives may contain at most {ZIP_MAX_FILES} workbooks.", "error_type": "TOO_MANY_FILES"},
+        )
+    _check_admission(min(len(members), UPLOAD_REQUEST_CONCURRENCY), LANE_BULK)
+    client = get_remote_address(request)
+    return StreamingResponse(_zip_results(archive, members, dedup, client), media_type="application/x-ndjson")
+
+
+async def _zip_results(archive: zipfile.ZipFile, members: List[zipfile.ZipInfo], dedup: Optional[bool], client: str) -> AsyncIterator[str]:
+    parser = await _parser()
+    request_slots = asyncio.Semaphore(UPLOAD_REQUEST_CONCURRENCY)
+    write_batch = db_service.write_batch()
+
+    async def process_member(index: int, info: zipfile.ZipInfo):
+        filename = os.path.basename(info.filename)
+        async with request_slots, admission.admit(estimate_decoded_size(info.file_size), LANE_BULK, client):
+            start = time.time()
+            with write_batch.slot():
+                try:
+                    spooled = await asyncio.to_thread(extract_member, archive, info, MAX_FILE_SIZE)
+                except ArchiveMemberError as e:
+                    result = {"error": e.message, "filename": filename, "error_type": e.error_type}
+                else:
+                    with spooled:
+                        upload = UploadFile(file=spooled, filename=filename, size=info.file_size)
+                        result = await _process_upload(parser, upload, dedup)
+        line = {"type": "file", "index": index, "filename": filename, "path": info.filename}
+        if isinstance(result, dict):
+            line.update(status="failed", error=result, timings={})
+        else:
+            line.update(status="completed", form_id=result.id, timings={k: result.metadata[k] for k in JOB_TIMING_KEYS if k in result.metadata})
+        line["timings"]["file_time"] = time.time() - start
+        return line
+
+    batch_start = time.time()
+    tasks = [asyncio.ensure_future(process_member(i, info)) for i, info in enumerate(members)]
+    succeeded = 0
+    try:
+        with write_batch:
+            for next_done in asyncio.as_completed(tasks):
+                line = await next_done
+                succeeded += line["status"] == "completed"
+                yield json.dumps(line, default=str) + "\n"
+    finally:
+        # The client went away mid-stream: stop the files still waiting
+        for task in tasks:
+            task.cancel()
+
+    batch_time = time.time() - batch_start
+    log_metric("zip_batch_process_time", batch_time)
+    log_metric("total_forms", len(members))
+    summary = {
+        "type": "summary",
+        "total": len(members),
+        "succeeded": succeeded,
+        "failed": len(members) - succeeded,
+        "batch_time": batch_time,
+        "avg_file_time": batch_time / len(members) if members else 0.0,
+    }
+    yield json.dumps(summary) + "\n"
+
+
+# ---------------------------------------------------------------------------
+# Asynchronous upload jobs: POST /api/jobs answers 202 with a job id as soon
+# as the files are spooled; GET /api/jobs/{job_id} reports progress.
+# ---------------------------------------------------------------------------
+async def _precheck_job_file(file: UploadFile):
+    try:
+        await _check_file_size(file, file.filename or "")
+        return None
+    except HTTPException as exc:
+        return {"error": exc.detail, "filename": file.filename, "error_type": "FILE_ERROR"}
+
+
+async def _process_job_file(file: UploadFile):
+    # Job files wait in their own queue, so they are never rejected, only admitted
+    # in turn; all jobs share one bulk-lane turn
+    async with admission.admit(estimate_decoded_size(file.size), LANE_BULK, "upload-jobs"):
+        result = await _process_upload(await _parser(), file)
+    if isinstance(result, dict):
+        return result
+    return {"form_id": result.id, "timings": {k: result.metadata[k] for k in JOB_TIMING_KEYS if k in result.metadata}}
+
+
+upload_jobs = UploadJobManager(_process_job_file, precheck=_precheck_job_file)
+
+
+@app.post("/api/jobs", status_code=202)
+@limiter.limit("30/minute")
+async def create_upload_job(request: Request, files: List[UploadFile] = File(...)):
+    """Accept files for background parsing and return the job to poll."""
+    job = await upload_jobs.submit(files)
+    log_metric("upload_job_queue_depth", upload_jobs.queue_depth())
+    return JSONResponse(
+        status_code=202,
+        content={"job_id": job.id, "status": job.status, "total": len(job.files), "status_url": f"/api/jobs/{job.id}"},
+        headers={"Location": f"/api/jobs/{job.id}"},
+    )
+
+
+@app.get("/api/jobs/{job_id}")
+@limiter.limit("600/minute")
+async def get_upload_job(request: Request, job_id: str):
+    """Status of an upload job with per-file results and timings."""
+    status = upload_jobs.get_status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return status
+
+
+# ---------------------------------------------------------------------------
+# Resumable uploads: announce a file, PUT it in chunks at explicit offsets
+# (resuming from GET's offset after a dropped connection), then finalize to
+# verify the checksum and parse and save it like one file of /api/upload.
+# ---------------------------------------------------------------------------
+resumable_uploads = ResumableUploadManager(max_file_size=MAX_FILE_SIZE)
+
+
+def _upload_rejected(e: ResumableUploadError) -> HTTPException:
+    return HTTPException(status_code=e.status_code, detail=e.detail())
+
+
+@app.post("/api/uploads", status_code=201)
+@limiter.limit("30/minute")
+async def create_resumable_upload(request: Request, body: ResumableUploadRequest):
+    """Start a resumable upload; chunks are then PUT to the returned upload URL."""
+    try:
+        upload = resumable_uploads.create(body.filename, body.size, body.sha256)
+    except ResumableUploadError as e:
+        raise _upload_rejected(e)
+    location = f"/api/uploads/{upload['upload_id']}"
+    return JSONResponse(status_code=201, content={**upload, "upload_url": location}, headers={"Location": location})
+
+
+@app.get("/api/uploads/{upload_id}")
+@limiter.limit("600/minute")
+async def get_resumable_upload(request: Request, upload_id: str):
+    """Bytes received so far, i.e. the offset to resume from."""
+    try:
+        return resumable_uploads.status(upload_id)
+    except ResumableUploadError as e:
+        raise _upload_rejected(e)
+
+
+@app.put("/api/uploads/{upload_id}")
+@limiter.limit("600/minute")
+async def put_resumable_upload_chunk(
+    request: Request,
+    upload_id: str,
+    offset: int = Query(..., ge=0, description="Position of the chunk's first byte in the file"),
+):
+    """Write the raw request body at `offset`; an X-Chunk-SHA256 header is verified before it counts."""
+    start = time.time()
+    try:
+        status = await resumable_uploads.write_chunk(upload_id, offset, request.stream(), request.headers.get("x-chunk-sha256"))
+    except ResumableUploadError as e:
+        raise _upload_rejected(e)
+    log_metric("resumable_chunk_time", time.time() - start)
+    return status
+
+
+@app.post("/api/uploads/{upload_id}/finalize")
+@limiter.limit("30/minute")
+async def finalize_resumable_upload(
+    request: Request,
+    upload_id: str,
+    dedup: Optional[bool] = Query(None, description="Return the stored form for already-uploaded contents (default: UPLOAD_DEDUP)"),
+):
+    """Verify the assembled file and parse and save it."""
+    _check_admission(lane=LANE_BULK)
+    try:
+        async with resumable_uploads.finalize(upload_id) as upload:
+            with open(upload["path"], "rb") as fh:
+                file = UploadFile(file=fh, filename=upload["filename"], size=upload["size"])
+                async with _cancel_on_disconnect(request), admission.admit(estimate_decoded_size(file.size), LANE_BULK, get_remote_address(request)):
+                    result = await _process_upload(await _parser(), file, dedup)
+            if isinstance(result, dict) and result["error_type"] == "PROCESSING_ERROR":
+                # Raised inside the block so the upload is kept for another finalize
+                raise HTTPException(status_code=500, detail=result)
+    except ResumableUploadError as e:
+        raise _upload_rejected(e)
+    if isinstance(result, dict):
+        raise HTTPException(status_code=400, detail=result)
+    return result
+
+
+@app.delete("/api/uploads/{upload_id}")
+@limiter.limit("30/minute")
+async def delete_resumable_upload(request: Request, upload_id: str):
+    """Abandon a resumable upload and discard the bytes received."""
+    if not resumable_uploads.remove(upload_id):
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return {"message": "Upload deleted successfully"}
+
+
 @app.get("/api/forms")
 @limiter.limit("120/minute")
-async def get_all_forms(request: Request):
-    """Get all forms from the database."""
+async def get_all_forms(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_FORMS_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    """Get forms from the database.
+
+    Without `limit`/`cursor` every form is returned. With them, one keyset
+    page is returned along with `next_cursor` and an estimated `total`.
+    `fields` is a comma-separated projection for list views.
+    """
+    field_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
     try:
-        forms = await db_service.get_all_forms()
-        return {"forms": forms, "count": len(forms)}
+        revision = await db_service.get_catalogue_revision()
+        variant = hashlib.sha1(f"{limit}|{cursor}|{fields}".encode()).hexdigest()[:12]
+        etag = f'"forms-{revision}-{variant}"'
+        if _etag_matches(request, etag):
+            return _conditional_json(request, etag, None)
+
+        if limit is None and cursor is None:
+            forms = await db_service.get_all_forms(field_list, revision=revision)
+            return _conditional_json(request, etag, {"forms": forms, "count": len(forms)})
+        page = await db_service.get_forms_page(limit or FORMS_PAGE_SIZE, cursor, field_list, revision=revision)
+        total = await db_service.count_forms()
+        return _conditional_json(request, etag, {"forms": page["forms"], "count": len(page["forms"]), "total": total, "next_cursor": page["next_cursor"]})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting forms: {e}")
         raise HTTPException(status_code=500, detail="Failed to retrieve forms.")
 
 
+@app.get("/api/forms/search")
+@limiter.limit("120/minute")
+async def search_forms(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(SEARCH_PAGE_SIZE, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+):
+    """Ranked search over form titles, question titles and option labels.
+
+    Every query word must match; the last one also matches as a prefix.
+    Each hit has the form summary, its score and highlighted fields.
+    """
+    try:
+        await search_index.sync(db_service)
+        return search_index.search(q, limit, offset)
+    except Exception as e:
+        logger.error(f"Error searching forms for '{q}': {e}")
+        raise HTTPException(status_code=500, detail="Failed to search forms.")
+
+
 @app.get("/api/forms/{form_id}")
 @limiter.limit("120/minute")
 async def get_form_by_id(request: Request, form_id: str):
     """Get a specific form by ID in tempData.json format."""
-    try:
+    async def build_temp_data():
         form = await db_service.get_form_by_id(form_id)
         if not form:
             raise HTTPException(status_code=404, detail="Form not found")
-        questions = await db_service.get_questions_by_form_id(form_id)
-        options = await db_service.get_options_by_form_id(form_id)
-        parser = XLSFormParser()
-        return parser._convert_db_to_temp_data_format(form, questions, options)
+        return await db_template_builder._convert_db_stream_to_temp_data_format(
+            form,
+            db_service.iter_questions_by_form_id(form_id),
+            db_service.iter_options_by_form_id(form_id),
+        )
+
+    try:
+        revision = await db_service.get_form_revision(form_id)
+        if revision is None:
+            raise HTTPException(status_code=404, detail="Form not found")
+        etag = f'"{form_id}-{revision}"'
+        if _etag_matches(request, etag):
+            return _conditional_json(request, etag, None)
+        body = await form_cache.get_or_load(f"{form_cache.form_key(form_id)}{revision}", build_temp_data)
+        return _conditional_json(request, etag, body)
     except HTTPException:
         raise
     except Exception as e:
@@ -323,37 +900,10 @@ async def update_form(request: Request, form_id: str, file: UploadFile = File(..
     if not file.filename or not file.filename.endswith((".xls", ".xlsx")):
         raise HTTPException(status_code=400, detail="Invalid file format. Only .xls/.xlsx files are allowed.")
     await _check_file_size(file, file.filename)
+    _check_admission(lane=LANE_BULK)
     try:
-        parser = XLSFormParser()
-
-        # Validate before touching the database
-        validation_result = await parser.validate_file(file)
-        if not validation_result["valid"]:
-            raise HTTPException(
-                status_code=400,
-                detail={
-                    "error": "Validation failed",
-                    "message": validation_result.get("message", "File validation failed"),
-                    "error_type": "VALIDATION_ERROR",
-                    "errors": validation_result.get("errors", []),
-                    "warnings": validation_result.get("warnings", []),
-                },
-            )
-
-        # validate_file seeks back to 0 in its finally block; re-read for parsing
-        df_dict = pd.read_excel(file.file, sheet_name=None)
-        form_metadata = parser._parse_form_metadata(df_dict["Forms"])
-        questions_data = parser._parse_questions_data(df_dict["Questions Info"])
-        options_data = parser._parse_options_data(df_dict["Answer Options"])
-
-        success = await db_service.update_form(form_id, form_metadata, questions_data, options_data)
-        if not success:
-            raise HTTPException(status_code=500, detail="Failed to update form.")
-
-        form = await db_service.get_form_by_id(form_id)
-        questions = await db_service.get_questions_by_form_id(form_id)
-        options = await db_service.get_options_by_form_id(form_id)
-        return {"form": form, "questions": questions, "options": options, "questions_count": len(questions), "options_count": len(options)}
+        async with _cancel_on_disconnect(request), admission.admit(estimate_decoded_size(file.size), LANE_BULK, get_remote_address(request)):
+            return await _update_form(form_id, file)
     except HTTPException:
         raise
     except Exception as e:
@@ -361,18 +911,80 @@ async def update_form(request: Request, form_id: str, file: UploadFile = File(..
         raise HTTPException(status_code=500, detail="Failed to update form.")
 
 
+def _read_update_rows(parser: "XLSFormParser", file: UploadFile):
+    import pandas as pd  # already loaded by the parser
+
+    df_dict = pd.read_excel(file.file, sheet_name=None)
+    return parser._parse_rows(df_dict["Forms"], df_dict["Questions Info"], df_dict["Answer Options"])
+
+
+async def _update_form(form_id: str, file: UploadFile):
+    """Validate the workbook, then apply it to the stored form as a row diff."""
+    parser = await _parser()
+
+    # Validate before touching the database
+    validation_result = await parser.validate_file(file)
+    if not validation_result["valid"]:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "error": "Validation failed",
+                "message": validation_result.get("message", "File validation failed"),
+                "error_type": "VALIDATION_ERROR",
+                "errors": validation_result.get("errors", []),
+                "warnings": validation_result.get("warnings", []),
+            },
+        )
+
+    # validate_file seeks back to 0 in its finally block; re-read for parsing
+    (form_metadata, _), (questions_data, _), (options_data, _) = await run_in_lane(_read_update_rows, parser, file)
+
+    changes = await db_service.update_form(form_id, form_metadata, questions_data, options_data)
+    if not changes:
+        if await db_service.get_form_by_id(form_id) is None:
+            raise HTTPException(status_code=404, detail="Form not found")
+        raise HTTPException(status_code=500, detail="Failed to update form.")
+
+    form = await db_service.get_form_by_id(form_id)
+    questions = await db_service.get_questions_by_form_id(form_id)
+    options = await db_service.get_options_by_form_id(form_id)
+    return {
+        "form": form,
+        "questions": questions,
+        "options": options,
+        "questions_count": len(questions),
+        "options_count": len(options),
+        "changes": changes,
+    }
+
+
+async def _form_counts(form_id: str) -> Tuple[int, int]:
+    """Question and option counts of a form, read from its counters.
+
+    Only legacy forms stored before the counters existed need their
+    questions and options scanned.
+    """
+    form = await db_service.get_form_by_id(form_id)
+    if form is None:
+        return 0, 0
+    if "questions_count" in form and "options_count" in form:
+        return form["questions_count"], form["options_count"]
+    questions = await db_service.get_questions_by_form_id(form_id)
+    options = await db_service.get_options_by_form_id(form_id)
+    return len(questions), len(options)
+
+
 @app.delete("/api/forms/{form_id}")
 @limiter.limit("30/minute")
 async def delete_form(request: Request, form_id: str):
     """Delete a form and all related data."""
     start = time.time()
     try:
-        questions = await db_service.get_questions_by_form_id(form_id)
-        options = await db_service.get_options_by_form_id(form_id)
+        questions_count, options_count = await _form_counts(form_id)
         success = await db_service.delete_form(form_id)
         log_metric("delete_form_time", time.time() - start)
-        log_metric("deleted_questions", len(questions))
-        log_metric("deleted_options", len(options))
+        log_metric("deleted_questions", questions_count)
+        log_metric("deleted_options", options_count)
         if not success:
             raise HTTPException(status_code=404, detail="Form not found")
         return {"message": "Form deleted successfully"}
@@ -404,5 +1016,72 @@ async def delete_all_forms(request: Request):
         raise HTTPException(status_code=500, detail="Failed to delete all forms.")
 
 
+@app.get("/api/metrics/db")
+@limiter.limit("120/minute")
+async def get_db_metrics(request: Request):
+    """Connection-pool and per-command latency statistics for the MongoDB client."""
+    return {
+        "settings": pool_settings(),
+        "pool": pool_monitor.snapshot(),
+        "commands": command_monitor.snapshot(),
+    }
+
+
+
+@app.get("/api/metrics/admission")
+@limiter.limit("120/minute")
+async def get_admission_metrics(request: Request):
+    """Workbook admission: active files, estimated memory in use, queue depth and rejections."""
+    return admission.snapshot()
+
+
+@app.get("/api/metrics/compression")
+@limiter.limit("120/minute")
+async def get_compression_metrics(request: Request):
+    """Response compression per encoding: responses, bytes in/out, ratio and CPU time."""
+    return {
+        "settings": {"encodings": available_encodings(COMPRESSION_ENCODINGS), "min_size": COMPRESSION_MIN_SIZE},
+        **compression_stats.snapshot(),
+    }
+
+
+def _collect_gauges() -> None:
+    """Mirror admission and connection-pool state into gauges at scrape time"""
+    snapshot = admission.snapshot()
+    for lane, stats in snapshot["lanes"].items():
+        metrics_registry.gauge("admission_active_files", "Workbooks being processed").set(stats["active"], {"lane": lane})
+        metrics_registry.gauge("admission_waiting_files", "Workbooks waiting for admission").set(stats["queue_depth"], {"lane": lane})
+    metrics_registry.gauge("admission_memory_in_use_bytes", "Estimated decoded size of admitted workbooks").set(snapshot["memory_in_use_bytes"])
+    pool = pool_monitor.snapshot()
+    metrics_registry.gauge("db_pool_open_connections", "Open MongoDB connections").set(pool["open_connections"])
+    metrics_registry.gauge("db_pool_in_use_connections", "Checked-out MongoDB connections").set(pool["in_use"])
+
+
+metrics_registry.add_collector(_collect_gauges)
+
+
+# Not rate limited: Prometheus scrapes it
+@app.get("/metrics")
+async def get_prometheus_metrics():
+    """Every registered metric in Prometheus text format, merged across gunicorn workers."""
+    metrics_registry.collect()
+    # Reads the other workers' snapshots when there are several
+    text = await asyncio.to_thread(metrics_registry.export)
+    return Response(text, media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+# Not rate limited: load balancers poll it
+@app.get("/api/ready")
+async def get_readiness():
+    """200 once the database is connected and the post-startup warmup has finished, 503 until then."""
+    if warmup.finished and not warmup.ready:
+        await warmup.reconnect(db_service)
+    return JSONResponse(warmup.status(), status_code=200 if warmup.ready else 503)
+
+
+# Everything above counts towards the app's import time
+import_timing.finished()
+
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,473 @@
+"""
+In-memory metrics registry, flushed to metrics.txt in batches and served
+in Prometheus text format by GET /metrics.
+
+Recording a metric only updates a counter, gauge or histogram under a lock
+and appends a line to a buffer. A background task started with the app
+appends the buffered lines to metrics.txt (or the worker's own file, see
+utils.py) every METRICS_FLUSH_INTERVAL_SECONDS, on a thread, so the
+request path never waits on disk. Where no flush task runs (scripts,
+tests) the buffer is written once it holds METRICS_FLUSH_MAX_LINES lines,
+and at exit. Batch worker processes do not record at all: they hand their
+values back with each result and the API process records them (see
+services/batch_pool.py).
+
+utils.log_metric keeps working for every existing metric name: it maps the
+name to a counter, gauge or histogram (seconds, unless listed otherwise
+below) and still writes the same `[timestamp] name: value` line.
+
+Registries are per process. With several gunicorn workers
+(METRICS_PER_WORKER) every worker also writes a snapshot of its registry to
+metrics.<pid>.json in METRICS_DIR on each flush, and /metrics merges the
+snapshots of all workers, whichever of them answers the scrape: counters
+and histograms are summed, gauges keep one series per worker under a
+`worker` label. Other workers' values are at most one flush interval old.
+When a worker exits the gunicorn master folds its counters and histograms
+into metrics-exited.json and drops its gauges, so totals do not go back
+when workers are recycled.
+"""
+
+import asyncio
+import atexit
+import glob
+import json
+import logging
+import math
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import utils
+
+logger = logging.getLogger(__name__)
+
+METRICS_FLUSH_INTERVAL_SECONDS = float(os.getenv("METRICS_FLUSH_INTERVAL_SECONDS", "5"))
+# Buffered lines that trigger a flush before the interval is up
+METRICS_FLUSH_MAX_LINES = int(os.getenv("METRICS_FLUSH_MAX_LINES", "500"))
+# Lines kept when flushing cannot keep up; the oldest are dropped beyond this
+METRICS_BUFFER_MAX_LINES = int(os.getenv("METRICS_BUFFER_MAX_LINES", "20000"))
+
+PROMETHEUS_PREFIX = "mform_"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RATIO_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0)
+
+# log_metric names that are not durations in seconds
+_LEGACY_COUNTERS = {
+    "total_forms",
+    "deleted_forms",
+    "deleted_questions",
+    "deleted_options",
+    "disconnect_cancelled_requests",
+    "admission_rejected_files",
+}
+_LEGACY_GAUGES = {"admission_queue_depth", "upload_job_queue_depth", "app_import_time_ms", "warmup_time"}
+_LEGACY_BUCKETS = {"response_compression_ratio": RATIO_BUCKETS}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Optional[Dict[str, str]]) -> Labels:
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, lock: threading.Lock):
+        self.name = name
+        self.help = help
+        self._lock = lock
+
+    def _samples(self) -> Iterable[Tuple[str, Labels, float]]:
+        raise NotImplementedError
+
+    def dump(self) -> Dict[str, Any]:
+        """JSON-serialisable state, for the snapshot other workers merge"""
+        with self._lock:
+            values = [[list(map(list, labels)), value] for labels, value in self._values.items()]
+        return {"kind": self.kind, "help": self.help, "values": values}
+
+    def load(self, values: List, extra: Labels = ()) -> None:
+        """Merge values from another process's dump()"""
+        with self._lock:
+            for labels, value in values:
+                self._merge(tuple(sorted(tuple(pair) for pair in labels + list(map(list, extra)))), value)
+
+    def _merge(self, key: Labels, value) -> None:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        full = PROMETHEUS_PREFIX + self.name
+        with self._lock:
+            samples = list(self._samples())
+        lines = [f"# HELP {full} {self.help or self.name}", f"# TYPE {full} {self.kind}"]
+        lines.extend(f"{full}{suffix}{_format_labels(labels)} {_format_value(v)}" for suffix, labels, v in samples)
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, lock: threading.Lock):
+        super().__init__(name, help, lock)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, value: float = 1, labels: Optional[Dict[str, str]] = None) -> None:
+        key = _labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def value(self, labels: Optional[Dict[str, str]] = None) -> float:
+        return self._values.get(_labels(labels), 0)
+
+    def _merge(self, key: Labels, value) -> None:
+        self._values[key] = self._values.get(key, 0) + value
+
+    def _samples(self):
+        return [("_total", labels, v) for labels, v in self._values.items()]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, lock: threading.Lock):
+        super().__init__(name, help, lock)
+        self._values: Dict[Labels, float] = {}
+
+    def set(self, value: float, labels: Optional[Dict[str, str]] = None) -> None:
+        with self._lock:
+            self._values[_labels(labels)] = value
+
+    def value(self, labels: Optional[Dict[str, str]] = None) -> Optional[float]:
+        return self._values.get(_labels(labels))
+
+    def _merge(self, key: Labels, value) -> None:
+        self._values[key] = value
+
+    def _samples(self):
+        return [("", labels, v) for labels, v in self._values.items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, lock: threading.Lock, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help, lock)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> (per-bucket counts, sum, count)
+        self._values: Dict[Labels, List] = {}
+
+    def observe(self, value: float, labels: Optional[Dict[str, str]] = None) -> None:
+        key = _labels(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def dump(self) -> Dict[str, Any]:
+        with self._lock:
+            values = [[list(map(list, labels)), [list(counts), total, count]] for labels, (counts, total, count) in self._values.items()]
+        return {"kind": self.kind, "help": self.help, "values": values, "buckets": list(self.buckets)}
+
+    def _merge(self, key: Labels, value) -> None:
+        counts, total, count = value
+        state = self._values.get(key)
+        if state is None:
+            state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+        state[0] = [a + b for a, b in zip(state[0], counts)]
+        state[1] += total
+        state[2] += count
+
+    def count(self, labels: Optional[Dict[str, str]] = None) -> int:
+        state = self._values.get(_labels(labels))
+        return state[2] if state else 0
+
+    def _samples(self):
+        samples = []
+        for labels, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                samples.append(("_bucket", labels + (("le", _format_value(bound)),), cumulative))
+            samples.append(("_bucket", labels + (("le", "+Inf"),), count))
+            samples.append(("_sum", labels, total))
+            samples.append(("_count", labels, count))
+        return samples
+
+
+class MetricsRegistry:
+    """Named metrics of this process, plus the buffer of lines bound for metrics.txt."""
+
+    def __init__(self, flush_interval: float = METRICS_FLUSH_INTERVAL_SECONDS, flush_lines: int = METRICS_FLUSH_MAX_LINES):
+        self.flush_interval = flush_interval
+        self.flush_lines = flush_lines
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+        # Called at scrape time to refresh gauges mirrored from other components
+        self._collectors: List[Callable[[], None]] = []
+        self._lines: List[str] = []
+        self.dropped_lines = 0
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def _get(self, cls, name: str, help: str, **kwargs) -> _Metric:
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    metric = self._metrics[name] = cls(name, help, threading.Lock(), **kwargs)
+        if not isinstance(metric, cls):
+            raise ValueError(f"Metric '{name}' is already registered as a {metric.kind}")
+        return metric
+
+    def counter(self, name: str, help: str = "") -> Counter:
+        return self._get(Counter, name, help)
+
+    def gauge(self, name: str, help: str = "") -> Gauge:
+        return self._get(Gauge, name, help)
+
+    def histogram(self, name: str, help: str = "", buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help, buckets=buckets)
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        self._collectors.append(collector)
+
+    def collect(self) -> None:
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.error(f"Metrics collector failed: {e}")
+
+    def render_prometheus(self) -> str:
+        self.collect()
+        return self.export()
+
+    def export(self) -> str:
+        """Prometheus text of this process, or of every worker when METRICS_PER_WORKER is set"""
+        if utils.METRICS_PER_WORKER:
+            self.write_snapshot()
+            return merge_worker_snapshots().render()
+        return self.render()
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    # ---------------------------------------------------------------------------
+    # Snapshots shared between worker processes
+    # ---------------------------------------------------------------------------
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {"pid": os.getpid(), "metrics": {metric.name: metric.dump() for metric in metrics}}
+
+    def load(self, snapshot: Dict[str, Any], gauges: bool = True) -> None:
+        """Merge a snapshot() in; gauges get a `worker` label, or are skipped"""
+        extra = (("worker", str(snapshot.get("pid", ""))),)
+        for name, dump in snapshot.get("metrics", {}).items():
+            try:
+                if dump["kind"] == "counter":
+                    self.counter(name, dump["help"]).load(dump["values"])
+                elif dump["kind"] == "histogram":
+                    histogram = self.histogram(name, dump["help"], buckets=tuple(dump["buckets"]))
+                    if list(histogram.buckets) == sorted(dump["buckets"]):
+                        histogram.load(dump["values"])
+                elif dump["kind"] == "gauge" and gauges:
+                    self.gauge(name, dump["help"]).load(dump["values"], extra)
+            except (KeyError, TypeError, ValueError) as e:
+                logger.error(f"Skipping metric '{name}' of worker {snapshot.get('pid')}: {e}")
+
+    def write_snapshot(self) -> None:
+        """Replace this worker's metrics.<pid>.json with the current values"""
+        _write_json(utils.worker_snapshot_file(os.getpid()), self.snapshot())
+
+    # ---------------------------------------------------------------------------
+    # metrics.txt
+    # ---------------------------------------------------------------------------
+
+    def record_line(self, metric_name: str, value) -> None:
+        line = f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {metric_name}: {value}\n"
+        with self._lock:
+            self._lines.append(line)
+            pending = len(self._lines)
+            if pending > METRICS_BUFFER_MAX_LINES:
+                drop = pending - METRICS_BUFFER_MAX_LINES
+                del self._lines[:drop]
+                self.dropped_lines += drop
+        if pending >= self.flush_lines:
+            loop, wakeup = self._loop, self._wakeup
+            if loop is None or wakeup is None:
+                self.flush()
+            else:
+                loop.call_soon_threadsafe(wakeup.set)
+
+    def flush(self) -> int:
+        """Append buffered lines to this process's metrics file; returns lines written"""
+        if utils.METRICS_PER_WORKER:
+            try:
+                self.write_snapshot()
+            except OSError as e:
+                logger.error(f"Could not write the metrics snapshot: {e}")
+        with self._lock:
+            lines, self._lines = self._lines, []
+        if not lines:
+            return 0
+        path = utils.metrics_path()
+        try:
+            with open(path, "a") as f:
+                f.writelines(lines)
+            utils.rotate_metrics_file(path)
+        except OSError as e:
+            logger.error(f"Could not write {len(lines)} metric lines to {path}: {e}")
+            return 0
+        return len(lines)
+
+    def start(self) -> None:
+        """Flush from a background task of the running loop from now on"""
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = self._loop.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        self._loop = self._wakeup = None
+        await asyncio.to_thread(self.flush)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await asyncio.to_thread(self.flush)
+
+
+def _read_json(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path: str, data: Dict[str, Any]) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def merge_worker_snapshots() -> MetricsRegistry:
+    """A registry holding the snapshots of every worker, and of exited ones, in METRICS_DIR"""
+    merged = MetricsRegistry()
+    exited = _read_json(utils.exited_snapshot_file())
+    if exited:
+        merged.load(exited, gauges=False)
+    for path in glob.glob(utils.worker_snapshot_file("*")):
+        snapshot = _read_json(path)
+        if snapshot:
+            merged.load(snapshot)
+    return merged
+
+
+def retire_worker_snapshot(pid: int) -> None:
+    """Fold an exited worker's counters and histograms into metrics-exited.json (run by the gunicorn master)"""
+    path = utils.worker_snapshot_file(pid)
+    snapshot = _read_json(path)
+    if snapshot:
+        exited = MetricsRegistry()
+        previous = _read_json(utils.exited_snapshot_file())
+        if previous:
+            exited.load(previous, gauges=False)
+        exited.load(snapshot, gauges=False)
+        _write_json(utils.exited_snapshot_file(), {"pid": "exited", "metrics": exited.snapshot()["metrics"]})
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def clear_worker_snapshots() -> None:
+    """Forget the snapshots of a previous run (run by the gunicorn master on start)"""
+    for path in glob.glob(utils.worker_snapshot_file("*")) + [utils.exited_snapshot_file()]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+registry = MetricsRegistry()
+atexit.register(registry.flush)
+
+
+# Set in batch worker processes: values recorded there are sent back with each result
+_forwarded: Optional[List[Tuple[str, Any]]] = None
+
+
+def forward_to_parent() -> None:
+    """Keep this process's log_metric values for take_forwarded() instead of recording them"""
+    global _forwarded
+    _forwarded = []
+
+
+def take_forwarded() -> List[Tuple[str, Any]]:
+    """(name, value) pairs kept since the last call, for the parent to record"""
+    global _forwarded
+    if _forwarded is None:
+        return []
+    values, _forwarded = _forwarded, []
+    return values
+
+
+def record_legacy(metric_name: str, value) -> None:
+    """What utils.log_metric does: update the matching metric and buffer the metrics.txt line"""
+    if _forwarded is not None:
+        _forwarded.append((metric_name, value))
+        return
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        if metric_name in _LEGACY_COUNTERS:
+            registry.counter(metric_name).inc(value)
+        elif metric_name in _LEGACY_GAUGES:
+            registry.gauge(metric_name).set(value)
+        else:
+            registry.histogram(metric_name, buckets=_LEGACY_BUCKETS.get(metric_name, DEFAULT_BUCKETS)).observe(value)
+    registry.record_line(metric_name, value)
@@ -33,6 +33,9 @@ class FormValidation(BaseModel):
     errors: Optional[List[ValidationError]] = None
     warnings: Optional[List[ValidationWarning]] = None
 
+class BatchFileValidation(FormValidation):
+    file_name: Optional[str] = None
+
 class Question(BaseModel):
     type: str
     name: str
@@ -60,3 +63,8 @@ class ParsedForm(BaseModel):
     groups: List[FormGroup]
     settings: Optional[Dict[str, Any]] = None
     metadata: Optional[Dict[str, Any]] = None
+
+class ResumableUploadRequest(BaseModel):
+    filename: str
+    size: int
+    sha256: Optional[str] = None
@@ -0,0 +1,313 @@
+"""
+Admission control for workbook processing.
+
+Every workbook that is decoded holds its DataFrames in memory until it has
+been validated and saved, so the number of workbooks in flight, not the
+number of requests, is what bounds memory. AdmissionController admits
+workbooks while both a concurrency limit and a memory budget (estimated
+decoded size) allow it. Waiting files form a bounded queue; when the queue
+is full the API answers 503 with Retry-After instead of accepting work it
+cannot start.
+
+Work is scheduled in two lanes. Interactive work (validate and preview, a
+user waiting on one file) is admitted first and may use every slot; bulk
+work (uploads, jobs, updates) never holds more than
+max_concurrent - interactive_reserved slots, so a large import cannot take
+the capacity that keeps validation fast. Within the bulk lane clients take
+turns, one file each, so one client's 100-file upload does not queue
+another client's single file behind it.
+
+Admission alone only orders work; the decoding and row checks of an
+admitted workbook run on the thread pool of its lane (run_in_lane), not on
+the event loop. The bulk pool has max_concurrent - interactive_reserved
+threads, so however large an import is, validation still has threads of
+its own and the loop stays free to serve it.
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+import math
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Deque, Dict, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+# Workbooks decoded/validated/saved at the same time, across all requests
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "8"))
+# Of those, slots bulk work may never take (kept for the interactive lane)
+ADMISSION_INTERACTIVE_RESERVED = int(os.getenv("ADMISSION_INTERACTIVE_RESERVED", "2"))
+# Estimated decoded size of all admitted workbooks (0 = no memory budget)
+ADMISSION_MEMORY_BUDGET_MB = int(os.getenv("ADMISSION_MEMORY_BUDGET_MB", "1024"))
+# Files allowed to wait for admission before new work is rejected with 503
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "200"))
+# Decoded DataFrames are this many times the size of the (compressed) upload
+ADMISSION_EXPANSION = float(os.getenv("ADMISSION_EXPANSION", "10"))
+# Files of one /api/upload request processed at the same time
+UPLOAD_REQUEST_CONCURRENCY = int(os.getenv("UPLOAD_REQUEST_CONCURRENCY", "4"))
+
+LANE_INTERACTIVE = "interactive"
+LANE_BULK = "bulk"
+LANES = (LANE_INTERACTIVE, LANE_BULK)
+
+_MB = 1024 * 1024
+
+T = TypeVar("T")
+
+# Lane of the admission the current task holds; work outside admission counts as interactive
+current_lane: contextvars.ContextVar[str] = contextvars.ContextVar("admission_lane", default=LANE_INTERACTIVE)
+_executors: Dict[str, ThreadPoolExecutor] = {}
+
+
+def _lane_executor(lane: str) -> ThreadPoolExecutor:
+    executor = _executors.get(lane)
+    if executor is None:
+        workers = max(1, ADMISSION_MAX_CONCURRENT)
+        if lane == LANE_BULK:
+            workers = max(1, workers - max(0, min(ADMISSION_INTERACTIVE_RESERVED, workers - 1)))
+        executor = _executors[lane] = ThreadPoolExecutor(workers, thread_name_prefix=f"workbook-{lane}")
+    return executor
+
+
+async def run_in_lane(fn: Callable[..., T], *args: Any) -> T:
+    """Run CPU-bound workbook work (decode, row checks) on the current lane's threads"""
+    loop = asyncio.get_running_loop()
+    call = functools.partial(contextvars.copy_context().run, fn, *args)
+    return await loop.run_in_executor(_lane_executor(current_lane.get()), call)
+
+
+class AdmissionRejected(Exception):
+    """The admission queue is full; retry after `retry_after` seconds."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Server busy, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+def estimate_decoded_size(size: Optional[int]) -> int:
+    """Bytes a workbook of `size` bytes is expected to occupy once decoded"""
+    return int((size or 0) * ADMISSION_EXPANSION)
+
+
+class _Waiter:
+    __slots__ = ("cost", "lane", "client", "future")
+
+    def __init__(self, cost: int, lane: str, client: str, future: asyncio.Future):
+        self.cost = cost
+        self.lane = lane
+        self.client = client
+        self.future = future
+
+
+class _LaneStats:
+    def __init__(self):
+        self.active = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def snapshot(self, queue_depth: int) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "queue_depth": queue_depth,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "avg_wait_seconds": self.wait_total / self.admitted if self.admitted else 0.0,
+            "max_wait_seconds": self.wait_max,
+        }
+
+
+class AdmissionController:
+    """Two-lane admission under a concurrency limit and a memory budget."""
+
+    def __init__(
+        self,
+        max_concurrent: int = ADMISSION_MAX_CONCURRENT,
+        memory_budget: int = ADMISSION_MEMORY_BUDGET_MB * _MB,
+        max_queue: int = ADMISSION_MAX_QUEUE,
+        interactive_reserved: int = ADMISSION_INTERACTIVE_RESERVED,
+    ):
+        self.max_concurrent = max(1, max_concurrent)
+        self.memory_budget = memory_budget
+        self.max_queue = max_queue
+        # Bulk work always keeps at least one slot
+        self.interactive_reserved = max(0, min(interactive_reserved, self.max_concurrent - 1))
+        self._active = 0
+        self._memory = 0
+        self._interactive: Deque[_Waiter] = deque()
+        # client -> its waiting bulk files; the client served least recently goes next
+        self._bulk: Dict[str, Deque[_Waiter]] = {}
+        self._bulk_waiting = 0
+        self._grants = 0
+        self._last_served: Dict[str, int] = {}
+        self._lanes = {lane: _LaneStats() for lane in LANES}
+        # Moving average of how long an admitted file holds its slot
+        self._hold_avg = 1.0
+
+    def queue_depth(self, lane: Optional[str] = None) -> int:
+        if lane == LANE_INTERACTIVE:
+            return len(self._interactive)
+        if lane == LANE_BULK:
+            return self._bulk_waiting
+        return len(self._interactive) + self._bulk_waiting
+
+    def _free(self, lane: str) -> int:
+        """Slots work of `lane` could take right now, ignoring memory"""
+        free = self.max_concurrent - self._active
+        if lane == LANE_BULK:
+            free = min(free, self.max_concurrent - self.interactive_reserved - self._lanes[LANE_BULK].active)
+        return max(0, free)
+
+    def check_queue(self, files: int = 1, lane: str = LANE_INTERACTIVE) -> None:
+        """Raise AdmissionRejected if `files` more files would overflow the queue.
+
+        Only files that cannot start right away count against the queue.
+        """
+        free = self._free(lane) if not self.queue_depth(lane) else 0
+        if self.queue_depth() + max(0, files - free) > self.max_queue:
+            self._lanes[lane].rejected += files
+            raise AdmissionRejected(self.retry_after())
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue is expected to have drained"""
+        waves = (self.queue_depth() + self._active) / self.max_concurrent
+        return max(1, math.ceil(waves * self._hold_avg))
+
+    def _fits(self, cost: int, lane: str) -> bool:
+        if not self._free(lane):
+            return False
+        # A file bigger than the whole budget still runs, alone
+        return not self.memory_budget or self._active == 0 or self._memory + cost <= self.memory_budget
+
+    def _grant(self, cost: int, lane: str, client: str) -> None:
+        self._active += 1
+        self._memory += cost
+        self._lanes[lane].active += 1
+        self._lanes[lane].admitted += 1
+        if lane == LANE_BULK:
+            self._grants += 1
+            self._last_served[client] = self._grants
+
+    def _wake(self, waiter: _Waiter) -> None:
+        self._grant(waiter.cost, waiter.lane, waiter.client)
+        waiter.future.set_result(None)
+
+    def _dispatch(self) -> None:
+        # Interactive first, in arrival order; a large file at the head is not
+        # overtaken, not even by bulk work
+        while self._interactive:
+            waiter = self._interactive[0]
+            if waiter.future.done():
+                self._interactive.popleft()
+                continue
+            if not self._fits(waiter.cost, LANE_INTERACTIVE):
+                return
+            self._interactive.popleft()
+            self._wake(waiter)
+
+        # Then bulk, one file per client in turn
+        while self._bulk:
+            client = min(self._bulk, key=lambda c: self._last_served.get(c, 0))
+            queue = self._bulk[client]
+            waiter = queue[0]
+            if not waiter.future.done():
+                if not self._fits(waiter.cost, LANE_BULK):
+                    return
+                self._wake(waiter)
+            queue.popleft()
+            self._bulk_waiting -= 1
+            if not queue:
+                del self._bulk[client]
+        # Turns only matter between clients that are waiting
+        self._last_served.clear()
+
+    def _enqueue(self, waiter: _Waiter) -> None:
+        if waiter.lane == LANE_INTERACTIVE:
+            self._interactive.append(waiter)
+        else:
+            self._bulk.setdefault(waiter.client, deque()).append(waiter)
+            self._bulk_waiting += 1
+
+    def _dequeue(self, waiter: _Waiter) -> None:
+        # _dispatch may already have dropped it
+        if waiter.lane == LANE_INTERACTIVE:
+            if waiter in self._interactive:
+                self._interactive.remove(waiter)
+            return
+        queue = self._bulk.get(waiter.client)
+        if queue is None or waiter not in queue:
+            return
+        queue.remove(waiter)
+        self._bulk_waiting -= 1
+        if not queue:
+            del self._bulk[waiter.client]
+
+    def _release(self, cost: int, lane: str) -> None:
+        self._active -= 1
+        self._memory -= cost
+        self._lanes[lane].active -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def admit(self, cost: int, lane: str = LANE_INTERACTIVE, client: str = ""):
+        """Wait until a file of estimated decoded size `cost` may run in `lane`.
+
+        `client` identifies whose bulk work this is, for fair turns between clients.
+        """
+        if self.memory_budget:
+            cost = min(cost, self.memory_budget)
+        stats = self._lanes[lane]
+        queued_at = time.monotonic()
+        if not self.queue_depth(lane) and self._fits(cost, lane) and (lane == LANE_INTERACTIVE or not self._interactive):
+            self._grant(cost, lane, client)
+        else:
+            waiter = _Waiter(cost, lane, client, asyncio.get_running_loop().create_future())
+            self._enqueue(waiter)
+            try:
+                await waiter.future
+            except asyncio.CancelledError:
+                if waiter.future.done() and not waiter.future.cancelled():
+                    self._release(cost, lane)
+                else:
+                    self._dequeue(waiter)
+                    self._dispatch()
+                raise
+        started = time.monotonic()
+        wait = started - queued_at
+        stats.wait_total += wait
+        stats.wait_max = max(stats.wait_max, wait)
+        lane_token = current_lane.set(lane)
+        try:
+            yield
+        finally:
+            current_lane.reset(lane_token)
+            self._hold_avg = 0.8 * self._hold_avg + 0.2 * (time.monotonic() - started)
+            self._release(cost, lane)
+
+    def snapshot(self) -> Dict[str, Any]:
+        admitted = sum(s.admitted for s in self._lanes.values())
+        wait_total = sum(s.wait_total for s in self._lanes.values())
+        return {
+            "max_concurrent": self.max_concurrent,
+            "interactive_reserved": self.interactive_reserved,
+            "memory_budget_bytes": self.memory_budget,
+            "max_queue": self.max_queue,
+            "active": self._active,
+            "memory_in_use_bytes": self._memory,
+            "queue_depth": self.queue_depth(),
+            "admitted": admitted,
+            "rejected": sum(s.rejected for s in self._lanes.values()),
+            "avg_wait_seconds": wait_total / admitted if admitted else 0.0,
+            "avg_hold_seconds": self._hold_avg,
+            "bulk_clients_waiting": len(self._bulk),
+            "lanes": {lane: stats.snapshot(self.queue_depth(lane)) for lane, stats in self._lanes.items()},
+        }
+
+
+admission = AdmissionController()
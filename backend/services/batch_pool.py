@@ -0,0 +1,121 @@
+"""
+Worker processes behind /api/validate/batch and /api/forms/parse/batch.
+
+Validating or previewing a workbook is pure CPU work (decode with pandas,
+check every row, build the tempData schema) that never touches the
+database, so a batch of them is fanned out across a pool of
+BATCH_WORKERS processes instead of running one after another on the event
+loop. Workers receive the raw bytes and return the same dicts as
+XLSFormParser.validate_file / parse_file_only. BATCH_WORKERS=0 runs them
+on threads in this process instead.
+
+The parser (and pandas with it) is imported by the first workbook a worker
+handles, not when the API imports this module.
+
+Under gunicorn every API worker has its own pool, so BATCH_WORKERS defaults
+to the cores left per API worker (cpu_count // WEB_CONCURRENCY) rather than
+one per core. Metrics logged in a pool worker are sent back with its result
+and recorded by the API process, which flushes and serves them.
+"""
+
+import asyncio
+import functools
+import io
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utils import log_metric
+
+logger = logging.getLogger(__name__)
+
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", str(max(1, (os.cpu_count() or 1) // max(1, WEB_CONCURRENCY)))))
+# Files accepted by one batch request
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "50"))
+
+
+class _BytesUpload:
+    """The parts of UploadFile the parser uses, over an in-memory copy of the file."""
+
+    def __init__(self, data: bytes, filename: str):
+        self.file = io.BytesIO(data)
+        self.filename = filename
+        self.size = len(data)
+
+    async def read(self, size: int = -1) -> bytes:
+        return self.file.read(size)
+
+    async def seek(self, offset: int) -> None:
+        self.file.seek(offset)
+
+
+def validate_workbook(data: bytes, filename: str) -> Dict[str, Any]:
+    """XLSFormParser.validate_file on raw bytes (runs in a worker)"""
+    from services.xlsform_parser import XLSFormParser
+
+    return asyncio.run(XLSFormParser().validate_file(_BytesUpload(data, filename)))
+
+
+def parse_workbook(data: bytes, filename: str) -> Dict[str, Any]:
+    """XLSFormParser.parse_file_only on raw bytes (runs in a worker)"""
+    from services.xlsform_parser import XLSFormParser
+
+    return asyncio.run(XLSFormParser().parse_file_only(_BytesUpload(data, filename)))
+
+
+def _init_worker() -> None:
+    import metrics
+
+    metrics.forward_to_parent()
+
+
+def _call(fn: Callable[..., Dict[str, Any]], *args: Any) -> Tuple[Dict[str, Any], List[Tuple[str, Any]]]:
+    """Run `fn` in a worker; returns its result and the metrics it logged"""
+    import metrics
+
+    try:
+        result = fn(*args)
+    finally:
+        recorded = metrics.take_forwarded()
+    return result, recorded
+
+
+class BatchPool:
+    """Lazily started process pool, restarted if a worker dies."""
+
+    def __init__(self, workers: int = BATCH_WORKERS):
+        self.workers = max(0, workers)
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    async def run(self, fn: Callable[..., Dict[str, Any]], *args: Any) -> Dict[str, Any]:
+        if self.workers == 0:
+            return await asyncio.to_thread(fn, *args)
+        if self._executor is None:
+            # spawn: workers must not inherit the event loop or database client threads
+            self._executor = ProcessPoolExecutor(
+                self.workers, mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker
+            )
+        executor = self._executor
+        try:
+            result, recorded = await asyncio.get_running_loop().run_in_executor(executor, functools.partial(_call, fn, *args))
+        except BrokenProcessPool:
+            logger.error("Batch worker process died; restarting the pool")
+            if self._executor is executor:
+                self._executor = None
+                executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        for name, value in recorded:
+            log_metric(name, value)
+        return result
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+batch_pool = BatchPool()
@@ -0,0 +1,344 @@
+"""
+Response compression.
+
+tempData documents repeat the same keys and ObjectId wrappers for every
+question, so they shrink by an order of magnitude when compressed, and on
+slow field connections transfer time is most of the latency a user sees.
+CompressionMiddleware encodes responses with the best encoding the client
+accepts, in COMPRESSION_ENCODINGS order (br and zstd only when brotli /
+zstandard are installed, gzip always).
+
+A complete response smaller than COMPRESSION_MIN_SIZE is sent as is. Larger
+ones are compressed in one go, on a thread beyond a few hundred kilobytes so
+the event loop keeps serving. Streaming responses (NDJSON results, progress
+events) are compressed chunk by chunk and flushed after every chunk, so
+each line still reaches the client as soon as it is produced.
+
+A compressed body is a different representation from the identity one, so
+its ETag gets the encoding as a suffix ("<tag>-gzip") and every
+compressible response carries Vary: Accept-Encoding. Conditional requests
+compare validators with strip_etag_encoding().
+
+Input and output bytes and the CPU time spent compressing are counted per
+encoding and served by GET /api/metrics/compression.
+"""
+
+import asyncio
+import importlib.util
+import logging
+import os
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utils import log_metric
+
+logger = logging.getLogger(__name__)
+
+# Preference-ordered; the first one the client accepts is used
+COMPRESSION_ENCODINGS = os.getenv("COMPRESSION_ENCODINGS", "br,zstd,gzip")
+# Complete responses smaller than this are not compressed
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_LEVEL = int(os.getenv("COMPRESSION_BROTLI_LEVEL", "4"))
+COMPRESSION_ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
+
+# Complete bodies at least this large are compressed off the event loop
+_OFFLOAD_BYTES = 256 * 1024
+_COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "text/",
+)
+# Encodings that need an optional package to be installed
+_ENCODING_MODULES = {"br": "brotli", "zstd": "zstandard", "gzip": None}
+
+
+class _Gzip:
+    def __init__(self, level: int):
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._obj.flush(zlib.Z_FINISH)
+
+
+class _Brotli:
+    def __init__(self, level: int):
+        import brotli
+
+        self._obj = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.process(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush()
+
+    def finish(self) -> bytes:
+        return self._obj.finish()
+
+
+class _Zstd:
+    def __init__(self, level: int):
+        import zstandard
+
+        self._flush_block = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush(self._flush_block)
+
+    def finish(self) -> bytes:
+        return self._obj.flush()
+
+
+_COMPRESSORS: Dict[str, Tuple[Callable[[int], Any], Callable[[], int]]] = {
+    "br": (_Brotli, lambda: COMPRESSION_BROTLI_LEVEL),
+    "zstd": (_Zstd, lambda: COMPRESSION_ZSTD_LEVEL),
+    "gzip": (_Gzip, lambda: COMPRESSION_GZIP_LEVEL),
+}
+
+
+def available_encodings(requested: str) -> List[str]:
+    """Filter a comma-separated encoding list down to the ones usable here."""
+    encodings = []
+    for name in (e.strip().lower() for e in requested.split(",") if e.strip()):
+        if name not in _ENCODING_MODULES:
+            logger.warning(f"Ignoring unknown response encoding '{name}'")
+            continue
+        module = _ENCODING_MODULES[name]
+        if module and importlib.util.find_spec(module) is None:
+            logger.info(f"Response encoding '{name}' unavailable ({module} not installed)")
+            continue
+        encodings.append(name)
+    return encodings
+
+
+def choose_encoding(accept_encoding: str, encodings: List[str]) -> Optional[str]:
+    """The first of `encodings` that an Accept-Encoding header allows (q=0 refuses)"""
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name] = q
+    for encoding in encodings:
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def encode_etag(etag: bytes, encoding: str) -> bytes:
+    """The ETag of a representation compressed with `encoding`"""
+    if not etag.endswith(b'"'):
+        return etag
+    return etag[:-1] + b"-" + encoding.encode() + b'"'
+
+
+def strip_etag_encoding(etag: str) -> str:
+    """An If-None-Match candidate without its W/ prefix and encoding suffix"""
+    etag = etag.removeprefix("W/")
+    for encoding in _ENCODING_MODULES:
+        suffix = f'-{encoding}"'
+        if etag.endswith(suffix):
+            return etag[: -len(suffix)] + '"'
+    return etag
+
+
+def _with_vary(headers: List[Tuple[bytes, bytes]]) -> List[Tuple[bytes, bytes]]:
+    """Headers with Accept-Encoding added to Vary (once)"""
+    out = []
+    vary = None
+    for key, value in headers:
+        if key == b"vary":
+            vary = value
+        else:
+            out.append((key, value))
+    if vary is None:
+        vary = b"Accept-Encoding"
+    elif b"accept-encoding" not in vary.lower():
+        vary += b", Accept-Encoding"
+    out.append((b"vary", vary))
+    return out
+
+
+def _compress_whole(encoding: str, body: bytes) -> Tuple[bytes, float]:
+    """Compressed body and the CPU seconds it took (on the calling thread)"""
+    start = time.thread_time()
+    factory, level = _COMPRESSORS[encoding]
+    compressor = factory(level())
+    out = compressor.compress(body) + compressor.finish()
+    return out, time.thread_time() - start
+
+
+class CompressionStats:
+    """Bytes in/out and CPU time per encoding; updated from the loop and offload threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._encodings: Dict[str, Dict[str, float]] = {}
+        self.skipped_small = 0
+
+    def record(self, encoding: str, raw: int, compressed: int, cpu: float, streamed: bool) -> None:
+        with self._lock:
+            stats = self._encodings.setdefault(
+                encoding, {"responses": 0, "streamed": 0, "bytes_in": 0, "bytes_out": 0, "cpu_seconds": 0.0}
+            )
+            stats["responses"] += 1
+            stats["streamed"] += int(streamed)
+            stats["bytes_in"] += raw
+            stats["bytes_out"] += compressed
+            stats["cpu_seconds"] += cpu
+        if raw:
+            log_metric("response_compression_ratio", round(compressed / raw, 4))
+        log_metric("response_compression_cpu_time", cpu)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            encodings = {
+                name: {**s, "ratio": round(s["bytes_out"] / s["bytes_in"], 4) if s["bytes_in"] else None}
+                for name, s in self._encodings.items()
+            }
+            return {
+                "skipped_below_min_size": self.skipped_small,
+                "encodings": encodings,
+            }
+
+
+compression_stats = CompressionStats()
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing complete responses above a size threshold and all streamed ones."""
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = COMPRESSION_MIN_SIZE,
+        encodings: Optional[List[str]] = None,
+        stats: CompressionStats = compression_stats,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encodings = available_encodings(COMPRESSION_ENCODINGS) if encodings is None else encodings
+        self.stats = stats
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.encodings:
+            await self.app(scope, receive, send)
+            return
+        accept = ""
+        for key, value in scope["headers"]:
+            if key == b"accept-encoding":
+                accept = value.decode("latin-1")
+        encoding = choose_encoding(accept, self.encodings) if accept else None
+        await self.app(scope, receive, _CompressingSend(send, encoding, self.minimum_size, self.stats))
+
+
+class _CompressingSend:
+    """The `send` of one response, compressing its body when worthwhile (never when `encoding` is None)."""
+
+    def __init__(self, send, encoding: Optional[str], minimum_size: int, stats: CompressionStats):
+        self._send = send
+        self._encoding = encoding
+        self._minimum_size = minimum_size
+        self._stats = stats
+        self._start: Optional[Dict[str, Any]] = None
+        self._passthrough = False
+        self._compressor = None
+        self._raw = 0
+        self._compressed = 0
+        self._cpu = 0.0
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            compressible = self._compressible(message)
+            if compressible:
+                # The identity body is one of several representations too
+                message = {**message, "headers": _with_vary(message.get("headers", []))}
+            self._start = message
+            self._passthrough = not compressible or self._encoding is None
+            if self._passthrough:
+                await self._send(message)
+            return
+        if message["type"] != "http.response.body" or self._passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more = message.get("more_body", False)
+        if self._compressor is None and not more:
+            await self._send_whole(body)
+        else:
+            await self._send_chunk(body, more)
+
+    def _compressible(self, start: Dict[str, Any]) -> bool:
+        if start["status"] < 200 or start["status"] in (204, 304):
+            return False
+        content_type = ""
+        for key, value in start.get("headers", []):
+            if key == b"content-encoding":
+                return False
+            if key == b"content-type":
+                content_type = value.decode("latin-1").lower()
+        return content_type.startswith(_COMPRESSIBLE_TYPES)
+
+    def _headers(self, content_length: Optional[int]) -> List[Tuple[bytes, bytes]]:
+        headers = []
+        for key, value in self._start.get("headers", []):
+            if key == b"content-length":
+                continue
+            if key == b"etag":
+                value = encode_etag(value, self._encoding)
+            headers.append((key, value))
+        headers.append((b"content-encoding", self._encoding.encode()))
+        if content_length is not None:
+            headers.append((b"content-length", str(content_length).encode()))
+        return headers
+
+    async def _send_whole(self, body: bytes) -> None:
+        if len(body) < self._minimum_size:
+            self._stats.skipped_small += 1
+            await self._send(self._start)
+            await self._send({"type": "http.response.body", "body": body})
+            return
+        if len(body) >= _OFFLOAD_BYTES:
+            compressed, cpu = await asyncio.to_thread(_compress_whole, self._encoding, body)
+        else:
+            compressed, cpu = _compress_whole(self._encoding, body)
+        self._stats.record(self._encoding, len(body), len(compressed), cpu, streamed=False)
+        await self._send({**self._start, "headers": self._headers(len(compressed))})
+        await self._send({"type": "http.response.body", "body": compressed})
+
+    async def _send_chunk(self, body: bytes, more: bool) -> None:
+        if self._compressor is None:
+            await self._send({**self._start, "headers": self._headers(None)})
+            factory, level = _COMPRESSORS[self._encoding]
+            self._compressor = factory(level())
+        start = time.thread_time()
+        # Flush every chunk so a streamed line is not held back in the compressor
+        out = self._compressor.compress(body) + (self._compressor.flush() if more else self._compressor.finish())
+        self._cpu += time.thread_time() - start
+        self._raw += len(body)
+        self._compressed += len(out)
+        await self._send({"type": "http.response.body", "body": out, "more_body": more})
+        if not more:
+            self._stats.record(self._encoding, self._raw, self._compressed, self._cpu, streamed=True)
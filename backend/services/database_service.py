@@ -1,11 +1,136 @@
-from typing import List, Dict, Any, Optional
+from typing import AsyncIterator, List, Dict, Any, Optional, Sequence
 from bson import ObjectId
-from database import forms_collection, questions_collection, options_collection
+from pymongo import DeleteMany, InsertOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+from database import (
+    close_mongo_connection,
+    connect_to_mongo,
+    counters_collection,
+    forms_collection,
+    options_collection,
+    questions_collection,
+    warm_pool,
+)
+from services.form_cache import form_cache
+from services.form_schema import (
+    FormLayout,
+    child_form_id,
+    decode_option,
+    decode_question,
+    encode_rows,
+    layout_of,
+    new_layout,
+    pack_options,
+    stamp_form,
+    unpack_options,
+)
+from services.form_repository import (  # noqa: F401 - cursor helpers re-exported for existing imports
+    FORM_CHANGES_KEPT,
+    FORMS_PAGE_SIZE,
+    OPTION_DIFF_FIELDS,
+    DuplicateFormError,
+    QUESTION_DIFF_FIELDS,
+    FormRepository,
+    changed_form_ids,
+    counter_increments,
+    decode_forms_cursor,
+    diff_rows,
+    encode_forms_cursor,
+    form_counters,
+    option_key,
+    question_key,
+    validate_field_names,
+)
+from services.write_coalescer import WriteBatch, WriteCoalescer
+from datetime import datetime, timezone
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
-class DatabaseService:
+# Documents per getMore when streaming a form's questions/options
+STREAM_BATCH_SIZE = int(os.getenv("MONGO_STREAM_BATCH_SIZE", "1000"))
+# update_form re-reads a form this many times when it changes (e.g. is migrated) underneath
+_UPDATE_ATTEMPTS = 3
+
+# Shared by every DatabaseService instance so that files parsed by separate
+# XLSFormParser instances still land in the same bulk writes.
+_write_coalescer: Optional[WriteCoalescer] = None
+
+
+def get_write_coalescer() -> WriteCoalescer:
+    global _write_coalescer
+    if _write_coalescer is None:
+        _write_coalescer = WriteCoalescer(
+            forms_collection, questions_collection, options_collection, after_flush=bump_catalogue_revision
+        )
+    return _write_coalescer
+
+
+async def bump_catalogue_revision(form_ids: Optional[List[Any]]) -> None:
+    """Advance the revision that GET /api/forms derives its ETag from.
+
+    The forms written (None = possibly all of them) are logged under the new
+    revision in the same update, for get_form_changes. Errors are raised:
+    a write whose bump failed must fail, or clients holding the old ETag
+    would keep getting 304 for a catalogue that has changed.
+    """
+    change = {"revision": "$revision", "form_ids": None if form_ids is None else [str(i) for i in form_ids]}
+    try:
+        await counters_collection.update_one(
+            {"_id": "forms"},
+            [
+                {"$set": {"revision": {"$add": [{"$ifNull": ["$revision", 0]}, 1]}}},
+                {"$set": {"changes": {"$slice": [{"$concatArrays": [{"$ifNull": ["$changes", []]}, [change]]}, -FORM_CHANGES_KEPT]}}},
+            ],
+            upsert=True,
+        )
+    except Exception as e:
+        logger.error(f"Error bumping forms catalogue revision: {e}")
+        raise
+
+
+def _utc_now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _normalize_form(form: Dict[str, Any]) -> Dict[str, Any]:
+    """Fill in defaults for legacy form documents and expose _id as id"""
+    if 'version' not in form or form['version'] in (None, ''):
+        form['version'] = '1.0.0'
+    if 'created_at' not in form or form['created_at'] in (None, ''):
+        try:
+            form['created_at'] = form['_id'].generation_time.isoformat()
+        except Exception:
+            pass
+    form['id'] = str(form['_id'])
+    del form['_id']
+    form.pop('schema_version', None)
+    form.pop('options_packed', None)
+    return form
+
+
+def _is_fingerprint_conflict(error: BulkWriteError, fingerprint: Optional[str]) -> bool:
+    """True if a bulk write failed on the unique fingerprint index for this fingerprint"""
+    if not fingerprint:
+        return False
+    return any(
+        write_error.get('code') == 11000 and (write_error.get('keyValue') or {}).get('fingerprint') == fingerprint
+        for write_error in error.details.get('writeErrors', [])
+    )
+
+
+class DatabaseService(FormRepository):
+    """FormRepository on MongoDB (Motor)."""
+
+    async def connect(self) -> None:
+        await connect_to_mongo()
+
+    async def close(self) -> None:
+        await close_mongo_connection()
+
+    async def warm_pool(self) -> int:
+        return await warm_pool()
 
     async def save_form(self, form_data: Dict[str, Any]) -> str:
         """Save form metadata to database"""
@@ -14,8 +139,14 @@ class DatabaseService:
                 del form_data['id']
 
             form_data['_id'] = ObjectId()
+            form_data['revision'] = 1
+            form_data['updated_at'] = _utc_now()
+            form_data.update(form_counters([], []))
+            stamp_form(form_data, new_layout([], []))
 
             result = await forms_collection.insert_one(form_data)
+            form_cache.invalidate_lists()
+            await bump_catalogue_revision([result.inserted_id])
             logger.info(f"Form saved with ID: {result.inserted_id}")
             return str(result.inserted_id)
         except Exception as e:
@@ -27,10 +158,14 @@ class DatabaseService:
         try:
             if not questions:
                 return []
+            layout = await self._form_layout(form_id)
             for question in questions:
-                question['form_id'] = form_id
                 question['_id'] = ObjectId()
+                if layout.packed:
+                    question.setdefault('options', [])
+            encode_rows(form_id, layout, questions, [])
             result = await questions_collection.insert_many(questions)
+            await self._touch_form(form_id, counter_increments(questions, []))
             logger.info(f"Saved {len(questions)} questions for form {form_id}")
             return [str(oid) for oid in result.inserted_ids]
         except Exception as e:
@@ -42,84 +177,224 @@ class DatabaseService:
         try:
             if not options:
                 return []
-            for option in options:
-                option['form_id'] = form_id
-                option['_id'] = ObjectId()
-            result = await options_collection.insert_many(options)
+            layout = await self._form_layout(form_id)
+            if layout.packed:
+                option_ids = await self._push_packed_options(form_id, options)
+            else:
+                for option in options:
+                    option['_id'] = ObjectId()
+                encode_rows(form_id, layout, [], options)
+                result = await options_collection.insert_many(options)
+                option_ids = [str(oid) for oid in result.inserted_ids]
+            if option_ids:
+                await self._touch_form(form_id, {"options_count": len(option_ids)})
             logger.info(f"Saved {len(options)} options for form {form_id}")
-            return [str(oid) for oid in result.inserted_ids]
+            return option_ids
         except Exception as e:
             logger.error(f"Error saving options: {e}")
             raise e
 
+    async def _push_packed_options(self, form_id: str, options: List[Dict[str, Any]]) -> List[str]:
+        """Append options to the arrays of their (packed) question documents"""
+        ids: List[str] = []
+        for order, pairs in pack_options(options).items():
+            question = await questions_collection.find_one_and_update(
+                {"form_id": ObjectId(form_id), "order": order},
+                {"$push": {"options": {"$each": pairs}}},
+                projection={"order": 1, "options": 1},
+                return_document=ReturnDocument.AFTER,
+            )
+            if question is None:
+                logger.warning(f"Dropping {len(pairs)} options without a question from packed form {form_id}")
+                continue
+            ids.extend([o['id'] for o in unpack_options(question, form_id)][-len(pairs):])
+        return ids
+
+    def write_batch(self) -> WriteBatch:
+        """Group the writes of files processed together into shared bulk writes"""
+        return get_write_coalescer().batch()
+
+    async def save_form_bundle(self, form_data: Dict[str, Any], questions: List[Dict[str, Any]], options: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Save a form with its questions and options through the write coalescer.
+
+        Either all three are stored or none are. Documents use the layout from
+        MONGO_SCHEMA_VERSION / MONGO_PACK_OPTIONS. Returns the new ids and the
+        per-stage timings of the bulk write that stored them.
+        """
+        if 'id' in form_data:
+            del form_data['id']
+        form_data['_id'] = ObjectId()
+        form_data['revision'] = 1
+        form_data['updated_at'] = _utc_now()
+        form_id = str(form_data['_id'])
+        form_data.update(form_counters(questions, options))
+        layout = new_layout(questions, options)
+        stamp_form(form_data, layout)
+        for row in (*questions, *options):
+            row['_id'] = ObjectId()
+        option_count = len(options)
+        question_docs, option_docs = encode_rows(form_id, layout, questions, options)
+        if layout.packed:
+            option_ids = [o['id'] for q in question_docs for o in unpack_options(q, form_id)]
+        else:
+            option_ids = [str(o['_id']) for o in option_docs]
+
+        try:
+            timings = await get_write_coalescer().submit(form_data, question_docs, option_docs)
+        except BulkWriteError as e:
+            if _is_fingerprint_conflict(e, form_data.get('fingerprint')):
+                raise DuplicateFormError(form_data['fingerprint']) from e
+            raise
+        finally:
+            # Also after a failure: a rolled-back form may briefly have been visible
+            form_cache.invalidate_lists()
+        logger.info(f"Form saved with ID: {form_id} ({len(questions)} questions, {option_count} options)")
+        return {
+            "form_id": form_id,
+            "question_ids": [str(q['_id']) for q in question_docs],
+            "option_ids": option_ids,
+            **timings,
+        }
+
+    async def _form_layout(self, form_id: str) -> FormLayout:
+        """Document layout of a form's questions/options (legacy if the form is missing)"""
+        form = await forms_collection.find_one({"_id": ObjectId(form_id)}, {"schema_version": 1, "options_packed": 1})
+        return layout_of(form)
+
+    async def _touch_form(self, form_id: str, increments: Optional[Dict[str, int]] = None) -> None:
+        """Record a change to a form's contents: bump its revision (and counters) and drop cached reads"""
+        await forms_collection.update_one(
+            {"_id": ObjectId(form_id)}, {"$inc": {"revision": 1, **(increments or {})}, "$set": {"updated_at": _utc_now()}}
+        )
+        form_cache.invalidate_form(form_id)
+        await bump_catalogue_revision([form_id])
+
+    async def get_form_revision(self, form_id: str) -> Optional[int]:
+        """Get a form's revision without loading it; None if the form does not exist"""
+        try:
+            form = await forms_collection.find_one({"_id": ObjectId(form_id)}, {"revision": 1})
+            if form is None:
+                return None
+            return int(form.get('revision', 0))
+        except Exception as e:
+            logger.error(f"Error getting form revision: {e}")
+            return None
+
+    async def get_catalogue_revision(self) -> int:
+        """Revision of the forms catalogue, advanced by every form write"""
+        counter = await counters_collection.find_one({"_id": "forms"}, {"revision": 1})
+        return int(counter.get('revision', 0)) if counter else 0
+
+    async def get_form_changes(self, since: int) -> Optional[List[str]]:
+        """Ids of the forms written after catalogue revision `since` (None if no longer logged)"""
+        counter = await counters_collection.find_one({"_id": "forms"}, {"revision": 1, "changes": 1})
+        if not counter:
+            return [] if since == 0 else None
+        changes = [(c.get("revision"), c.get("form_ids")) for c in counter.get("changes") or []]
+        return changed_form_ids(changes, since, int(counter.get("revision", 0)))
+
+    async def find_form_by_fingerprint(self, fingerprint: Optional[str] = None, source_sha256: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Find a stored form by upload fingerprint or raw-file hash"""
+        clauses = []
+        if fingerprint:
+            clauses.append({"fingerprint": fingerprint})
+        if source_sha256:
+            clauses.append({"source_sha256": source_sha256})
+        if not clauses:
+            return None
+        # Prefer the original over copies stored without a fingerprint
+        form = await forms_collection.find_one(
+            {"$or": clauses},
+            {"title": 1, "version": 1, "language": 1, "created_at": 1, "questions_count": 1, "options_count": 1},
+            sort=[("fingerprint", -1), ("_id", 1)]
+        )
+        return _normalize_form(form) if form else None
+
     async def get_form_by_id(self, form_id: str) -> Optional[Dict[str, Any]]:
         """Get form by ID"""
         try:
             form = await forms_collection.find_one({"_id": ObjectId(form_id)})
             if form:
-                if 'version' not in form or form['version'] in (None, ''):
-                    form['version'] = '1.0.0'
-                if 'created_at' not in form or form['created_at'] in (None, ''):
-                    try:
-                        form['created_at'] = form['_id'].generation_time.isoformat()
-                    except Exception:
-                        pass
-                form['id'] = str(form['_id'])
-                del form['_id']
+                _normalize_form(form)
             return form
         except Exception as e:
             logger.error(f"Error getting form: {e}")
             return None
 
-    async def get_questions_by_form_id(self, form_id: str) -> List[Dict[str, Any]]:
-        """Get all questions for a form"""
-        try:
-            questions = await questions_collection.find({"form_id": form_id}).to_list(length=10000)
-            for question in questions:
-                question['id'] = str(question['_id'])
-                del question['_id']
-            return questions
-        except Exception as e:
-            logger.error(f"Error getting questions: {e}")
-            return []
+    async def iter_questions_by_form_id(self, form_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """Stream all questions for a form, sorted by order"""
+        layout = await self._form_layout(form_id)
+        projection = {"options": 0} if layout.packed else None
+        cursor = questions_collection.find({"form_id": child_form_id(form_id, layout)}, projection).sort("order", 1).batch_size(STREAM_BATCH_SIZE)
+        async for question in cursor:
+            yield decode_question(question, form_id)
 
-    async def get_options_by_form_id(self, form_id: str) -> List[Dict[str, Any]]:
-        """Get all options for a form"""
-        try:
-            options = await options_collection.find({"form_id": form_id}).to_list(length=10000)
-            for option in options:
-                option['id'] = str(option['_id'])
-                del option['_id']
-            return options
-        except Exception as e:
-            logger.error(f"Error getting options: {e}")
-            return []
+    async def iter_options_by_form_id(self, form_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """Stream all options for a form, sorted by order (then insertion order)"""
+        layout = await self._form_layout(form_id)
+        stored_form_id = child_form_id(form_id, layout)
+        if layout.packed:
+            cursor = questions_collection.find({"form_id": stored_form_id}, {"order": 1, "options": 1}).sort("order", 1).batch_size(STREAM_BATCH_SIZE)
+            async for question in cursor:
+                for option in unpack_options(question, form_id):
+                    yield option
+            return
+        cursor = options_collection.find({"form_id": stored_form_id}).sort([("order", 1), ("_id", 1)]).batch_size(STREAM_BATCH_SIZE)
+        async for option in cursor:
+            yield decode_option(option, form_id)
+
+    async def _load_forms_page(self, limit: int, cursor: Optional[str], fields: Optional[Sequence[str]]) -> Dict[str, Any]:
+        query: Dict[str, Any] = {}
+        if cursor:
+            created_at, form_oid = decode_forms_cursor(cursor)
+            if created_at is None:
+                # Forms without created_at sort last; only older ones of those remain
+                query = {"created_at": None, "_id": {"$lt": form_oid}}
+            else:
+                query = {"$or": [
+                    {"created_at": {"$lt": created_at}},
+                    {"created_at": created_at, "_id": {"$lt": form_oid}},
+                    {"created_at": None},
+                ]}
+
+        projection = None
+        if fields:
+            validate_field_names(fields)
+            projection = {f: 1 for f in fields}
+            projection['created_at'] = 1
 
-    async def get_all_forms(self) -> List[Dict[str, Any]]:
-        """Get all forms, sorted by created_at descending"""
+        docs = await forms_collection.find(query, projection).sort([("created_at", -1), ("_id", -1)]).limit(limit + 1).to_list(length=limit + 1)
+        next_cursor = None
+        if len(docs) > limit:
+            docs = docs[:limit]
+            next_cursor = encode_forms_cursor(docs[-1].get('created_at'), docs[-1]['_id'])
+
+        forms = []
+        for form in docs:
+            _normalize_form(form)
+            if fields:
+                form = {k: v for k, v in form.items() if k == 'id' or k in fields}
+            forms.append(form)
+        return {"forms": forms, "next_cursor": next_cursor}
+
+    async def count_forms(self) -> int:
+        """Cheap total form count from collection metadata"""
         try:
-            forms = await forms_collection.find().sort("created_at", -1).to_list(length=10000)
-            for form in forms:
-                if 'version' not in form or form['version'] in (None, ''):
-                    form['version'] = '1.0.0'
-                if 'created_at' not in form or form['created_at'] in (None, ''):
-                    try:
-                        form['created_at'] = form['_id'].generation_time.isoformat()
-                    except Exception:
-                        pass
-                form['id'] = str(form['_id'])
-                del form['_id']
-            return forms
+            return await forms_collection.estimated_document_count()
         except Exception as e:
-            logger.error(f"Error getting all forms: {e}")
-            return []
+            logger.error(f"Error counting forms: {e}")
+            return 0
 
     async def delete_form(self, form_id: str) -> bool:
         """Delete form and all related data"""
         try:
             form_result = await forms_collection.delete_one({"_id": ObjectId(form_id)})
-            questions_result = await questions_collection.delete_many({"form_id": form_id})
-            options_result = await options_collection.delete_many({"form_id": form_id})
+            # Both layouts, so a form caught mid-migration leaves nothing behind
+            children = {"form_id": {"$in": [form_id, ObjectId(form_id)]}}
+            questions_result = await questions_collection.delete_many(children)
+            options_result = await options_collection.delete_many(children)
+            form_cache.invalidate_form(form_id)
+            await bump_catalogue_revision([form_id])
             logger.info(f"Deleted form {form_id} with {questions_result.deleted_count} questions and {options_result.deleted_count} options")
             return form_result.deleted_count > 0
         except Exception as e:
@@ -132,6 +407,8 @@ class DatabaseService:
             forms_result = await forms_collection.delete_many({})
             questions_result = await questions_collection.delete_many({})
             options_result = await options_collection.delete_many({})
+            form_cache.clear()
+            await bump_catalogue_revision(None)
             logger.info(f"Deleted all forms ({forms_result.deleted_count}), questions ({questions_result.deleted_count}), and options ({options_result.deleted_count})")
             return {
                 "forms": forms_result.deleted_count,
@@ -142,21 +419,121 @@ class DatabaseService:
             logger.error(f"Error deleting all forms: {e}")
             return {}
 
-    async def update_form(self, form_id: str, form_data: Dict[str, Any], questions: List[Dict[str, Any]], options: List[Dict[str, Any]]) -> bool:
-        """Update form metadata, questions, and options by form_id"""
+    async def update_form(self, form_id: str, form_data: Dict[str, Any], questions: List[Dict[str, Any]], options: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Update form metadata and apply only the question/option rows that changed.
+
+        Questions are keyed on order and options on (order, option_id). Returns
+        per-collection counts of inserted/updated/deleted/unchanged rows, or
+        None if the form does not exist or the update failed.
+
+        The form is switched to its new revision only if it still has the
+        revision its layout was read at. migrate_form switches layouts under
+        the same condition, so a migration either lands first (and the
+        update re-reads the layout) or is skipped because of the update.
+        """
         try:
             if 'id' in form_data:
                 del form_data['id']
-            await forms_collection.update_one({"_id": ObjectId(form_id)}, {"$set": form_data})
+            form_data['updated_at'] = _utc_now()
+            form_oid = ObjectId(form_id)
+            for _ in range(_UPDATE_ATTEMPTS):
+                form = await forms_collection.find_one({"_id": form_oid}, {"schema_version": 1, "options_packed": 1, "revision": 1})
+                if form is None:
+                    # Diffing rows against a missing form would leave orphan questions and options
+                    logger.info(f"Form {form_id} not found; nothing to update")
+                    return None
+                layout = layout_of(form)
+                # The update replaces every row, so the counters follow from the new rows alone
+                orders = {q['order'] for q in questions}
+                kept_options = [o for o in options if o['order'] in orders] if layout.packed else options
+                form_data.update(form_counters(questions, kept_options))
+                # The stored contents no longer match the original upload
+                result = await forms_collection.update_one(
+                    {"_id": form_oid, "revision": form.get("revision")},
+                    {"$set": form_data, "$inc": {"revision": 1}, "$unset": {"fingerprint": "", "source_sha256": ""}},
+                )
+                if result.matched_count:
+                    break
+                # Either another write moved the revision or the form was deleted; the next read tells which
+                logger.info(f"Form {form_id} changed while updating it; reading its layout again")
+            else:
+                raise RuntimeError(f"form {form_id} kept changing during the update")
 
-            await questions_collection.delete_many({"form_id": form_id})
-            await options_collection.delete_many({"form_id": form_id})
+            if layout.packed:
+                question_changes, option_changes = await self._apply_packed_diff(form_id, questions, options)
+            else:
+                question_changes = await self._apply_row_diff(
+                    questions_collection, form_id, layout, questions, question_key, QUESTION_DIFF_FIELDS
+                )
+                option_changes = await self._apply_row_diff(
+                    options_collection, form_id, layout, options, option_key, OPTION_DIFF_FIELDS
+                )
 
-            await self.save_questions(questions, form_id)
-            await self.save_options(options, form_id)
-
-            logger.info(f"Updated form {form_id} with new metadata, questions, and options")
-            return True
+            form_cache.invalidate_form(form_id)
+            await bump_catalogue_revision([form_id])
+            logger.info(f"Updated form {form_id}: questions {question_changes}, options {option_changes}")
+            return {"questions": question_changes, "options": option_changes}
         except Exception as e:
             logger.error(f"Error updating form: {e}")
-            return False
+            return None
+
+    async def _apply_row_diff(self, collection, form_id: str, layout: FormLayout, rows: List[Dict[str, Any]], key, fields: Sequence[str]) -> Dict[str, int]:
+        """Diff `rows` against the stored rows of a form and bulk-write only the differences"""
+        projection = {f: 1 for f in ('order', 'option_id', *fields)}
+        stored_form_id = child_form_id(form_id, layout)
+        stored = [doc async for doc in collection.find({"form_id": stored_form_id}, projection).batch_size(STREAM_BATCH_SIZE)]
+        diff = diff_rows(stored, rows, key, fields, '_id')
+
+        ops: List[Any] = []
+        for row in diff.inserts:
+            row['_id'] = ObjectId()
+        encode_rows(form_id, layout, diff.inserts, [])
+        ops.extend(InsertOne(row) for row in diff.inserts)
+        ops.extend(UpdateOne({"_id": oid}, {"$set": changed}) for oid, changed in diff.updates)
+        if diff.deletes:
+            ops.append(DeleteMany({"_id": {"$in": diff.deletes}}))
+        if ops:
+            await collection.bulk_write(ops, ordered=False)
+        return diff.counts
+
+    async def _apply_packed_diff(self, form_id: str, questions: List[Dict[str, Any]], options: List[Dict[str, Any]]):
+        """Row diff for a form whose options live inside its question documents.
+
+        Options are diffed as rows for the reported counts; a question's
+        options array is rewritten only when its contents changed.
+        """
+        stored_form_id = ObjectId(form_id)
+        projection = {f: 1 for f in ('order', 'options', *QUESTION_DIFF_FIELDS)}
+        stored = [doc async for doc in questions_collection.find({"form_id": stored_form_id}, projection).batch_size(STREAM_BATCH_SIZE)]
+        question_diff = diff_rows(stored, questions, question_key, QUESTION_DIFF_FIELDS, '_id')
+        stored_options = [option for doc in stored for option in unpack_options(doc, form_id)]
+        option_diff = diff_rows(stored_options, options, option_key, OPTION_DIFF_FIELDS, 'id')
+
+        packed = pack_options(options)
+        orders = {q['order'] for q in questions}
+        orphans = sum(len(pairs) for order, pairs in packed.items() if order not in orders)
+        if orphans:
+            logger.warning(f"Dropping {orphans} options without a question from packed form {form_id}")
+
+        updates: Dict[Any, Dict[str, Any]] = dict(question_diff.updates)
+        deleted = set(question_diff.deletes)
+        for doc in stored:
+            if doc['_id'] in deleted:
+                continue
+            new_options = packed.get(doc['order'], [])
+            if (doc.get('options') or []) != new_options:
+                updates.setdefault(doc['_id'], {})['options'] = new_options
+
+        ops: List[Any] = []
+        for row in question_diff.inserts:
+            row['_id'] = ObjectId()
+            row['form_id'] = stored_form_id
+            row.pop('created_at', None)
+            row['options'] = packed.get(row['order'], [])
+            ops.append(InsertOne(row))
+        ops.extend(UpdateOne({"_id": oid}, {"$set": changed}) for oid, changed in updates.items())
+        if question_diff.deletes:
+            ops.append(DeleteMany({"_id": {"$in": question_diff.deletes}}))
+        if ops:
+            await questions_collection.bulk_write(ops, ordered=False)
+        return question_diff.counts, option_diff.counts
@@ -0,0 +1,204 @@
+"""
+tempData assembly for forms read back from the database.
+
+Kept apart from XLSFormTemplateBuilder, which works on the DataFrames of an
+uploaded workbook and imports pandas, so that GET /api/forms/{id} can build
+its response without loading pandas in a process that has not parsed a
+workbook yet.
+"""
+
+import uuid
+import secrets
+from datetime import datetime, timezone
+from typing import AsyncIterable, Dict, List, Any, Optional
+
+
+class DBTemplateBuilder:
+    """JSON schema assembly for the tempData.json format from stored questions and options."""
+
+    def _generate_object_id(self) -> str:
+        """Generate a mock ObjectId string for the tempData format."""
+        return secrets.token_hex(12)
+
+    def _extract_db_form_config(self, form: Dict[str, Any]) -> Dict[str, Any]:
+        """Extract form configuration from database form data with sensible defaults"""
+        return {
+            'title': form.get('title', 'Untitled Form'),
+            'language': form.get('language', 'en'),
+            'version': str(form.get('version', '1')),
+            'projectOrder': 0, 'villageOrder': 5, 'blockOrder': 3, 'districtOrder': 2,
+            'gramPanchayatOrder': 4, 'hamletOrder': 0,
+            'hasCensus': False, 'isActive': True, 'isBulkUploadDraft': False,
+            'isBulkUploadResponse': True, 'isCustomLabel': True, 'isDashboardDisable': False,
+            'isDraftDisable': False, 'isDynamicCard': False, 'isLivelihood': True,
+            'isMaster': False, 'isMedia': False, 'isOnline': False,
+            'isResourceRepository': False, 'isViewOnly': False, 'isVisibleToAll': False,
+            'isPreviewEnabled': True, 'hideAllLabel': False, 'allowPreviewDownload': False,
+            'parallelImportCall': True, 'errorManagementStatus': True, 'dataMigrated': False,
+            'enableAsr': False, 'enableTts': False, 'isAutoCalculate': False,
+            'isReferenceData': False, 'isResetForReviewEdit': False, 'offlineReviewEdit': False,
+            'mainFormId': None, 'filterFormId': None, 'copiedFormId': 125,
+            'filterDataBy': ['GEOGRAPHY'], 'tags': []
+        }
+
+    def _convert_db_to_temp_data_format(self, form: Dict[str, Any], questions: List[Dict[str, Any]], options: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return self._assemble_db_form_definition(
+            form,
+            self._build_response_questions_from_db(questions, options),
+            self._build_form_questions_from_db(questions, options),
+            self._build_sync_questions_from_db(questions),
+            self._get_key_info_orders_from_db(questions),
+        )
+
+    async def _convert_db_stream_to_temp_data_format(self, form: Dict[str, Any], questions: AsyncIterable[Dict[str, Any]], options: AsyncIterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Build the tempData document from question/option streams sorted by order.
+
+        Options are merge-joined onto their question as both streams advance,
+        so neither collection has to be materialised up front. Questions that
+        share an order all get that order's options, as in the list version.
+        """
+        response_questions: List[Dict[str, Any]] = []
+        form_questions: List[Dict[str, Any]] = []
+        sync_questions: List[Dict[str, Any]] = []
+        key_info_orders: List[str] = []
+
+        options_iter = options.__aiter__()
+        next_option: Optional[Dict[str, Any]] = None
+        options_done = False
+
+        async def advance() -> None:
+            nonlocal next_option, options_done
+            try:
+                next_option = await options_iter.__anext__()
+            except StopAsyncIteration:
+                next_option, options_done = None, True
+
+        await advance()
+        matching_options: List[Dict[str, Any]] = []
+        matched_order: Any = None
+        async for question in questions:
+            # A question sharing the previous one's order reuses its options
+            if question['order'] != matched_order:
+                while not options_done and next_option['order'] < question['order']:
+                    await advance()  # orphaned option, no question to attach to
+                matching_options = []
+                while not options_done and next_option['order'] == question['order']:
+                    matching_options.append(next_option)
+                    await advance()
+                matched_order = question['order']
+            response_questions.append(self._build_response_question_from_db(question, matching_options))
+            form_questions.append(self._build_form_question_from_db(question, matching_options))
+            sync_questions.append(self._build_sync_question_from_db(question))
+            if len(key_info_orders) < 7:
+                key_info_orders.append(str(question['order']))
+
+        return self._assemble_db_form_definition(form, response_questions, form_questions, sync_questions, key_info_orders)
+
+    def _assemble_db_form_definition(self, form: Dict[str, Any], response_questions: List[Dict[str, Any]], form_questions: List[Dict[str, Any]], sync_questions: List[Dict[str, Any]], key_info_orders: List[str]) -> List[Dict[str, Any]]:
+        config = self._extract_db_form_config(form)
+        now = datetime.now(timezone.utc).isoformat()
+        form_definition = {
+            "_id": f'ObjectId("{self._generate_object_id()}")',
+            "formUiniqueId": f'ObjectId("{form.get("id", self._generate_object_id())}")',
+            "formId": 848,
+            "parentResponseId": None, "groupResponseId": None,
+            "transactionId": str(uuid.uuid4()), "forParentValue": None,
+            "uniqueId": f"db_form_{form.get('id', 'unknown')}_{int(datetime.now().timestamp())}",
+            "userId": f'ObjectId("{self._generate_object_id()}")',
+            "partner": f'ObjectId("{self._generate_object_id()}")',
+            "project": f'ObjectId("{self._generate_object_id()}")',
+            "loginId": f'ObjectId("{self._generate_object_id()}")',
+            "hamlet": None,
+            "village": f'ObjectId("{self._generate_object_id()}")',
+            "gramPanchayat": f'ObjectId("{self._generate_object_id()}")',
+            "block": f'ObjectId("{self._generate_object_id()}")',
+            "district": f'ObjectId("{self._generate_object_id()}")',
+            "state": f'ObjectId("{self._generate_object_id()}")',
+            "location": {"lat": "0.0", "lng": "0.0", "accuracy": "0.0"},
+            "backgroundVoice": None,
+            "question": response_questions,
+            "responseUpdateHistory": [], "appVersion": "2.5.3", "responseIds": [],
+            "mobileCreatedAt": f'ISODate("{form.get("created_at", now)}")',
+            "createdAt": f'ISODate("{form.get("created_at", now)}")',
+            "updatedAt": f'ISODate("{now}")',
+            "blockOrder": config['blockOrder'], "districtOrder": config['districtOrder'],
+            "gramPanchayatOrder": config['gramPanchayatOrder'], "hamletOrder": config['hamletOrder'],
+            "hasCensus": config['hasCensus'], "hooks": [], "isActive": config['isActive'],
+            "isBulkUploadDraft": config['isBulkUploadDraft'], "isBulkUploadResponse": config['isBulkUploadResponse'],
+            "isCustomLabel": config['isCustomLabel'], "isDashboardDisable": config['isDashboardDisable'],
+            "isDraftDisable": config['isDraftDisable'], "isDynamicCard": config['isDynamicCard'],
+            "isLivelihood": config['isLivelihood'], "isMaster": config['isMaster'],
+            "isMedia": config['isMedia'], "isOnline": config['isOnline'],
+            "isResourceRepository": config['isResourceRepository'], "isViewOnly": config['isViewOnly'],
+            "isVisibleToAll": config['isVisibleToAll'],
+            "keyInfoOrders": key_info_orders,
+            "language": [{"lng": config['language'], "title": config['title'], "buttons": [], "question": form_questions}],
+            "syncStatus": {"groupBy": "5", "filterBy": config['filterDataBy'], "conditions": [], "questions": sync_questions, "_id": f'ObjectId("{self._generate_object_id()}")'},
+            "version": config['version'], "villageOrder": config['villageOrder'],
+            "googleSheet": {}, "actions": [], "isPreviewEnabled": config['isPreviewEnabled'],
+            "projects": [], "hideAllLabel": config['hideAllLabel'],
+            "mainFormId": config['mainFormId'], "projectOrder": config['projectOrder'],
+            "filterDataBy": config['filterDataBy'], "filterFormId": config['filterFormId'],
+            "maskingConfig": [], "encryptedQuestions": [],
+            "allowPreviewDownload": config['allowPreviewDownload'],
+            "parallelImportCall": config['parallelImportCall'],
+            "errorManagementStatus": config['errorManagementStatus'],
+            "searchOrders": [], "copiedFormId": config['copiedFormId'],
+            "dataMigrated": config['dataMigrated'], "enableAsr": config['enableAsr'],
+            "enableTts": config['enableTts'], "isAutoCalculate": config['isAutoCalculate'],
+            "isReferenceData": config['isReferenceData'],
+            "isResetForReviewEdit": config['isResetForReviewEdit'],
+            "metaDataConfig": [], "offlineReviewEdit": config['offlineReviewEdit'],
+            "tags": config['tags']
+        }
+        return [form_definition]
+
+    def _group_options_by_order(self, options: List[Dict[str, Any]]) -> Dict[Any, List[Dict[str, Any]]]:
+        grouped: Dict[Any, List[Dict[str, Any]]] = {}
+        for option in options:
+            grouped.setdefault(option['order'], []).append(option)
+        return grouped
+
+    def _build_response_questions_from_db(self, questions: List[Dict[str, Any]], options: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        grouped = self._group_options_by_order(options)
+        return [self._build_response_question_from_db(q, grouped.get(q['order'], [])) for q in questions]
+
+    def _build_response_question_from_db(self, question: Dict[str, Any], matching_options: List[Dict[str, Any]]) -> Dict[str, Any]:
+        order = str(question['order'])
+        input_type = str(question['input_type'])
+        answer_data = []
+        initial_answer_data = []
+        if matching_options:
+            first_option = matching_options[0]
+            answer_data = [{"value": str(first_option['option_id']), "label": str(first_option['label']), "_id": f'ObjectId("{self._generate_object_id()}")'}]
+            initial_answer_data = [{"value": str(first_option['option_id']), "label": str(first_option['label']), "_id": f'ObjectId("{self._generate_object_id()}")'}]
+        return {"order": order, "input_type": input_type, "answer": answer_data, "intialAnswer": initial_answer_data, "history": [], "nestedAnswer": [], "_id": f'ObjectId("{self._generate_object_id()}")'}
+
+    def _build_form_questions_from_db(self, questions: List[Dict[str, Any]], options: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        grouped = self._group_options_by_order(options)
+        return [self._build_form_question_from_db(q, grouped.get(q['order'], [])) for q in questions]
+
+    def _build_form_question_from_db(self, question: Dict[str, Any], matching_options: List[Dict[str, Any]]) -> Dict[str, Any]:
+        order = str(question['order'])
+        input_type = str(question['input_type'])
+        title = str(question['title'])
+        view_sequence = str(question.get('view_sequence', question['order']))
+        answer_options = []
+        for option in matching_options:
+            answer_options.append({"_id": str(option['option_id']), "name": str(option['label']), "shortKey": "", "visibility": None, "did": [], "viewSequence": str(option['option_id']), "coordinates": []})
+        return {"order": order, "label": order, "title": title, "shortKey": f"question_{order}", "information": "", "viewSequence": view_sequence, "input_type": input_type, "validation": [{"_id": "1", "error_msg": "", "condition": None}], "answer_option": answer_options, "restrictions": [], "child": [], "parent": [], "hint": "", "error_msg": "", "resource_urls": [], "editable": False, "weightage": [], "_id": f'ObjectId("{self._generate_object_id()}")'}
+
+    def _build_sync_questions_from_db(self, questions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [self._build_sync_question_from_db(q) for q in questions]
+
+    def _build_sync_question_from_db(self, question: Dict[str, Any]) -> Dict[str, Any]:
+        order = str(question['order'])
+        return {"order": order, "key": f"order{order}", "clear": False, "edit": True, "setDefault": None, "_id": f'ObjectId("{self._generate_object_id()}")'}
+
+    def _get_key_info_orders_from_db(self, questions: List[Dict[str, Any]]) -> List[str]:
+        orders = []
+        for question in questions:
+            orders.append(str(question['order']))
+            if len(orders) >= 7:
+                break
+        return orders
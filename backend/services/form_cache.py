@@ -0,0 +1,241 @@
+"""
+Read-through cache for form list and form detail reads.
+
+FormCache sits in front of DatabaseService list reads and the tempData
+documents built for GET /api/forms/{id}. Entries are evicted by TTL and
+least-recent use; DatabaseService writes invalidate them. The storage is a
+CacheBackend, either in-process (LRUCacheBackend, the default) or a SQLite
+file shared by every worker on the host (SQLiteCacheBackend), which stands
+in for an external shared cache.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+FORM_CACHE_BACKEND = os.getenv("FORM_CACHE_BACKEND", "memory")
+FORM_CACHE_TTL_SECONDS = float(os.getenv("FORM_CACHE_TTL_SECONDS", "30"))
+FORM_CACHE_MAX_ENTRIES = int(os.getenv("FORM_CACHE_MAX_ENTRIES", "256"))
+FORM_CACHE_PATH = os.getenv("FORM_CACHE_PATH", os.path.join(tempfile.gettempdir(), "mform_form_cache.sqlite3"))
+
+
+class CacheBackend(ABC):
+    """Key/value storage with per-entry TTL. Values must be JSON-serialisable."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def delete_prefix(self, prefix: str) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+
+class LRUCacheBackend(CacheBackend):
+    """In-process, size-bounded LRU with TTL expiry."""
+
+    def __init__(self, max_entries: int = FORM_CACHE_MAX_ENTRIES):
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def delete_prefix(self, prefix: str) -> None:
+        for key in [k for k in self._entries if k.startswith(prefix)]:
+            del self._entries[key]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """Cache in a local SQLite file so every worker process on a host shares entries and invalidations."""
+
+    def __init__(self, path: str = FORM_CACHE_PATH, max_entries: int = FORM_CACHE_MAX_ENTRIES):
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_last_used ON cache (last_used)")
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE cache SET last_used = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, default=str), now + ttl, now),
+            )
+            self._conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self._max_entries,),
+            )
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def delete_prefix(self, prefix: str) -> None:
+        escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key LIKE ? ESCAPE '\\'", (escaped + "%",))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+
+
+class FormCache:
+    """Read-through cache with single-flight loading and write invalidation."""
+
+    LIST_PREFIX = "forms:"
+
+    def __init__(self, backend: Optional[CacheBackend], ttl: float = FORM_CACHE_TTL_SECONDS):
+        self._backend = backend
+        self._ttl = ttl
+        self._generation = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._backend is not None and self._ttl > 0
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value for key, or await loader() and cache its result.
+
+        Concurrent misses for the same key share one load. Exceptions are
+        propagated and never cached; a None result is not cached either.
+        If the caller running the shared load is cancelled, the others do
+        not fail with it: one of them takes over the load.
+        """
+        if not self.enabled:
+            return await loader()
+        value = self._backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+
+        while (inflight := self._inflight.get(key)) is not None:
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled() or asyncio.current_task().cancelling():
+                    raise  # this caller was cancelled, not the load
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        generation = self._generation
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else is waiting
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        # Skip storing if a write invalidated the cache while we were loading
+        if value is not None and generation == self._generation:
+            self._backend.set(key, value, self._ttl)
+        future.set_result(value)
+        return value
+
+    def form_key(self, form_id: str) -> str:
+        """Key prefix for a form's detail entries (callers may append a revision)."""
+        return f"form:{form_id}:"
+
+    def invalidate_form(self, form_id: str) -> None:
+        """Drop one form's detail entries and every list/page entry."""
+        self._generation += 1
+        if self._backend is not None:
+            self._backend.delete_prefix(self.form_key(form_id))
+            self._backend.delete_prefix(self.LIST_PREFIX)
+
+    def invalidate_lists(self) -> None:
+        self._generation += 1
+        if self._backend is not None:
+            self._backend.delete_prefix(self.LIST_PREFIX)
+
+    def clear(self) -> None:
+        self._generation += 1
+        self._inflight.clear()
+        if self._backend is not None:
+            self._backend.clear()
+
+
+def create_form_cache() -> FormCache:
+    """Build the cache selected by FORM_CACHE_BACKEND (memory, sqlite or none)."""
+    backend_name = FORM_CACHE_BACKEND.strip().lower()
+    if backend_name == "none":
+        return FormCache(None)
+    if backend_name == "sqlite":
+        try:
+            return FormCache(SQLiteCacheBackend(FORM_CACHE_PATH))
+        except sqlite3.Error as e:
+            logger.error(f"Shared form cache unavailable ({e}); falling back to in-process cache")
+    elif backend_name != "memory":
+        logger.warning(f"Unknown FORM_CACHE_BACKEND '{FORM_CACHE_BACKEND}', using in-process cache")
+    return FormCache(LRUCacheBackend())
+
+
+form_cache = create_form_cache()
@@ -0,0 +1,321 @@
+"""
+Storage interface for forms, questions and options.
+
+FormRepository declares every operation the API and the parser need from
+storage. DatabaseService (services/database_service.py) implements it on
+MongoDB and SQLiteFormRepository (services/sqlite_repository.py) on an
+embedded SQLite file. STORAGE_BACKEND selects one per process; callers get
+it from get_form_repository().
+
+Behaviour that does not depend on the store lives here: the read-through
+cache around list reads, keyset cursors, the keyed row diff used by
+update_form, and the question/option counters stored on each form.
+"""
+
+import base64
+import json
+import logging
+import os
+import re
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import Any, AsyncIterator, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from services.form_cache import form_cache
+from services.write_coalescer import NullWriteBatch
+
+logger = logging.getLogger(__name__)
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "mongo")
+
+FORMS_PAGE_SIZE = 100
+# Fields compared when diffing stored rows against an updated workbook
+QUESTION_DIFF_FIELDS = ('title', 'view_sequence', 'input_type')
+OPTION_DIFF_FIELDS = ('label',)
+_FIELD_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+# Catalogue revisions whose changed form ids are kept for get_form_changes
+FORM_CHANGES_KEPT = int(os.getenv("FORM_CHANGES_KEPT", "1000"))
+
+
+def encode_forms_cursor(created_at: Any, form_oid: ObjectId) -> str:
+    """Opaque keyset cursor for the (created_at desc, _id desc) form order"""
+    raw = json.dumps({"c": created_at, "i": str(form_oid)}, default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_forms_cursor(cursor: str) -> Tuple[Any, ObjectId]:
+    """Inverse of encode_forms_cursor; raises ValueError for malformed cursors"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        return data["c"], ObjectId(data["i"])
+    except (ValueError, KeyError, TypeError, InvalidId) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def validate_field_names(fields: Optional[Sequence[str]]) -> None:
+    """Reject projection field names that are not plain identifiers"""
+    bad = [f for f in fields or [] if not _FIELD_NAME.match(f)]
+    if bad:
+        raise ValueError(f"Invalid field name(s): {', '.join(bad)}")
+
+
+class DuplicateFormError(Exception):
+    """A form with the same upload fingerprint is already stored."""
+
+    def __init__(self, fingerprint: Optional[str]):
+        super().__init__(f"A form with fingerprint {fingerprint} already exists")
+        self.fingerprint = fingerprint
+
+
+class RowDiff(NamedTuple):
+    inserts: List[Dict[str, Any]]
+    updates: List[Tuple[Any, Dict[str, Any]]]
+    deletes: List[Any]
+    counts: Dict[str, int]
+
+
+def diff_rows(stored: Sequence[Dict[str, Any]], rows: Sequence[Dict[str, Any]], key: Callable[[Dict[str, Any]], Any], fields: Sequence[str], id_field: str) -> RowDiff:
+    """Diff new rows against stored rows matched on `key`.
+
+    Returns the rows to insert, (stored id, changed fields) pairs to update,
+    and stored ids to delete, including duplicates left by older writes.
+    """
+    by_key: Dict[Any, Dict[str, Any]] = {}
+    deletes: List[Any] = []
+    for doc in stored:
+        if key(doc) in by_key:
+            deletes.append(doc[id_field])
+        else:
+            by_key[key(doc)] = doc
+
+    inserts: List[Dict[str, Any]] = []
+    updates: List[Tuple[Any, Dict[str, Any]]] = []
+    unchanged = 0
+    for row in rows:
+        existing = by_key.pop(key(row), None)
+        if existing is None:
+            inserts.append(row)
+            continue
+        changed = {f: row[f] for f in fields if f in row and existing.get(f) != row[f]}
+        if changed:
+            updates.append((existing[id_field], changed))
+        else:
+            unchanged += 1
+
+    deletes.extend(doc[id_field] for doc in by_key.values())
+    counts = {"inserted": len(inserts), "updated": len(updates), "deleted": len(deletes), "unchanged": unchanged}
+    return RowDiff(inserts, updates, deletes, counts)
+
+
+def changed_form_ids(changes: Sequence[Tuple[int, Optional[Sequence[str]]]], since: int, revision: int) -> Optional[List[str]]:
+    """Forms written between two catalogue revisions, from (revision, form ids) log entries.
+
+    None if the log lacks one of the revisions in between (trimmed, or a
+    write that did not record its forms, such as deleting everything).
+    """
+    wanted = {r: ids for r, ids in changes if since < r <= revision}
+    if len(wanted) != revision - since or any(ids is None for ids in wanted.values()):
+        return None
+    return sorted({form_id for ids in wanted.values() for form_id in ids})
+
+
+def form_counters(questions: Sequence[Dict[str, Any]], options: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """Denormalised counts kept on a form: questions, options and questions per input type"""
+    return {
+        "questions_count": len(questions),
+        "options_count": len(options),
+        "input_type_counts": dict(Counter(str(q.get('input_type')) for q in questions)),
+    }
+
+
+def counter_increments(questions: Sequence[Dict[str, Any]], options: Sequence[Dict[str, Any]]) -> Dict[str, int]:
+    """form_counters of appended rows as flat (dotted) increments"""
+    counters = form_counters(questions, options)
+    increments = {f"input_type_counts.{t}": n for t, n in counters.pop("input_type_counts").items()}
+    increments.update({k: n for k, n in counters.items() if n})
+    return increments
+
+
+def question_key(row: Dict[str, Any]) -> Any:
+    return row['order']
+
+
+def option_key(row: Dict[str, Any]) -> Any:
+    return (row['order'], row['option_id'])
+
+
+class FormRepository(ABC):
+    """Storage operations for forms and their questions and options."""
+
+    # ---------------------------------------------------------------------------
+    # Lifecycle
+    # ---------------------------------------------------------------------------
+
+    @abstractmethod
+    async def connect(self) -> None:
+        """Open the store (and create indexes/schema); raise if unreachable"""
+
+    @abstractmethod
+    async def close(self) -> None:
+        ...
+
+    async def warm_pool(self) -> int:
+        """Open the connections the store keeps while idle; returns how many (0 = nothing to open)"""
+        return 0
+
+    # ---------------------------------------------------------------------------
+    # Writes
+    # ---------------------------------------------------------------------------
+
+    @abstractmethod
+    async def save_form(self, form_data: Dict[str, Any]) -> str:
+        ...
+
+    @abstractmethod
+    async def save_questions(self, questions: List[Dict[str, Any]], form_id: str) -> List[str]:
+        ...
+
+    @abstractmethod
+    async def save_options(self, options: List[Dict[str, Any]], form_id: str) -> List[str]:
+        ...
+
+    def write_batch(self):
+        """Group the writes of files processed together; a no-op unless the store batches writes"""
+        return NullWriteBatch()
+
+    @abstractmethod
+    async def save_form_bundle(self, form_data: Dict[str, Any], questions: List[Dict[str, Any]], options: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Save a form with its questions and options, all or nothing.
+
+        Returns form_id, question_ids, option_ids and the queued_time,
+        form_time, questions_time and options_time timings of the write.
+        Raises DuplicateFormError if form_data carries a fingerprint that is
+        already stored.
+        """
+
+    @abstractmethod
+    async def update_form(self, form_id: str, form_data: Dict[str, Any], questions: List[Dict[str, Any]], options: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    async def delete_form(self, form_id: str) -> bool:
+        ...
+
+    @abstractmethod
+    async def delete_all_forms(self) -> dict:
+        ...
+
+    # ---------------------------------------------------------------------------
+    # Reads
+    # ---------------------------------------------------------------------------
+
+    @abstractmethod
+    async def get_form_revision(self, form_id: str) -> Optional[int]:
+        ...
+
+    @abstractmethod
+    async def get_catalogue_revision(self) -> int:
+        ...
+
+    async def get_form_changes(self, since: int) -> Optional[List[str]]:
+        """Ids of the forms written after catalogue revision `since`; None when the store cannot tell"""
+        return None
+
+    @abstractmethod
+    async def find_form_by_fingerprint(self, fingerprint: Optional[str] = None, source_sha256: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """A stored form (id, title, version) whose upload matches either hash, or None"""
+
+    @abstractmethod
+    async def get_form_by_id(self, form_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def iter_questions_by_form_id(self, form_id: str) -> AsyncIterator[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def iter_options_by_form_id(self, form_id: str) -> AsyncIterator[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    async def count_forms(self) -> int:
+        ...
+
+    @abstractmethod
+    async def _load_forms_page(self, limit: int, cursor: Optional[str], fields: Optional[Sequence[str]]) -> Dict[str, Any]:
+        """Uncached keyset page: {"forms": [...], "next_cursor": str or None}"""
+
+    async def get_questions_by_form_id(self, form_id: str) -> List[Dict[str, Any]]:
+        """Get all questions for a form"""
+        try:
+            return [question async for question in self.iter_questions_by_form_id(form_id)]
+        except Exception as e:
+            logger.error(f"Error getting questions: {e}")
+            return []
+
+    async def get_options_by_form_id(self, form_id: str) -> List[Dict[str, Any]]:
+        """Get all options for a form"""
+        try:
+            return [option async for option in self.iter_options_by_form_id(form_id)]
+        except Exception as e:
+            logger.error(f"Error getting options: {e}")
+            return []
+
+    async def get_forms_page(self, limit: int = FORMS_PAGE_SIZE, cursor: Optional[str] = None, fields: Optional[Sequence[str]] = None, revision: Optional[int] = None) -> Dict[str, Any]:
+        """Get one page of forms, newest first, using a (created_at, _id) keyset.
+
+        `fields` restricts the returned form fields (id is always included).
+        Passing the catalogue `revision` keys the cached page to it, so a page
+        cached by this worker is never served for a newer revision.
+        Raises ValueError for a malformed cursor or field name.
+        """
+        key = f"{form_cache.LIST_PREFIX}page:{revision}:{limit}:{cursor or ''}:{','.join(fields or [])}"
+        return await form_cache.get_or_load(key, lambda: self._load_forms_page(limit, cursor, fields))
+
+    async def get_all_forms(self, fields: Optional[Sequence[str]] = None, revision: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Get all forms, sorted by created_at descending"""
+        try:
+            key = f"{form_cache.LIST_PREFIX}all:{revision}:{','.join(fields or [])}"
+            return await form_cache.get_or_load(key, lambda: self._load_all_forms(fields))
+        except ValueError:
+            raise
+        except Exception as e:
+            logger.error(f"Error getting all forms: {e}")
+            return []
+
+    async def _load_all_forms(self, fields: Optional[Sequence[str]]) -> List[Dict[str, Any]]:
+        forms: List[Dict[str, Any]] = []
+        cursor = None
+        while True:
+            page = await self._load_forms_page(1000, cursor, fields)
+            forms.extend(page["forms"])
+            cursor = page["next_cursor"]
+            if not cursor:
+                return forms
+
+
+_repository: Optional[FormRepository] = None
+
+
+def create_form_repository(backend: str = STORAGE_BACKEND) -> FormRepository:
+    """Build the repository named by `backend` (mongo or sqlite)."""
+    name = backend.strip().lower()
+    if name == "sqlite":
+        from services.sqlite_repository import SQLiteFormRepository
+        return SQLiteFormRepository()
+    if name != "mongo":
+        raise ValueError(f"Unknown STORAGE_BACKEND '{backend}' (expected 'mongo' or 'sqlite')")
+    from services.database_service import DatabaseService
+    return DatabaseService()
+
+
+def get_form_repository() -> FormRepository:
+    """The process-wide repository selected by STORAGE_BACKEND."""
+    global _repository
+    if _repository is None:
+        _repository = create_form_repository()
+    return _repository
@@ -0,0 +1,166 @@
+"""
+MongoDB document layouts for questions and options.
+
+v1 (legacy): one document per question and per option, form_id stored as
+the form's id string and a created_at string repeated on every row.
+v2 (compact): form_id stored as an ObjectId and no per-row timestamps (the
+form document keeps created_at/updated_at). A v2 form may also pack its
+options into their question documents as [option_id, label] pairs, which
+removes the options documents and their index entries altogether.
+
+The form document records its layout in schema_version / options_packed, so
+DatabaseService reads both layouts side by side while migrate_form (run by
+scripts/migrate_schema_v2.py) converts old forms in place.
+"""
+
+import logging
+import os
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from bson import ObjectId
+
+from services.form_repository import form_counters
+
+logger = logging.getLogger(__name__)
+
+# Layout of newly written forms: 1 (legacy) or 2 (compact). Stays 1 until
+# every instance reading the database understands v2.
+MONGO_SCHEMA_VERSION = int(os.getenv("MONGO_SCHEMA_VERSION", "1"))
+# v2 only: pack options into their question documents
+MONGO_PACK_OPTIONS = os.getenv("MONGO_PACK_OPTIONS", "false").strip().lower() in ("1", "true", "yes")
+
+
+class FormLayout(NamedTuple):
+    version: int
+    packed: bool
+
+
+LEGACY = FormLayout(1, False)
+
+
+def layout_of(form: Optional[Dict[str, Any]]) -> FormLayout:
+    """Layout recorded on a form document (legacy when absent)"""
+    if not form:
+        return LEGACY
+    return FormLayout(int(form.get("schema_version", 1)), bool(form.get("options_packed", False)))
+
+
+def new_layout(questions: List[Dict[str, Any]], options: List[Dict[str, Any]], version: Optional[int] = None, pack: Optional[bool] = None) -> FormLayout:
+    """Layout for a new form; options are only packed if every one has its question"""
+    version = MONGO_SCHEMA_VERSION if version is None else version
+    pack = MONGO_PACK_OPTIONS if pack is None else pack
+    if version < 2:
+        return LEGACY
+    orders = {q["order"] for q in questions}
+    return FormLayout(2, pack and all(o["order"] in orders for o in options))
+
+
+def stamp_form(form: Dict[str, Any], layout: FormLayout) -> None:
+    if layout.version >= 2:
+        form["schema_version"] = layout.version
+    if layout.packed:
+        form["options_packed"] = True
+
+
+def child_form_id(form_id: str, layout: FormLayout) -> Any:
+    """Value stored in the form_id field of a form's question/option documents"""
+    return ObjectId(form_id) if layout.version >= 2 else form_id
+
+
+def pack_options(options: List[Dict[str, Any]]) -> Dict[Any, List[List[Any]]]:
+    packed: Dict[Any, List[List[Any]]] = defaultdict(list)
+    for option in options:
+        packed[option["order"]].append([option["option_id"], option["label"]])
+    return packed
+
+
+def encode_rows(form_id: str, layout: FormLayout, questions: List[Dict[str, Any]], options: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Lay out question/option rows for storage; returns (question docs, option docs)"""
+    stored_form_id = child_form_id(form_id, layout)
+    for row in (*questions, *options):
+        row["form_id"] = stored_form_id
+        if layout.version >= 2:
+            row.pop("created_at", None)
+    if not layout.packed:
+        return questions, options
+    packed = pack_options(options)
+    for question in questions:
+        question["options"] = packed.get(question["order"], [])
+    return questions, []
+
+
+def decode_question(doc: Dict[str, Any], form_id: str) -> Dict[str, Any]:
+    doc["id"] = str(doc.pop("_id"))
+    doc["form_id"] = form_id
+    doc.pop("options", None)
+    return doc
+
+
+def decode_option(doc: Dict[str, Any], form_id: str) -> Dict[str, Any]:
+    doc["id"] = str(doc.pop("_id"))
+    doc["form_id"] = form_id
+    return doc
+
+
+def unpack_options(question: Dict[str, Any], form_id: str) -> Iterator[Dict[str, Any]]:
+    """Option rows of a packed question document, in stored order"""
+    for i, (option_id, label) in enumerate(question.get("options") or []):
+        yield {
+            "id": f"{question['_id']}:{i}",
+            "form_id": form_id,
+            "order": question["order"],
+            "option_id": option_id,
+            "label": label,
+        }
+
+
+async def migrate_form(forms, questions, options, form: Dict[str, Any], pack: Optional[bool] = None) -> bool:
+    """Convert one legacy form to the v2 layout without a reader ever seeing a mix.
+
+    The v2 rows are written first (invisible while the form still says v1),
+    then the form is switched (and its revision bumped) only if it has not
+    changed meanwhile, and only then are the v1 rows removed. Like any other
+    write, a switch drops the form's cached reads and advances the catalogue
+    revision. Returns False if the form was skipped because it changed; it
+    can simply be retried.
+    """
+    form_oid = form["_id"]
+    form_id = str(form_oid)
+    revision = form.get("revision")
+    question_rows = [doc async for doc in questions.find({"form_id": form_id}).sort("order", 1)]
+    option_rows = [doc async for doc in options.find({"form_id": form_id}).sort([("order", 1), ("_id", 1)])]
+    layout = new_layout(question_rows, option_rows, version=2, pack=pack)
+
+    for row in (*question_rows, *option_rows):
+        row["_id"] = ObjectId()
+    question_docs, option_docs = encode_rows(form_id, layout, question_rows, option_rows)
+    if question_docs:
+        await questions.insert_many(question_docs, ordered=False)
+    if option_docs:
+        await options.insert_many(option_docs, ordered=False)
+
+    # Legacy forms predate the per-form counters; fill them in while the rows are at hand
+    switch: Dict[str, Any] = {"schema_version": 2, **form_counters(question_rows, option_rows)}
+    if layout.packed:
+        switch["options_packed"] = True
+    result = await forms.update_one(
+        {"_id": form_oid, "revision": revision, "schema_version": {"$ne": 2}},
+        {"$set": switch, "$inc": {"revision": 1}},
+    )
+    if result.matched_count == 0:
+        await questions.delete_many({"form_id": form_oid})
+        await options.delete_many({"form_id": form_oid})
+        logger.warning(f"Form {form_id} changed during migration (revision {revision}); skipped")
+        return False
+
+    await questions.delete_many({"form_id": form_id})
+    await options.delete_many({"form_id": form_id})
+    # Imported here: database_service imports this module
+    from services.database_service import bump_catalogue_revision
+    from services.form_cache import form_cache
+
+    form_cache.invalidate_form(form_id)
+    await bump_catalogue_revision([form_id])
+    logger.info(f"Migrated form {form_id} to schema v2 ({len(question_docs)} questions, {len(option_rows)} options{', packed' if layout.packed else ''})")
+    return True
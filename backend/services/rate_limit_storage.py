@@ -0,0 +1,164 @@
+"""
+Rate-limit counters shared by every worker process on a host.
+
+slowapi keeps its counters in the storage named by RATELIMIT_STORAGE_URL
+(memory:// by default, which gives each worker its own limits). Importing
+this module registers a sqlite:// scheme with the limits package, so
+RATELIMIT_STORAGE_URL=sqlite:////tmp/mform_rate_limits.sqlite3 (four slashes
+for an absolute path) makes all workers count against one file. It stands
+in for an external store: the redis:// and mongodb:// storages of the
+limits package work the same way across hosts.
+
+slowapi consults the storage synchronously on the event loop, so a hit
+never waits for the file: it tries the write without a busy timeout, and
+if another worker holds the write lock at that moment the hit is counted
+in memory and written by a background thread within
+RATELIMIT_SYNC_INTERVAL_SECONDS. Until then other workers see that hit
+late; this worker counts it at once. WAL checkpoints also run on that
+thread instead of inside a request's commit.
+"""
+
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from limits.storage import Storage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RATE_LIMIT_PATH = os.path.join(tempfile.gettempdir(), "mform_rate_limits.sqlite3")
+# Longest delay before a hit counted in memory reaches the shared file
+RATELIMIT_SYNC_INTERVAL_SECONDS = float(os.getenv("RATELIMIT_SYNC_INTERVAL_SECONDS", "0.05"))
+_CHECKPOINT_INTERVAL_SECONDS = 5.0
+
+
+class SQLiteRateLimitStorage(Storage):
+    """Fixed-window counters in a local SQLite file."""
+
+    STORAGE_SCHEME = ["sqlite"]
+
+    def __init__(self, uri: Optional[str] = None, wrap_exceptions: bool = False, **options: Any):
+        # sqlite:///relative.db or sqlite:////absolute/path.db, as in SQLAlchemy URLs
+        path = (uri or "").split("://", 1)[-1][1:] if uri and "://" in uri else ""
+        self._path = path or DEFAULT_RATE_LIMIT_PATH
+        # Guards _conn (used from the event loop) and the hits not yet written
+        self._lock = threading.Lock()
+        self._conn = self._connect(timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS limits (key TEXT PRIMARY KEY, value INTEGER NOT NULL, expires_at REAL NOT NULL)")
+        # From now on a locked file is reported at once instead of waited for
+        self._conn.execute("PRAGMA busy_timeout = 0")
+        # key -> [amount, expiry, elastic_expiry]: hits waiting for the writer thread, and being written by it
+        self._pending: Dict[str, List] = {}
+        self._inflight: Dict[str, int] = {}
+        self._wakeup = threading.Event()
+        threading.Thread(target=self._writer, name="rate-limit-writer", daemon=True).start()
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    def _connect(self, timeout: float) -> sqlite3.Connection:
+        conn = sqlite3.connect(self._path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        # Checkpoints are run by the writer thread
+        conn.execute("PRAGMA wal_autocheckpoint=0")
+        return conn
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _add(self, conn: sqlite3.Connection, key: str, expiry: float, elastic_expiry: bool, amount: int, now: float) -> int:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM limits WHERE key = ? AND expires_at <= ?", (key, now))
+            conn.execute(
+                "INSERT INTO limits (key, value, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = value + excluded.value"
+                + (", expires_at = excluded.expires_at" if elastic_expiry else ""),
+                (key, amount, now + expiry),
+            )
+            value = conn.execute("SELECT value FROM limits WHERE key = ?", (key,)).fetchone()[0]
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return value
+
+    def _unwritten(self, key: str) -> int:
+        pending = self._pending.get(key)
+        return (pending[0] if pending else 0) + self._inflight.get(key, 0)
+
+    def incr(self, key: str, expiry: float, elastic_expiry: bool = False, amount: int = 1) -> int:
+        now = time.time()
+        with self._lock:
+            try:
+                return self._add(self._conn, key, expiry, elastic_expiry, amount, now) + self._unwritten(key)
+            except sqlite3.OperationalError:
+                pass  # another worker is writing; leave the hit to the writer thread
+            pending = self._pending.setdefault(key, [0, expiry, elastic_expiry])
+            pending[0] += amount
+            value = self._read(key, now) + self._unwritten(key)
+        self._wakeup.set()
+        return value
+
+    def _read(self, key: str, now: float) -> int:
+        try:
+            row = self._conn.execute("SELECT value FROM limits WHERE key = ? AND expires_at > ?", (key, now)).fetchone()
+        except sqlite3.OperationalError:
+            return 0
+        return row[0] if row else 0
+
+    def _writer(self) -> None:
+        """Write hits that found the file locked, and checkpoint the WAL now and then"""
+        conn = self._connect(timeout=5)
+        last_checkpoint = time.monotonic()
+        while True:
+            self._wakeup.wait(_CHECKPOINT_INTERVAL_SECONDS)
+            self._wakeup.clear()
+            time.sleep(RATELIMIT_SYNC_INTERVAL_SECONDS)  # gather the hits of a burst into one pass
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                self._inflight = {key: amount for key, (amount, _, _) in pending.items()}
+            for key, (amount, expiry, elastic_expiry) in pending.items():
+                try:
+                    self._add(conn, key, expiry, elastic_expiry, amount, time.time())
+                except sqlite3.Error as e:
+                    logger.error(f"Could not write {amount} rate-limit hits for {key}: {e}")
+                with self._lock:
+                    self._inflight.pop(key, None)
+            if time.monotonic() - last_checkpoint >= _CHECKPOINT_INTERVAL_SECONDS:
+                last_checkpoint = time.monotonic()
+                try:
+                    conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+                except sqlite3.Error as e:
+                    logger.error(f"Rate-limit WAL checkpoint failed: {e}")
+
+    def get(self, key: str) -> int:
+        with self._lock:
+            return self._read(key, time.time()) + self._unwritten(key)
+
+    def get_expiry(self, key: str) -> float:
+        with self._lock:
+            row = self._conn.execute("SELECT expires_at FROM limits WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else time.time()
+
+    def check(self) -> bool:
+        try:
+            with self._lock:
+                self._conn.execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> Optional[int]:
+        with self._lock:
+            self._pending.clear()
+            return self._conn.execute("DELETE FROM limits").rowcount
+
+    def clear(self, key: str) -> None:
+        with self._lock:
+            self._pending.pop(key, None)
+            self._conn.execute("DELETE FROM limits WHERE key = ?", (key,))
@@ -0,0 +1,281 @@
+"""
+Chunked, resumable uploads for large workbooks.
+
+A client announces a file (POST /api/uploads), sends it as a series of
+PUTs each carrying the offset it starts at, can ask how much has arrived
+after a dropped connection, and finalizes once every byte is there. Each
+chunk is streamed straight into a spool file, so neither a retry nor the
+server's memory scales with the size of the workbook, only of the chunk.
+
+The spool directory is the only state: the bytes received so far are the
+length of <id>.part and the announced file lives in <id>.json, so any
+worker process on the host can take the next chunk. A request holds an
+exclusive flock on the .part file while it checks the offset and writes,
+so two workers never append the same chunk twice; the loser gets a 409 and
+the client asks for the offset again. Finalizing renames the .part file
+under the same lock, which lets exactly one request hand the file to the
+parse pipeline. If that request fails for a reason that may pass on a
+retry (the client disconnected, processing failed), the file is renamed
+back to .part so it can be finalized again; it is discarded once it has
+been parsed, rejected as invalid, or failed its checksum.
+"""
+
+import asyncio
+import fcntl
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+import uuid
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, BinaryIO, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+RESUMABLE_UPLOAD_DIR = os.getenv("RESUMABLE_UPLOAD_DIR", os.path.join(tempfile.gettempdir(), "mform_resumable_uploads"))
+# Chunk size suggested to clients, and the largest chunk accepted
+RESUMABLE_CHUNK_SIZE = int(os.getenv("RESUMABLE_CHUNK_SIZE", str(1024 * 1024)))
+RESUMABLE_MAX_CHUNK_SIZE = int(os.getenv("RESUMABLE_MAX_CHUNK_SIZE", str(8 * 1024 * 1024)))
+# Uploads with no chunk for this long are discarded
+RESUMABLE_UPLOAD_RETENTION_SECONDS = float(os.getenv("RESUMABLE_UPLOAD_RETENTION_SECONDS", "86400"))
+
+_UPLOAD_ID = re.compile(r"^[0-9a-f]{32}$")
+_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+
+
+class ResumableUploadError(Exception):
+    """A request the upload cannot accept; `status_code` and `error_type` go into the HTTP error."""
+
+    def __init__(self, status_code: int, error_type: str, message: str, offset: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.error_type = error_type
+        self.message = message
+        self.offset = offset
+
+    def detail(self) -> Dict[str, Any]:
+        detail = {"error": "Upload rejected", "message": self.message, "error_type": self.error_type}
+        if self.offset is not None:
+            detail["offset"] = self.offset
+        return detail
+
+
+class ResumableUploadManager:
+    """Spools chunked uploads to disk and verifies them before they are parsed."""
+
+    def __init__(
+        self,
+        upload_dir: str = RESUMABLE_UPLOAD_DIR,
+        max_file_size: int = 50 * 1024 * 1024,
+        chunk_size: int = RESUMABLE_CHUNK_SIZE,
+        max_chunk_size: int = RESUMABLE_MAX_CHUNK_SIZE,
+        retention: float = RESUMABLE_UPLOAD_RETENTION_SECONDS,
+    ):
+        self._dir = upload_dir
+        self.max_file_size = max_file_size
+        self.chunk_size = chunk_size
+        self.max_chunk_size = max_chunk_size
+        self._retention = retention
+        # Chunks of one upload are written one at a time within a process
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def _path(self, upload_id: str, suffix: str) -> str:
+        return os.path.join(self._dir, f"{upload_id}.{suffix}")
+
+    def _load(self, upload_id: str) -> Dict[str, Any]:
+        if not _UPLOAD_ID.match(upload_id):
+            raise ResumableUploadError(404, "UPLOAD_NOT_FOUND", "Upload not found.")
+        try:
+            with open(self._path(upload_id, "json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            raise ResumableUploadError(404, "UPLOAD_NOT_FOUND", "Upload not found or expired.")
+
+    def _offset(self, upload_id: str) -> int:
+        try:
+            return os.path.getsize(self._path(upload_id, "part"))
+        except OSError:
+            raise ResumableUploadError(409, "UPLOAD_FINALIZING", "Upload is already being finalized.")
+
+    @contextmanager
+    def _claim(self, upload_id: str) -> Iterator[BinaryIO]:
+        """Open <id>.part holding an exclusive flock on it, shared by every worker process on the host"""
+        path = self._path(upload_id, "part")
+        try:
+            part = open(path, "r+b")
+        except OSError:
+            raise ResumableUploadError(409, "UPLOAD_FINALIZING", "Upload is already being finalized.")
+        with part:
+            try:
+                fcntl.flock(part.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise ResumableUploadError(409, "UPLOAD_BUSY", "Another request is writing or finalizing this upload.")
+            try:
+                # Finalized between our open() and flock(): the file is no longer the .part
+                if os.stat(path).st_ino != os.fstat(part.fileno()).st_ino:
+                    raise OSError
+            except OSError:
+                raise ResumableUploadError(409, "UPLOAD_FINALIZING", "Upload is already being finalized.")
+            yield part
+
+    def _status(self, meta: Dict[str, Any], offset: int) -> Dict[str, Any]:
+        return {
+            **meta,
+            "offset": offset,
+            "complete": offset == meta["size"],
+            "chunk_size": self.chunk_size,
+            "max_chunk_size": self.max_chunk_size,
+        }
+
+    # ---------------------------------------------------------------------------
+    # Protocol
+    # ---------------------------------------------------------------------------
+
+    def create(self, filename: str, size: int, sha256: Optional[str] = None) -> Dict[str, Any]:
+        """Announce a file of `size` bytes; `sha256` (hex) is checked on finalize"""
+        if not filename.endswith((".xls", ".xlsx")):
+            raise ResumableUploadError(400, "INVALID_FILE_FORMAT", "Only Excel files (.xls, .xlsx) are supported.")
+        if size <= 0:
+            raise ResumableUploadError(400, "EMPTY_FILE", f"The file '{filename}' is empty (0 bytes).")
+        if size > self.max_file_size:
+            raise ResumableUploadError(413, "FILE_TOO_LARGE", f"File exceeds the {self.max_file_size // (1024 * 1024)} MB limit.")
+        if sha256 is not None and not _SHA256.match(sha256.lower()):
+            raise ResumableUploadError(400, "INVALID_CHECKSUM", "sha256 must be 64 hexadecimal characters.")
+
+        self._prune()
+        os.makedirs(self._dir, exist_ok=True)
+        meta = {
+            "upload_id": uuid.uuid4().hex,
+            "filename": filename,
+            "size": size,
+            "sha256": sha256.lower() if sha256 else None,
+            "created_at": time.time(),
+        }
+        open(self._path(meta["upload_id"], "part"), "wb").close()
+        with open(self._path(meta["upload_id"], "json"), "w") as f:
+            json.dump(meta, f)
+        logger.info(f"Started resumable upload {meta['upload_id']} of {filename} ({size} bytes)")
+        return self._status(meta, 0)
+
+    def status(self, upload_id: str) -> Dict[str, Any]:
+        meta = self._load(upload_id)
+        return self._status(meta, self._offset(upload_id))
+
+    async def write_chunk(
+        self,
+        upload_id: str,
+        offset: int,
+        chunks: AsyncIterator[bytes],
+        sha256: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Append the streamed chunk starting at `offset`; a chunk that fails is discarded whole.
+
+        `offset` must equal the bytes received so far; otherwise 409 with the
+        current offset, so a client that lost a response can resume from it.
+        """
+        meta = self._load(upload_id)
+        lock = self._locks.setdefault(upload_id, asyncio.Lock())
+        async with lock:
+            with self._claim(upload_id) as out:
+                current = os.fstat(out.fileno()).st_size
+                if offset != current:
+                    raise ResumableUploadError(409, "OFFSET_MISMATCH", f"Expected a chunk at offset {current}.", offset=current)
+
+                digest = hashlib.sha256()
+                written = 0
+                try:
+                    out.seek(offset)
+                    async for data in chunks:
+                        written += len(data)
+                        if written > self.max_chunk_size:
+                            raise ResumableUploadError(413, "CHUNK_TOO_LARGE", f"Chunks may be at most {self.max_chunk_size} bytes.", offset=offset)
+                        if offset + written > meta["size"]:
+                            raise ResumableUploadError(400, "SIZE_EXCEEDED", f"The upload was announced as {meta['size']} bytes.", offset=offset)
+                        digest.update(data)
+                        await asyncio.to_thread(out.write, data)
+                    if sha256 is not None and digest.hexdigest() != sha256.lower():
+                        raise ResumableUploadError(400, "CHECKSUM_MISMATCH", "Chunk checksum does not match its contents.", offset=offset)
+                    out.flush()
+                except BaseException:
+                    # Drop the partial chunk so the offset stays on a chunk boundary
+                    _truncate(out, offset)
+                    raise
+        return self._status(meta, offset + written)
+
+    @asynccontextmanager
+    async def finalize(self, upload_id: str):
+        """Claim a complete upload and yield its metadata with the spooled file's `path`.
+
+        The upload is removed when the block exits normally or the file fails
+        its checksum. If the block raises anything else the file goes back to
+        <id>.part, so the client can finalize again without re-sending it.
+        """
+        meta = self._load(upload_id)
+        path = self._path(upload_id, "final")
+        with self._claim(upload_id) as part:
+            offset = os.fstat(part.fileno()).st_size
+            if offset != meta["size"]:
+                raise ResumableUploadError(409, "UPLOAD_INCOMPLETE", f"Only {offset} of {meta['size']} bytes have been received.", offset=offset)
+            os.rename(self._path(upload_id, "part"), path)
+        try:
+            if meta["sha256"] and await asyncio.to_thread(_sha256_file, path) != meta["sha256"]:
+                raise ResumableUploadError(400, "CHECKSUM_MISMATCH", "The assembled file does not match the announced sha256.")
+            yield {**meta, "path": path}
+        except ResumableUploadError:
+            self.remove(upload_id)
+            raise
+        except BaseException:
+            self._reopen(upload_id)
+            raise
+        self.remove(upload_id)
+
+    def _reopen(self, upload_id: str) -> None:
+        """Put a claimed file back as <id>.part after a finalize that may succeed on retry"""
+        try:
+            os.rename(self._path(upload_id, "final"), self._path(upload_id, "part"))
+            logger.info(f"Resumable upload {upload_id} kept for another finalize")
+        except OSError as e:
+            logger.error(f"Could not reopen resumable upload {upload_id}: {e}")
+
+    def remove(self, upload_id: str) -> bool:
+        if not _UPLOAD_ID.match(upload_id):
+            return False
+        self._locks.pop(upload_id, None)
+        removed = False
+        for suffix in ("part", "final", "json"):
+            try:
+                os.remove(self._path(upload_id, suffix))
+                removed = True
+            except OSError:
+                pass
+        return removed
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self._retention
+        for path in glob.glob(self._path("*", "json")):
+            upload_id = os.path.basename(path).split(".", 1)[0]
+            part = self._path(upload_id, "part")
+            try:
+                if os.path.getmtime(part if os.path.exists(part) else path) < cutoff:
+                    self.remove(upload_id)
+            except OSError:
+                pass
+
+
+def _sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _truncate(f: BinaryIO, size: int) -> None:
+    try:
+        f.truncate(size)
+    except OSError:
+        pass
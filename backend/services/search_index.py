@@ -0,0 +1,263 @@
+"""
+In-process inverted index behind GET /api/forms/search.
+
+SearchIndex maps every word of a form's title, question titles and option
+labels to the forms (and the fields within them) that contain it, so a
+query costs a few dictionary lookups no matter how many forms are stored.
+Hits are ranked by IDF weighted by where the word occurs (form title over
+question title over option label), and each hit carries highlight offsets.
+
+Every repository write advances the catalogue revision and logs, under the
+new revision, the ids of the forms it wrote. Before answering, the index
+compares the catalogue revision with the one it last synced to and, if it
+moved, asks the repository which forms changed since and re-reads only
+those. The log lives in the store, so this works the same in every worker
+process. The whole catalogue is listed only to build the index the first
+time (done by the startup warmup, so not on a user's first search) or when
+the log no longer reaches back to the indexed revision.
+"""
+
+import asyncio
+import bisect
+import logging
+import math
+import os
+import re
+from collections import defaultdict
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+SEARCH_PAGE_SIZE = 20
+# Forms whose questions/options are read concurrently while syncing
+SEARCH_SYNC_CONCURRENCY = int(os.getenv("SEARCH_SYNC_CONCURRENCY", "8"))
+# Highlighted fields returned per hit
+SEARCH_MAX_HIGHLIGHTS = int(os.getenv("SEARCH_MAX_HIGHLIGHTS", "3"))
+
+FIELD_WEIGHTS = {"title": 3.0, "question": 2.0, "option": 1.0}
+# Form fields listed while syncing and returned with each hit
+SUMMARY_FIELDS = ("title", "language", "version", "created_at", "revision", "questions_count", "options_count")
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[Tuple[str, int, int]]:
+    """(normalised word, start, end) for every word in text"""
+    return [(m.group().casefold(), m.start(), m.end()) for m in _TOKEN.finditer(text or "")]
+
+
+class _Field(NamedTuple):
+    kind: str
+    order: Optional[int]
+    text: str
+
+
+class _IndexedForm(NamedTuple):
+    revision: int
+    summary: Dict[str, Any]
+    fields: List[_Field]
+    words: Set[str]
+
+
+class SearchIndex:
+    """Word -> form postings over form titles, question titles and option labels."""
+
+    def __init__(self):
+        self._forms: Dict[str, _IndexedForm] = {}
+        # word -> form_id -> indexes into that form's fields
+        self._postings: Dict[str, Dict[str, Set[int]]] = defaultdict(dict)
+        self._vocabulary: List[str] = []
+        self._vocabulary_stale = False
+        self._repository = None
+        self._revision: Optional[int] = None
+        self._lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._forms)
+
+    def clear(self) -> None:
+        self._forms.clear()
+        self._postings.clear()
+        self._vocabulary = []
+        self._vocabulary_stale = False
+        self._repository = None
+        self._revision = None
+
+    # ---------------------------------------------------------------------------
+    # Maintenance
+    # ---------------------------------------------------------------------------
+
+    def add_form(self, form: Dict[str, Any], questions: List[Dict[str, Any]], options: List[Dict[str, Any]]) -> None:
+        """Index (or re-index) one form with its rows"""
+        form_id = form["id"]
+        self.remove_form(form_id)
+        fields = [_Field("title", None, str(form.get("title") or ""))]
+        fields.extend(_Field("question", q.get("order"), str(q.get("title") or "")) for q in questions)
+        fields.extend(_Field("option", o.get("order"), str(o.get("label") or "")) for o in options)
+
+        words: Set[str] = set()
+        for i, field in enumerate(fields):
+            for word, _, _ in tokenize(field.text):
+                self._postings[word].setdefault(form_id, set()).add(i)
+                words.add(word)
+        summary = {k: v for k, v in form.items() if k != "revision"}
+        self._forms[form_id] = _IndexedForm(int(form.get("revision") or 0), summary, fields, words)
+        self._vocabulary_stale = True
+
+    def remove_form(self, form_id: str) -> None:
+        indexed = self._forms.pop(form_id, None)
+        if indexed is None:
+            return
+        for word in indexed.words:
+            postings = self._postings.get(word)
+            if postings is not None:
+                postings.pop(form_id, None)
+                if not postings:
+                    del self._postings[word]
+        self._vocabulary_stale = True
+
+    async def sync(self, repository) -> None:
+        """Bring the index up to date with the repository's current catalogue revision"""
+        revision = await repository.get_catalogue_revision()
+        if repository is self._repository and revision == self._revision:
+            return
+        async with self._lock:
+            if repository is self._repository and revision == self._revision:
+                return
+            if repository is not self._repository:
+                self.clear()
+                self._repository = repository
+
+            changed = None if self._revision is None else await repository.get_form_changes(self._revision)
+            if changed is None:
+                stale = await self._list_stale(repository, revision)
+            else:
+                stale = await self._changed_stale(repository, changed)
+
+            semaphore = asyncio.Semaphore(SEARCH_SYNC_CONCURRENCY)
+
+            async def load(form: Dict[str, Any]):
+                async with semaphore:
+                    questions = await repository.get_questions_by_form_id(form["id"])
+                    options = await repository.get_options_by_form_id(form["id"])
+                    return form, questions, options
+
+            for form, questions, options in await asyncio.gather(*(load(form) for form in stale)):
+                self.add_form(form, questions, options)
+            self._revision = revision
+            if stale:
+                how = "whole catalogue listed" if changed is None else f"{len(changed)} forms changed"
+                logger.info(f"Search index synced to catalogue revision {revision} ({how}): {len(stale)} forms re-indexed, {len(self._forms)} indexed")
+
+    def _is_stale(self, form: Dict[str, Any]) -> bool:
+        indexed = self._forms.get(form["id"])
+        return indexed is None or indexed.revision != int(form.get("revision") or 0)
+
+    async def _list_stale(self, repository, revision: int) -> List[Dict[str, Any]]:
+        """Summaries of the forms to re-index, found by listing every form"""
+        listed: Dict[str, Dict[str, Any]] = {}
+        cursor = None
+        while True:
+            page = await repository.get_forms_page(1000, cursor, SUMMARY_FIELDS, revision=revision)
+            listed.update((form["id"], form) for form in page["forms"])
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+        for form_id in set(self._forms) - set(listed):
+            self.remove_form(form_id)
+        return [form for form in listed.values() if self._is_stale(form)]
+
+    async def _changed_stale(self, repository, form_ids: List[str]) -> List[Dict[str, Any]]:
+        """Summaries of the forms to re-index among those the change log names"""
+        semaphore = asyncio.Semaphore(SEARCH_SYNC_CONCURRENCY)
+
+        async def read(form_id: str):
+            async with semaphore:
+                return form_id, await repository.get_form_by_id(form_id)
+
+        stale = []
+        for form_id, form in await asyncio.gather(*(read(form_id) for form_id in form_ids)):
+            if form is None:
+                self.remove_form(form_id)
+                continue
+            summary = {"id": form_id, **{k: form[k] for k in SUMMARY_FIELDS if k in form}}
+            if self._is_stale(summary):
+                stale.append(summary)
+        return stale
+
+    # ---------------------------------------------------------------------------
+    # Queries
+    # ---------------------------------------------------------------------------
+
+    def _expand(self, term: str, prefix: bool) -> List[str]:
+        """Indexed words matching a query term (by prefix for the word being typed)"""
+        if not prefix:
+            return [term] if term in self._postings else []
+        if self._vocabulary_stale:
+            self._vocabulary = sorted(self._postings)
+            self._vocabulary_stale = False
+        start = bisect.bisect_left(self._vocabulary, term)
+        end = bisect.bisect_left(self._vocabulary, term + "\U0010ffff")
+        return self._vocabulary[start:end]
+
+    def search(self, query: str, limit: int = SEARCH_PAGE_SIZE, offset: int = 0) -> Dict[str, Any]:
+        """Forms containing every query word (the last one as a prefix), best first.
+
+        Returns {"query", "hits", "count", "total", "next_offset"}; each hit has
+        the form summary, its score and highlighted fields with the matched
+        character ranges.
+        """
+        terms = [word for word, _, _ in tokenize(query)]
+        matches: Optional[Dict[str, Dict[int, Set[str]]]] = None
+        term_hits: List[Dict[str, float]] = []
+        for i, term in enumerate(terms):
+            words = self._expand(term, prefix=i == len(terms) - 1)
+            found: Dict[str, Dict[int, Set[str]]] = defaultdict(lambda: defaultdict(set))
+            for word in words:
+                for form_id, field_ids in self._postings[word].items():
+                    for field_id in field_ids:
+                        found[form_id][field_id].add(word)
+            if matches is None:
+                matches = found
+            else:
+                matches = {form_id: fields for form_id, fields in matches.items() if form_id in found}
+                for form_id, fields in matches.items():
+                    for field_id, words_in_field in found[form_id].items():
+                        fields.setdefault(field_id, set()).update(words_in_field)
+            idf = math.log(1 + len(self._forms) / max(1, len(found)))
+            term_hits.append({
+                form_id: idf * max(FIELD_WEIGHTS[self._forms[form_id].fields[f].kind] for f in fields)
+                for form_id, fields in found.items()
+            })
+            if not matches:
+                break
+
+        ranked = []
+        for form_id in matches or {}:
+            score = sum(hits[form_id] for hits in term_hits)
+            ranked.append((-score, str(self._forms[form_id].summary.get("title") or ""), form_id, score))
+        ranked.sort()
+
+        hits = [
+            {
+                "form": self._forms[form_id].summary,
+                "score": round(score, 4),
+                "highlights": self._highlights(form_id, matches[form_id]),
+            }
+            for _, _, form_id, score in ranked[offset:offset + limit]
+        ]
+        next_offset = offset + limit if offset + limit < len(ranked) else None
+        return {"query": query, "hits": hits, "count": len(hits), "total": len(ranked), "next_offset": next_offset}
+
+    def _highlights(self, form_id: str, fields: Dict[int, Set[str]]) -> List[Dict[str, Any]]:
+        indexed = self._forms[form_id]
+        best = sorted(fields, key=lambda f: (-FIELD_WEIGHTS[indexed.fields[f].kind], -len(fields[f]), f))
+        highlights = []
+        for field_id in best[:SEARCH_MAX_HIGHLIGHTS]:
+            field = indexed.fields[field_id]
+            spans = [[start, end] for word, start, end in tokenize(field.text) if word in fields[field_id]]
+            highlights.append({"field": field.kind, "order": field.order, "text": field.text, "matches": spans})
+        return highlights
+
+
+search_index = SearchIndex()
@@ -0,0 +1,573 @@
+"""
+Embedded SQLite implementation of FormRepository.
+
+Selected with STORAGE_BACKEND=sqlite: the whole upload pipeline then runs
+against a single local file with no MongoDB server, which suits single-node
+deployments and offline benchmarking. Bundles are written in one
+transaction with executemany, and questions/options are indexed on
+(form_id, order).
+
+sqlite3 is blocking, so statements run off the event loop on two dedicated
+threads, each with its own connection: one for writes and one (query_only)
+for reads. The file is in WAL mode, so a read sees the last committed state
+without waiting for a write in progress, and reads never hold up writes.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Sequence, Tuple
+
+from bson import ObjectId
+
+from services.form_cache import form_cache
+from services.form_repository import (
+    FORM_CHANGES_KEPT,
+    OPTION_DIFF_FIELDS,
+    QUESTION_DIFF_FIELDS,
+    DuplicateFormError,
+    FormRepository,
+    changed_form_ids,
+    counter_increments,
+    decode_forms_cursor,
+    diff_rows,
+    encode_forms_cursor,
+    form_counters,
+    option_key,
+    question_key,
+    validate_field_names,
+)
+
+logger = logging.getLogger(__name__)
+
+SQLITE_PATH = os.getenv("SQLITE_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "mform.sqlite3"))
+# Rows fetched per round trip to the SQLite thread when streaming
+SQLITE_FETCH_SIZE = int(os.getenv("SQLITE_FETCH_SIZE", "1000"))
+
+# Form columns stored outside the JSON document so they can be indexed/updated in SQL
+_FORM_COLUMNS = ('created_at', 'updated_at', 'revision', 'fingerprint', 'source_sha256')
+QUESTION_COLUMNS = ('order', 'title', 'view_sequence', 'input_type', 'created_at')
+OPTION_COLUMNS = ('order', 'option_id', 'label', 'created_at')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS forms (
+    id TEXT PRIMARY KEY,
+    created_at TEXT,
+    updated_at TEXT,
+    revision INTEGER NOT NULL DEFAULT 1,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS forms_created_at ON forms (created_at DESC, id DESC);
+CREATE TABLE IF NOT EXISTS questions (
+    id TEXT PRIMARY KEY,
+    form_id TEXT NOT NULL,
+    "order" INTEGER,
+    title TEXT,
+    view_sequence INTEGER,
+    input_type INTEGER,
+    created_at TEXT
+);
+CREATE INDEX IF NOT EXISTS questions_form_order ON questions (form_id, "order");
+CREATE TABLE IF NOT EXISTS options (
+    id TEXT PRIMARY KEY,
+    form_id TEXT NOT NULL,
+    "order" INTEGER,
+    option_id INTEGER,
+    label TEXT,
+    created_at TEXT
+);
+CREATE INDEX IF NOT EXISTS options_form_order ON options (form_id, "order");
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS form_changes (
+    revision INTEGER PRIMARY KEY,
+    form_ids TEXT
+);
+"""
+
+# Columns added after the first schema; applied to existing files on open
+_FORM_UPGRADES = {
+    'fingerprint': "ALTER TABLE forms ADD COLUMN fingerprint TEXT",
+    'source_sha256': "ALTER TABLE forms ADD COLUMN source_sha256 TEXT",
+}
+_INDEXES = """
+CREATE UNIQUE INDEX IF NOT EXISTS forms_fingerprint ON forms (fingerprint) WHERE fingerprint IS NOT NULL;
+CREATE INDEX IF NOT EXISTS forms_source_sha256 ON forms (source_sha256) WHERE source_sha256 IS NOT NULL;
+"""
+
+
+def _utc_now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _insert_sql(table: str, columns: Sequence[str]) -> str:
+    names = ", ".join(f'"{c}"' for c in ('id', 'form_id', *columns))
+    return f"INSERT INTO {table} ({names}) VALUES ({', '.join('?' * (len(columns) + 2))})"
+
+
+def _row_values(row: Dict[str, Any], row_id: str, form_id: str, columns: Sequence[str]) -> Tuple[Any, ...]:
+    return (row_id, form_id, *(row.get(c) for c in columns))
+
+
+@contextmanager
+def _transaction(conn: sqlite3.Connection):
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def _bump_catalogue_revision(conn: sqlite3.Connection, form_ids: Optional[List[str]]) -> None:
+    """Advance the catalogue revision, logging the forms written (None = all of them)"""
+    conn.execute(
+        "INSERT INTO counters (name, value) VALUES ('forms', 1) "
+        "ON CONFLICT (name) DO UPDATE SET value = value + 1"
+    )
+    revision = conn.execute("SELECT value FROM counters WHERE name = 'forms'").fetchone()[0]
+    conn.execute(
+        "INSERT INTO form_changes (revision, form_ids) VALUES (?, ?)",
+        (revision, None if form_ids is None else json.dumps(form_ids)),
+    )
+    conn.execute("DELETE FROM form_changes WHERE revision <= ?", (revision - FORM_CHANGES_KEPT,))
+
+
+def _add_counters(doc: Dict[str, Any], increments: Dict[str, int]) -> None:
+    """Apply counter_increments to a form document"""
+    for name, n in increments.items():
+        if name.startswith("input_type_counts."):
+            histogram = doc.setdefault("input_type_counts", {})
+            input_type = name.split(".", 1)[1]
+            histogram[input_type] = histogram.get(input_type, 0) + n
+        else:
+            doc[name] = doc.get(name, 0) + n
+
+
+def _form_from_row(row: sqlite3.Row) -> Dict[str, Any]:
+    form = json.loads(row['doc'])
+    for column in _FORM_COLUMNS:
+        # Like MongoDB documents, forms without a fingerprint have no such key
+        if row[column] is not None or column == 'created_at':
+            form[column] = row[column]
+    if form.get('version') in (None, ''):
+        form['version'] = '1.0.0'
+    form['id'] = row['id']
+    return form
+
+
+class SQLiteFormRepository(FormRepository):
+    """FormRepository on an embedded SQLite file."""
+
+    def __init__(self, path: str = SQLITE_PATH):
+        self._path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._read_conn: Optional[sqlite3.Connection] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-repository")
+        self._read_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-repository-read")
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run on the write thread"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def _read(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run on the read thread"""
+        if self._conn is None:
+            await self._run(self._connection)  # creates the schema
+        return await asyncio.get_running_loop().run_in_executor(self._read_executor, fn, *args)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Open the database on first use (SQLite thread only)"""
+        if self._conn is None:
+            conn = sqlite3.connect(self._path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            existing = {row['name'] for row in conn.execute("PRAGMA table_info(forms)")}
+            for column, ddl in _FORM_UPGRADES.items():
+                if column not in existing:
+                    conn.execute(ddl)
+            conn.executescript(_INDEXES)
+            self._conn = conn
+            logger.info(f"Opened SQLite store at {self._path}")
+        return self._conn
+
+    def _reader(self) -> sqlite3.Connection:
+        """The read connection, opened on first use (read thread only)"""
+        if self._read_conn is None:
+            conn = sqlite3.connect(self._path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA query_only=ON")
+            self._read_conn = conn
+        return self._read_conn
+
+    # ---------------------------------------------------------------------------
+    # Lifecycle
+    # ---------------------------------------------------------------------------
+
+    async def connect(self) -> None:
+        await self._run(self._connection)
+        await self._read(self._reader)
+
+    async def close(self) -> None:
+        def _close_reader():
+            if self._read_conn is not None:
+                self._read_conn.close()
+                self._read_conn = None
+
+        def _close():
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        await asyncio.get_running_loop().run_in_executor(self._read_executor, _close_reader)
+        await self._run(_close)
+
+    # ---------------------------------------------------------------------------
+    # Writes
+    # ---------------------------------------------------------------------------
+
+    def _insert_form(self, conn: sqlite3.Connection, form_id: str, form_data: Dict[str, Any]) -> None:
+        form_data.pop('id', None)
+        form_data['revision'] = 1
+        form_data['updated_at'] = _utc_now()
+        doc = {k: v for k, v in form_data.items() if k not in _FORM_COLUMNS}
+        try:
+            conn.execute(
+                "INSERT INTO forms (id, created_at, updated_at, revision, fingerprint, source_sha256, doc) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    form_id, form_data.get('created_at'), form_data['updated_at'], 1,
+                    form_data.get('fingerprint'), form_data.get('source_sha256'), json.dumps(doc, default=str),
+                ),
+            )
+        except sqlite3.IntegrityError as e:
+            if form_data.get('fingerprint') and 'forms.fingerprint' in str(e):
+                raise DuplicateFormError(form_data['fingerprint']) from e
+            raise
+
+    def _insert_rows(self, conn: sqlite3.Connection, table: str, columns: Sequence[str], rows: List[Dict[str, Any]], form_id: str) -> List[str]:
+        ids = [str(ObjectId()) for _ in rows]
+        for row in rows:
+            row['form_id'] = form_id
+        conn.executemany(_insert_sql(table, columns), [_row_values(row, i, form_id, columns) for row, i in zip(rows, ids)])
+        return ids
+
+    def _touch_form(self, conn: sqlite3.Connection, form_id: str, increments: Optional[Dict[str, int]] = None) -> None:
+        conn.execute("UPDATE forms SET revision = revision + 1, updated_at = ? WHERE id = ?", (_utc_now(), form_id))
+        if increments:
+            row = conn.execute("SELECT doc FROM forms WHERE id = ?", (form_id,)).fetchone()
+            if row is not None:
+                doc = json.loads(row['doc'])
+                _add_counters(doc, increments)
+                conn.execute("UPDATE forms SET doc = ? WHERE id = ?", (json.dumps(doc, default=str), form_id))
+        _bump_catalogue_revision(conn, [form_id])
+
+    async def save_form(self, form_data: Dict[str, Any]) -> str:
+        """Save form metadata to database"""
+        form_id = str(ObjectId())
+        form_data.update(form_counters([], []))
+
+        def _save():
+            conn = self._connection()
+            with _transaction(conn):
+                self._insert_form(conn, form_id, form_data)
+                _bump_catalogue_revision(conn, [form_id])
+
+        try:
+            await self._run(_save)
+            form_cache.invalidate_lists()
+            logger.info(f"Form saved with ID: {form_id}")
+            return form_id
+        except Exception as e:
+            logger.error(f"Error saving form: {e}")
+            raise e
+
+    async def _save_children(self, table: str, columns: Sequence[str], rows: List[Dict[str, Any]], form_id: str, increments: Dict[str, int]) -> List[str]:
+        if not rows:
+            return []
+
+        def _save():
+            conn = self._connection()
+            with _transaction(conn):
+                ids = self._insert_rows(conn, table, columns, rows, form_id)
+                self._touch_form(conn, form_id, increments)
+            return ids
+
+        ids = await self._run(_save)
+        form_cache.invalidate_form(form_id)
+        logger.info(f"Saved {len(rows)} {table} for form {form_id}")
+        return ids
+
+    async def save_questions(self, questions: List[Dict[str, Any]], form_id: str) -> List[str]:
+        """Save questions to database"""
+        try:
+            return await self._save_children("questions", QUESTION_COLUMNS, questions, form_id, counter_increments(questions, []))
+        except Exception as e:
+            logger.error(f"Error saving questions: {e}")
+            raise e
+
+    async def save_options(self, options: List[Dict[str, Any]], form_id: str) -> List[str]:
+        """Save answer options to database"""
+        try:
+            return await self._save_children("options", OPTION_COLUMNS, options, form_id, counter_increments([], options))
+        except Exception as e:
+            logger.error(f"Error saving options: {e}")
+            raise e
+
+    async def save_form_bundle(self, form_data: Dict[str, Any], questions: List[Dict[str, Any]], options: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Save a form with its questions and options in one transaction"""
+        form_id = str(ObjectId())
+        form_data.update(form_counters(questions, options))
+        submitted_at = time.time()
+
+        def _save():
+            queued_time = time.time() - submitted_at
+            conn = self._connection()
+            with _transaction(conn):
+                start_form = time.time()
+                self._insert_form(conn, form_id, form_data)
+                form_time = time.time() - start_form
+
+                start_q = time.time()
+                question_ids = self._insert_rows(conn, "questions", QUESTION_COLUMNS, questions, form_id)
+                questions_time = time.time() - start_q
+
+                start_o = time.time()
+                option_ids = self._insert_rows(conn, "options", OPTION_COLUMNS, options, form_id)
+                options_time = time.time() - start_o
+
+                _bump_catalogue_revision(conn, [form_id])
+            return {
+                "form_id": form_id,
+                "question_ids": question_ids,
+                "option_ids": option_ids,
+                "queued_time": queued_time,
+                "form_time": form_time,
+                "questions_time": questions_time,
+                "options_time": options_time,
+            }
+
+        try:
+            saved = await self._run(_save)
+        except asyncio.CancelledError:
+            # A save already running on the SQLite thread still commits; the
+            # delete queues behind it on the same thread and undoes it
+            asyncio.get_running_loop().create_task(self.delete_form(form_id))
+            raise
+        finally:
+            form_cache.invalidate_lists()
+        logger.info(f"Form saved with ID: {form_id} ({len(questions)} questions, {len(options)} options)")
+        return saved
+
+    async def update_form(self, form_id: str, form_data: Dict[str, Any], questions: List[Dict[str, Any]], options: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Update form metadata and apply only the question/option rows that changed.
+
+        Same contract as DatabaseService.update_form; everything happens in one
+        transaction.
+        """
+        form_data.pop('id', None)
+        form_data.pop('revision', None)
+        # The update replaces every row, so the counters follow from the new rows alone
+        form_data.update(form_counters(questions, options))
+
+        def _update():
+            conn = self._connection()
+            with _transaction(conn):
+                row = conn.execute("SELECT doc, created_at FROM forms WHERE id = ?", (form_id,)).fetchone()
+                if row is None:
+                    # Diffing rows against a missing form would leave orphan questions and options
+                    return None
+                doc = json.loads(row['doc'])
+                doc.update({k: v for k, v in form_data.items() if k not in _FORM_COLUMNS})
+                conn.execute(
+                    "UPDATE forms SET doc = ?, created_at = ?, updated_at = ?, revision = revision + 1, "
+                    "fingerprint = NULL, source_sha256 = NULL WHERE id = ?",
+                    (json.dumps(doc, default=str), form_data.get('created_at', row['created_at']), _utc_now(), form_id),
+                )
+                question_changes = self._apply_row_diff(conn, "questions", QUESTION_COLUMNS, form_id, questions, question_key, QUESTION_DIFF_FIELDS)
+                option_changes = self._apply_row_diff(conn, "options", OPTION_COLUMNS, form_id, options, option_key, OPTION_DIFF_FIELDS)
+                _bump_catalogue_revision(conn, [form_id])
+            return {"questions": question_changes, "options": option_changes}
+
+        try:
+            changes = await self._run(_update)
+            if changes is None:
+                logger.info(f"Form {form_id} not found; nothing to update")
+                return None
+            form_cache.invalidate_form(form_id)
+            logger.info(f"Updated form {form_id}: questions {changes['questions']}, options {changes['options']}")
+            return changes
+        except Exception as e:
+            logger.error(f"Error updating form: {e}")
+            return None
+
+    def _apply_row_diff(self, conn: sqlite3.Connection, table: str, columns: Sequence[str], form_id: str, rows: List[Dict[str, Any]], key, fields: Sequence[str]) -> Dict[str, int]:
+        """Diff `rows` against the stored rows of a form and write only the differences"""
+        stored = [dict(r) for r in conn.execute(f"SELECT * FROM {table} WHERE form_id = ?", (form_id,))]
+        diff = diff_rows(stored, rows, key, fields, 'id')
+
+        if diff.inserts:
+            self._insert_rows(conn, table, columns, diff.inserts, form_id)
+        for row_id, changed in diff.updates:
+            assignments = ", ".join(f'"{f}" = ?' for f in changed)
+            conn.execute(f"UPDATE {table} SET {assignments} WHERE id = ?", (*changed.values(), row_id))
+        if diff.deletes:
+            conn.executemany(f"DELETE FROM {table} WHERE id = ?", [(row_id,) for row_id in diff.deletes])
+        return diff.counts
+
+    async def delete_form(self, form_id: str) -> bool:
+        """Delete form and all related data"""
+        def _delete():
+            conn = self._connection()
+            with _transaction(conn):
+                forms = conn.execute("DELETE FROM forms WHERE id = ?", (form_id,)).rowcount
+                questions = conn.execute("DELETE FROM questions WHERE form_id = ?", (form_id,)).rowcount
+                options = conn.execute("DELETE FROM options WHERE form_id = ?", (form_id,)).rowcount
+                _bump_catalogue_revision(conn, [form_id])
+            return forms, questions, options
+
+        try:
+            forms, questions, options = await self._run(_delete)
+            form_cache.invalidate_form(form_id)
+            logger.info(f"Deleted form {form_id} with {questions} questions and {options} options")
+            return forms > 0
+        except Exception as e:
+            logger.error(f"Error deleting form: {e}")
+            return False
+
+    async def delete_all_forms(self) -> dict:
+        """Delete all forms and all related data. Returns counts of deleted documents."""
+        def _delete():
+            conn = self._connection()
+            with _transaction(conn):
+                counts = {table: conn.execute(f"DELETE FROM {table}").rowcount for table in ("forms", "questions", "options")}
+                _bump_catalogue_revision(conn, None)
+            return counts
+
+        try:
+            counts = await self._run(_delete)
+            form_cache.clear()
+            logger.info(f"Deleted all forms ({counts['forms']}), questions ({counts['questions']}), and options ({counts['options']})")
+            return counts
+        except Exception as e:
+            logger.error(f"Error deleting all forms: {e}")
+            return {}
+
+    # ---------------------------------------------------------------------------
+    # Reads
+    # ---------------------------------------------------------------------------
+
+    async def _fetchone(self, sql: str, params: Sequence[Any]) -> Optional[sqlite3.Row]:
+        return await self._read(lambda: self._reader().execute(sql, params).fetchone())
+
+    async def get_form_revision(self, form_id: str) -> Optional[int]:
+        """Get a form's revision without loading it; None if the form does not exist"""
+        try:
+            row = await self._fetchone("SELECT revision FROM forms WHERE id = ?", (form_id,))
+            return None if row is None else int(row['revision'])
+        except Exception as e:
+            logger.error(f"Error getting form revision: {e}")
+            return None
+
+    async def get_catalogue_revision(self) -> int:
+        """Revision of the forms catalogue, advanced by every form write"""
+        row = await self._fetchone("SELECT value FROM counters WHERE name = 'forms'", ())
+        return int(row['value']) if row else 0
+
+    async def get_form_changes(self, since: int) -> Optional[List[str]]:
+        """Ids of the forms written after catalogue revision `since` (None if no longer logged)"""
+        def _changes():
+            conn = self._reader()
+            conn.execute("BEGIN")  # one snapshot for the counter and the log
+            try:
+                row = conn.execute("SELECT value FROM counters WHERE name = 'forms'").fetchone()
+                revision = int(row['value']) if row else 0
+                rows = conn.execute("SELECT revision, form_ids FROM form_changes WHERE revision > ?", (since,)).fetchall()
+            finally:
+                conn.execute("COMMIT")
+            return revision, [(r['revision'], None if r['form_ids'] is None else json.loads(r['form_ids'])) for r in rows]
+
+        revision, changes = await self._read(_changes)
+        return changed_form_ids(changes, since, revision)
+
+    async def find_form_by_fingerprint(self, fingerprint: Optional[str] = None, source_sha256: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Find a stored form by upload fingerprint or raw-file hash"""
+        if not fingerprint and not source_sha256:
+            return None
+        row = await self._fetchone(
+            "SELECT * FROM forms WHERE fingerprint = ? OR source_sha256 = ? ORDER BY fingerprint IS NULL, id LIMIT 1", (fingerprint, source_sha256)
+        )
+        return None if row is None else _form_from_row(row)
+
+    async def get_form_by_id(self, form_id: str) -> Optional[Dict[str, Any]]:
+        """Get form by ID"""
+        try:
+            row = await self._fetchone("SELECT * FROM forms WHERE id = ?", (form_id,))
+            return None if row is None else _form_from_row(row)
+        except Exception as e:
+            logger.error(f"Error getting form: {e}")
+            return None
+
+    async def _iter_rows(self, sql: str, params: Sequence[Any]) -> AsyncIterator[Dict[str, Any]]:
+        cursor = await self._read(lambda: self._reader().execute(sql, params))
+        try:
+            while True:
+                rows = await self._read(cursor.fetchmany, SQLITE_FETCH_SIZE)
+                if not rows:
+                    return
+                for row in rows:
+                    yield dict(row)
+        finally:
+            await self._read(cursor.close)
+
+    def iter_questions_by_form_id(self, form_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """Stream all questions for a form, sorted by order"""
+        return self._iter_rows('SELECT * FROM questions WHERE form_id = ? ORDER BY "order", rowid', (form_id,))
+
+    def iter_options_by_form_id(self, form_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """Stream all options for a form, sorted by order (then insertion order)"""
+        return self._iter_rows('SELECT * FROM options WHERE form_id = ? ORDER BY "order", rowid', (form_id,))
+
+    async def _load_forms_page(self, limit: int, cursor: Optional[str], fields: Optional[Sequence[str]]) -> Dict[str, Any]:
+        where, params = "", []
+        if cursor:
+            created_at, form_oid = decode_forms_cursor(cursor)
+            if created_at is None:
+                # Forms without created_at sort last; only older ones of those remain
+                where, params = "WHERE created_at IS NULL AND id < ?", [str(form_oid)]
+            else:
+                where = "WHERE created_at < ? OR (created_at = ? AND id < ?) OR created_at IS NULL"
+                params = [created_at, created_at, str(form_oid)]
+        validate_field_names(fields)
+
+        sql = f"SELECT * FROM forms {where} ORDER BY created_at DESC, id DESC LIMIT ?"
+        rows = await self._read(lambda: self._reader().execute(sql, (*params, limit + 1)).fetchall())
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_forms_cursor(rows[-1]['created_at'], ObjectId(rows[-1]['id']))
+
+        forms = []
+        for row in rows:
+            form = _form_from_row(row)
+            if fields:
+                form = {k: v for k, v in form.items() if k == 'id' or k in fields}
+            forms.append(form)
+        return {"forms": forms, "next_cursor": next_cursor}
+
+    async def count_forms(self) -> int:
+        try:
+            row = await self._fetchone("SELECT COUNT(*) AS n FROM forms", ())
+            return int(row['n'])
+        except Exception as e:
+            logger.error(f"Error counting forms: {e}")
+            return 0
@@ -0,0 +1,302 @@
+"""
+Asynchronous upload jobs.
+
+POST /api/jobs spools the uploaded workbooks to disk, records a job and
+returns its id straight away; a bounded pool of workers then parses and
+stores the files one by one while clients poll GET /api/jobs/{id} for
+per-file status and timings. Work items travel through a JobQueue. The
+in-process InProcessJobQueue is the default and stands in for an external
+broker, which only has to implement the same four methods.
+
+Job status is also written to <spool dir>/<job id>.status.json on every
+change, so with several worker processes a poll that lands on a worker
+other than the one running the job is still answered.
+"""
+
+import asyncio
+import glob
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from starlette.datastructures import UploadFile
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_JOB_WORKERS = int(os.getenv("UPLOAD_JOB_WORKERS", "4"))
+UPLOAD_JOB_RETENTION_SECONDS = float(os.getenv("UPLOAD_JOB_RETENTION_SECONDS", "3600"))
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "mform_upload_jobs"))
+
+# ParsedForm.metadata entries copied into a job file's timings
+JOB_TIMING_KEYS = (
+    "form_process_time",
+    "questions_process_time",
+    "options_process_time",
+    "write_queue_time",
+    "total_form_upload_time",
+)
+
+_JOB_ID = re.compile(r"^[0-9a-f]{32}$")
+
+ProcessFn = Callable[[UploadFile], Awaitable[Dict[str, Any]]]
+PrecheckFn = Callable[[UploadFile], Awaitable[Optional[Dict[str, Any]]]]
+
+
+class JobQueue(ABC):
+    """FIFO of JSON-serialisable work items shared by the job workers."""
+
+    @abstractmethod
+    async def put(self, item: Dict[str, Any]) -> None:
+        ...
+
+    @abstractmethod
+    async def get(self) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    def task_done(self) -> None:
+        ...
+
+    @abstractmethod
+    def qsize(self) -> int:
+        ...
+
+
+class InProcessJobQueue(JobQueue):
+    """asyncio.Queue-backed queue; items are lost if the process exits."""
+
+    def __init__(self, maxsize: int = 0):
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize)
+
+    async def put(self, item: Dict[str, Any]) -> None:
+        await self._queue.put(item)
+
+    async def get(self) -> Dict[str, Any]:
+        return await self._queue.get()
+
+    def task_done(self) -> None:
+        self._queue.task_done()
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+
+class UploadJob:
+    def __init__(self, job_id: str, spool_dir: str):
+        self.id = job_id
+        self.spool_dir = spool_dir
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.files: List[Dict[str, Any]] = []
+
+    def add_file(self, filename: str, error: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        entry = {
+            "index": len(self.files),
+            "filename": filename,
+            "status": "failed" if error else "queued",
+            "form_id": None,
+            "error": error,
+            "timings": {},
+        }
+        self.files.append(entry)
+        return entry
+
+    @property
+    def pending(self) -> int:
+        return sum(1 for f in self.files if f["status"] in ("queued", "processing"))
+
+    @property
+    def status(self) -> str:
+        if self.finished_at is not None:
+            return "completed"
+        return "running" if self.started_at is not None else "queued"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "total": len(self.files),
+            "succeeded": sum(1 for f in self.files if f["status"] == "completed"),
+            "failed": sum(1 for f in self.files if f["status"] == "failed"),
+            "files": self.files,
+        }
+
+
+class UploadJobManager:
+    """Accepts upload jobs and processes their files with a bounded worker pool."""
+
+    def __init__(
+        self,
+        process: ProcessFn,
+        precheck: Optional[PrecheckFn] = None,
+        queue: Optional[JobQueue] = None,
+        workers: int = UPLOAD_JOB_WORKERS,
+        spool_dir: str = UPLOAD_SPOOL_DIR,
+        retention: float = UPLOAD_JOB_RETENTION_SECONDS,
+    ):
+        self._process = process
+        self._precheck = precheck
+        self._queue = queue
+        self._worker_count = max(1, workers)
+        self._spool_dir = spool_dir
+        self._retention = retention
+        self._jobs: Dict[str, UploadJob] = {}
+        self._workers: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        """Start the workers (idempotent; also done by the first submit)."""
+        if self._workers:
+            return
+        if self._queue is None:
+            self._queue = InProcessJobQueue()
+        self._workers = [
+            asyncio.get_running_loop().create_task(self._worker(), name=f"upload-job-worker-{i}")
+            for i in range(self._worker_count)
+        ]
+
+    async def stop(self) -> None:
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def get(self, job_id: str) -> Optional[UploadJob]:
+        return self._jobs.get(job_id)
+
+    def get_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Status of a job run by this process, or as last recorded by the process running it"""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        if not _JOB_ID.match(job_id):
+            return None
+        try:
+            with open(self._status_path(job_id)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _status_path(self, job_id: str) -> str:
+        return os.path.join(self._spool_dir, f"{job_id}.status.json")
+
+    def _save_status(self, job: UploadJob) -> None:
+        path = self._status_path(job.id)
+        try:
+            with open(f"{path}.tmp", "w") as f:
+                json.dump(job.to_dict(), f, default=str)
+            os.replace(f"{path}.tmp", path)
+        except OSError as e:
+            logger.warning(f"Could not record status of upload job {job.id}: {e}")
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(self, files: List[UploadFile]) -> UploadJob:
+        """Spool `files` to disk and queue them; files failing the precheck are marked failed at once."""
+        self.start()
+        self._prune()
+        job_id = uuid.uuid4().hex
+        spool_dir = os.path.join(self._spool_dir, job_id)
+        os.makedirs(spool_dir, exist_ok=True)
+        job = UploadJob(job_id, spool_dir)
+        self._jobs[job_id] = job
+
+        items = []
+        for upload in files:
+            filename = upload.filename or ""
+            error = await self._precheck(upload) if self._precheck is not None else None
+            entry = job.add_file(filename, error)
+            if error:
+                continue
+            path = os.path.join(spool_dir, f"{entry['index']}.upload")
+            with open(path, "wb") as out:
+                await asyncio.to_thread(shutil.copyfileobj, upload.file, out)
+            items.append({"job_id": job_id, "index": entry["index"], "filename": filename, "path": path})
+
+        if not items:
+            self._finish(job)
+        else:
+            self._save_status(job)
+        for item in items:
+            await self._queue.put(item)
+        logger.info(f"Queued upload job {job_id} with {len(items)} of {len(files)} files")
+        return job
+
+    # ---------------------------------------------------------------------------
+    # Workers
+    # ---------------------------------------------------------------------------
+
+    async def _worker(self) -> None:
+        while True:
+            item = await self._queue.get()
+            try:
+                await self._run(item)
+            except Exception as e:
+                logger.error(f"Upload job {item.get('job_id')} file {item.get('index')} crashed: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, item: Dict[str, Any]) -> None:
+        job = self._jobs.get(item["job_id"])
+        if job is None:
+            _remove(item["path"])
+            return
+        entry = job.files[item["index"]]
+        entry["status"] = "processing"
+        start = time.time()
+        if job.started_at is None:
+            job.started_at = start
+        queue_time = start - job.created_at
+
+        try:
+            with open(item["path"], "rb") as fh:
+                result = await self._process(UploadFile(file=fh, filename=item["filename"], size=os.fstat(fh.fileno()).st_size))
+        except Exception as e:
+            logger.error(f"Error processing job file {item['filename']}: {e}")
+            result = {"error": "Processing failed", "filename": item["filename"], "error_type": "PROCESSING_ERROR"}
+        finally:
+            _remove(item["path"])
+
+        if "error" in result:
+            entry.update(status="failed", error=result)
+        else:
+            entry.update(status="completed", form_id=result.get("form_id"))
+        entry["timings"] = {"queue_time": queue_time, **result.get("timings", {}), "job_file_time": time.time() - start}
+        if job.pending == 0:
+            self._finish(job)
+        else:
+            self._save_status(job)
+
+    def _finish(self, job: UploadJob) -> None:
+        job.finished_at = time.time()
+        shutil.rmtree(job.spool_dir, ignore_errors=True)
+        self._save_status(job)
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self._retention
+        for job_id in [j.id for j in self._jobs.values() if j.finished_at is not None and j.finished_at < cutoff]:
+            del self._jobs[job_id]
+        for path in glob.glob(self._status_path("*")):
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,259 @@
+"""
+Live progress of /api/upload batches as Server-Sent Events.
+
+A client picks a progress id, opens GET /api/upload/progress/{id} and sends
+POST /api/upload?progress_id={id}; while the batch runs, every file reports
+when it starts and finishes each stage (size check, decode, validate, save
+form, save questions, save options) with the timings the parser already
+records as metrics. Each batch's events are kept until it has been finished
+for UPLOAD_PROGRESS_RETENTION_SECONDS, so a subscriber that connects late or
+reconnects with Last-Event-ID is replayed what it missed.
+
+Channels live in the process running the upload. With several workers
+(gunicorn.conf.py sets UPLOAD_PROGRESS_PATH), every event is also written
+to a SQLite file on the host, off the event loop, and streams are read from
+that file, so the stream may reach any worker. A subscriber on the worker
+running the batch is woken by the publisher; elsewhere it polls the file
+every UPLOAD_PROGRESS_POLL_SECONDS.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_PROGRESS_RETENTION_SECONDS = float(os.getenv("UPLOAD_PROGRESS_RETENTION_SECONDS", "300"))
+# Seconds between keep-alive comments on an idle stream
+UPLOAD_PROGRESS_KEEPALIVE_SECONDS = float(os.getenv("UPLOAD_PROGRESS_KEEPALIVE_SECONDS", "15"))
+# SQLite file shared by the workers of a host (empty = events stay in the process)
+UPLOAD_PROGRESS_PATH = os.getenv("UPLOAD_PROGRESS_PATH", "")
+UPLOAD_PROGRESS_POLL_SECONDS = float(os.getenv("UPLOAD_PROGRESS_POLL_SECONDS", "0.25"))
+
+_PROGRESS_ID = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+# Events kept per batch; the oldest are dropped beyond this
+_MAX_EVENTS = 20000
+
+
+def valid_progress_id(progress_id: str) -> bool:
+    return bool(_PROGRESS_ID.match(progress_id))
+
+
+class SQLiteProgressStore:
+    """Event logs of every batch in a SQLite file shared by the workers of a host (blocking; call from threads)."""
+
+    def __init__(self, path: str = UPLOAD_PROGRESS_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS progress_events (progress_id TEXT NOT NULL, id INTEGER NOT NULL, "
+            "event TEXT NOT NULL, data TEXT NOT NULL, created_at REAL NOT NULL, PRIMARY KEY (progress_id, id))"
+        )
+
+    def append(self, progress_id: str, events: List[Tuple[int, str, Dict[str, Any]]], replace: bool = False) -> None:
+        """Add events to a batch's log; `replace` first drops an earlier batch under the same id"""
+        now = time.time()
+        rows = [(progress_id, event_id, event, json.dumps(data, default=str), now) for event_id, event, data in events]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if replace:
+                    self._conn.execute("DELETE FROM progress_events WHERE progress_id = ?", (progress_id,))
+                self._conn.executemany("INSERT OR REPLACE INTO progress_events VALUES (?, ?, ?, ?, ?)", rows)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def events_after(self, progress_id: str, last_id: int) -> List[Tuple[int, str, Dict[str, Any]]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, event, data FROM progress_events WHERE progress_id = ? AND id > ? ORDER BY id", (progress_id, last_id)
+            ).fetchall()
+        return [(event_id, event, json.loads(data)) for event_id, event, data in rows]
+
+    def prune(self, cutoff: float) -> None:
+        """Drop the logs of batches that have been quiet since `cutoff`"""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM progress_events WHERE progress_id IN "
+                "(SELECT progress_id FROM progress_events GROUP BY progress_id HAVING MAX(created_at) < ?)",
+                (cutoff,),
+            )
+
+
+class ProgressChannel:
+    """Event log of one batch that any number of subscribers can follow."""
+
+    def __init__(self, progress_id: str, store: Optional[SQLiteProgressStore] = None, retention: float = UPLOAD_PROGRESS_RETENTION_SECONDS):
+        self.id = progress_id
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._events: List[Tuple[int, str, Dict[str, Any]]] = []
+        self._next_id = 1
+        self._waiters: Set[asyncio.Future] = set()
+        self._store = store
+        self._retention = retention
+        self._unwritten: List[Tuple[int, str, Dict[str, Any]]] = []
+        self._writer: Optional[asyncio.Task] = None
+        self._replace = True
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    def publish(self, event: str, data: Dict[str, Any]) -> None:
+        self._events.append((self._next_id, event, data))
+        if self._store is not None:
+            self._unwritten.append(self._events[-1])
+            if self._writer is None:
+                self._writer = asyncio.get_running_loop().create_task(self._write())
+        self._next_id += 1
+        if len(self._events) > _MAX_EVENTS:
+            del self._events[: len(self._events) - _MAX_EVENTS]
+        self._wake()
+
+    async def _write(self) -> None:
+        """Copy published events to the shared store, in order, off the event loop"""
+        try:
+            while self._unwritten:
+                events, self._unwritten = self._unwritten, []
+                try:
+                    await asyncio.to_thread(self._store.append, self.id, events, self._replace)
+                    self._replace = False
+                    self._wake()  # subscribers here read the store
+                except Exception as e:
+                    logger.error(f"Error writing progress of batch {self.id}: {e}")
+            if self.finished:
+                await asyncio.to_thread(self._store.prune, time.time() - self._retention)
+        finally:
+            self._writer = None
+
+    def stage(self, index: int, filename: str, stage: str, status: str, seconds: Optional[float] = None) -> None:
+        data = {"index": index, "filename": filename, "stage": stage, "status": status}
+        if seconds is not None:
+            data["time"] = seconds
+        self.publish("stage", data)
+
+    def finish(self, data: Dict[str, Any]) -> None:
+        if self.finished:
+            return
+        self.finished_at = time.time()
+        self.publish("batch_completed", data)
+
+    def _wake(self) -> None:
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+        self._waiters.clear()
+
+    def events_after(self, last_id: int) -> List[Tuple[int, str, Dict[str, Any]]]:
+        return [e for e in self._events if e[0] > last_id]
+
+    async def wait(self, timeout: float) -> None:
+        """Return once something is published (or the timeout passes)"""
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._waiters.discard(waiter)
+
+
+class UploadProgressBroker:
+    """Progress channels by id; a subscriber may connect before its batch starts."""
+
+    def __init__(self, retention: float = UPLOAD_PROGRESS_RETENTION_SECONDS, path: str = UPLOAD_PROGRESS_PATH):
+        self._retention = retention
+        self._channels: Dict[str, ProgressChannel] = {}
+        self._path = path
+        self._store: Optional[SQLiteProgressStore] = None
+
+    def _shared_store(self) -> Optional[SQLiteProgressStore]:
+        if self._path and self._store is None:
+            self._store = SQLiteProgressStore(self._path)
+        return self._store
+
+    def _new_channel(self, progress_id: str) -> ProgressChannel:
+        channel = self._channels[progress_id] = ProgressChannel(progress_id, self._shared_store(), self._retention)
+        return channel
+
+    def channel(self, progress_id: str) -> ProgressChannel:
+        self._prune()
+        channel = self._channels.get(progress_id)
+        if channel is None:
+            channel = self._new_channel(progress_id)
+        return channel
+
+    def start(self, progress_id: str) -> ProgressChannel:
+        """Channel for a batch that is starting; a finished batch under the same id is replaced"""
+        channel = self.channel(progress_id)
+        if channel.finished:
+            channel = self._new_channel(progress_id)
+        return channel
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self._retention
+        for progress_id, channel in list(self._channels.items()):
+            # Channels nobody ever published to expire the same way
+            if (channel.finished_at or channel.created_at) < cutoff and (channel.finished or not channel._events):
+                del self._channels[progress_id]
+
+    async def stream(self, progress_id: str, last_event_id: int = 0) -> AsyncIterator[str]:
+        """SSE text of the channel's events after `last_event_id`, until the batch completes"""
+        if self._path:
+            async for chunk in self._stream_shared(progress_id, last_event_id):
+                yield chunk
+            return
+        channel = self.channel(progress_id)
+        yield "retry: 2000\n\n"
+        while True:
+            for event_id, event, data in channel.events_after(last_event_id):
+                last_event_id = event_id
+                yield f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+            if channel.finished:
+                return
+            await channel.wait(UPLOAD_PROGRESS_KEEPALIVE_SECONDS)
+            if self._channels.get(progress_id) is not channel:
+                return  # expired before its batch ever started
+            if not channel.events_after(last_event_id) and not channel.finished:
+                yield ": keep-alive\n\n"
+
+
+    async def _stream_shared(self, progress_id: str, last_event_id: int) -> AsyncIterator[str]:
+        """stream() from the shared store, whichever worker runs the batch"""
+        store = self._shared_store()
+        yield "retry: 2000\n\n"
+        subscribed = quiet_since = time.time()
+        while True:
+            events = await asyncio.to_thread(store.events_after, progress_id, last_event_id)
+            for event_id, event, data in events:
+                last_event_id = event_id
+                yield f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+                if event == "batch_completed":
+                    return
+            now = time.time()
+            if events:
+                quiet_since = now
+            elif last_event_id == 0 and now - subscribed > self._retention:
+                return  # its batch never started
+            elif now - quiet_since >= UPLOAD_PROGRESS_KEEPALIVE_SECONDS:
+                quiet_since = now
+                yield ": keep-alive\n\n"
+            channel = self._channels.get(progress_id)
+            if channel is not None and not channel.finished:
+                await channel.wait(UPLOAD_PROGRESS_POLL_SECONDS)  # the batch runs here: woken on publish
+            else:
+                await asyncio.sleep(UPLOAD_PROGRESS_POLL_SECONDS)
+
+
+upload_progress = UploadProgressBroker()
@@ -0,0 +1,123 @@
+"""
+Post-startup warmup and the readiness it reports.
+
+After the database connects, a background task runs a bundled tiny
+workbook through validation and the tempData build (the same calls as
+/api/validate and /api/forms/parse, without storing anything), builds the
+response models, opens the database pool up to its idle size, reads one
+page of forms and builds the search index. The first real request then
+finds pandas and the Excel readers loaded, their lazy initialisation done,
+connections open and the index only a change-log read behind.
+
+GET /api/ready answers 503 until the database is connected and the warmup
+has finished, so a load balancer only routes to warmed instances. A failed
+warmup step is logged and does not hold readiness back.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from starlette.datastructures import UploadFile
+
+from models.form import FormValidation
+from services.form_repository import FormRepository
+from services.search_index import search_index
+from utils import log_metric
+
+logger = logging.getLogger(__name__)
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").strip().lower() in ("1", "true", "yes")
+WARMUP_WORKBOOK = os.getenv(
+    "WARMUP_WORKBOOK", os.path.join(os.path.dirname(os.path.dirname(__file__)), "assets", "warmup_form.xlsx")
+)
+
+PENDING, OK, FAILED, SKIPPED = "pending", "ok", "failed", "skipped"
+
+
+class Warmup:
+    """Readiness of this process: database connection and warmup steps."""
+
+    def __init__(self, enabled: bool = WARMUP_ENABLED, workbook: str = WARMUP_WORKBOOK):
+        self.enabled = enabled
+        self.workbook = workbook
+        self.steps: Dict[str, str] = {"database": PENDING, "parser": PENDING, "pool": PENDING, "search": PENDING}
+        self.pool_connections = 0
+        self.finished = False
+        self.warmup_time: Optional[float] = None
+        self._reconnect = asyncio.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.finished and self.steps["database"] == OK
+
+    async def connected(self, repository: FormRepository, parser_factory: Callable[[], Awaitable[Any]]) -> None:
+        """Record the startup connection and warm up the parse pipeline and pool"""
+        self.steps["database"] = OK
+        if not self.enabled:
+            self.steps.update(parser=SKIPPED, pool=SKIPPED, search=SKIPPED)
+            self.finished = True
+            return
+        start = time.time()
+        await self._step("parser", self._warm_parser(parser_factory))
+        await self._step("pool", self._warm_pool(repository))
+        await self._step("search", search_index.sync(repository))
+        self.warmup_time = time.time() - start
+        self.finished = True
+        log_metric("warmup_time", self.warmup_time)
+        logger.info(f"Warmup finished in {self.warmup_time:.2f}s ({self.steps})")
+
+    def connect_failed(self) -> None:
+        """The startup connection failed; readiness waits for a later reconnect"""
+        self.steps.update(database=FAILED, parser=SKIPPED, pool=SKIPPED, search=SKIPPED)
+        self.finished = True
+
+    async def reconnect(self, repository: FormRepository) -> bool:
+        """Retry the database once more (by a readiness probe after a failed startup)"""
+        if self._reconnect.locked():
+            return self.ready  # another probe is already trying
+        async with self._reconnect:
+            if self.steps["database"] != OK:
+                try:
+                    await repository.connect()
+                    self.steps["database"] = OK
+                except Exception as e:
+                    logger.error(f"Database still unreachable: {e}")
+        return self.ready
+
+    async def _step(self, name: str, work: Awaitable[None]) -> None:
+        try:
+            await work
+            self.steps[name] = OK
+        except Exception as e:
+            self.steps[name] = FAILED
+            logger.error(f"Warmup step '{name}' failed: {e}")
+
+    async def _warm_parser(self, parser_factory: Callable[[], Awaitable[Any]]) -> None:
+        parser = await parser_factory()
+        with open(self.workbook, "rb") as fh:
+            file = UploadFile(file=fh, filename=os.path.basename(self.workbook))
+            validation = await parser.validate_file(file)
+            if not validation["valid"]:
+                raise ValueError(f"warmup workbook is invalid: {validation.get('errors')}")
+            FormValidation(**validation)
+            await file.seek(0)
+            await parser.parse_file_only(file)
+
+    async def _warm_pool(self, repository: FormRepository) -> None:
+        self.pool_connections = await repository.warm_pool()
+        await repository.get_forms_page(limit=1)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "warmup_enabled": self.enabled,
+            "steps": dict(self.steps),
+            "pool_connections": self.pool_connections,
+            "warmup_time": self.warmup_time,
+        }
+
+
+warmup = Warmup()
@@ -0,0 +1,343 @@
+"""
+Cross-file write coalescing for batch uploads.
+
+Every uploaded workbook produces one form document plus its question and
+option documents. Instead of three round trips per file, WriteCoalescer
+queues the documents of every file that belongs to the same /api/upload
+batch (or arrives within a short window) and writes each collection with a
+single unordered insert_many. Write errors are mapped back to the file that
+produced them, so one bad file never fails its neighbours.
+
+A batch holds back its documents while any of its files is still being
+processed (inside a slot and not yet submitted), up to
+WRITE_COALESCE_MAX_WAIT_MS, and flushes them as soon as none is. A request
+that processes UPLOAD_REQUEST_CONCURRENCY files at a time therefore writes
+each wave of files together: a submitter keeps its request slot until its
+flush is done, so the next wave only starts after it. Documents from
+outside any batch are flushed after the short window, even while a batch
+is still parsing; a flush that happens anyway takes everything that is due.
+
+A submitter that is cancelled (its client disconnected) before the flush
+drops its documents from the queue; if the flush already started, the
+file's documents are deleted again once it has been written.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+WRITE_COALESCE_WINDOW_MS = float(os.getenv("WRITE_COALESCE_WINDOW_MS", "10"))
+WRITE_COALESCE_MAX_WAIT_MS = float(os.getenv("WRITE_COALESCE_MAX_WAIT_MS", "5000"))
+WRITE_COALESCE_MAX_DOCS = int(os.getenv("WRITE_COALESCE_MAX_DOCS", "50000"))
+
+_current_slot: ContextVar[Optional["_BatchSlot"]] = ContextVar("write_batch_slot", default=None)
+
+
+class _PendingWrite:
+    __slots__ = ("form", "questions", "options", "future", "queued_at", "batch")
+
+    def __init__(
+        self,
+        form: Dict[str, Any],
+        questions: List[Dict[str, Any]],
+        options: List[Dict[str, Any]],
+        future: asyncio.Future,
+        batch: Optional["WriteBatch"],
+    ):
+        self.form = form
+        self.questions = questions
+        self.options = options
+        self.future = future
+        self.queued_at = time.time()
+        self.batch = batch
+
+
+class _BatchSlot:
+    def __init__(self, batch: "WriteBatch"):
+        self._batch = batch
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._batch._release_one()
+
+
+class WriteBatch:
+    """Holds coalesced flushes back while a file of the batch is still on its way to submitting its writes."""
+
+    def __init__(self, coalescer: "WriteCoalescer"):
+        self._coalescer = coalescer
+        self._active = 0
+
+    @property
+    def held(self) -> bool:
+        return self._active > 0
+
+    def _release_one(self) -> None:
+        if self._active > 0:
+            self._active -= 1
+            if self._active == 0:
+                self._coalescer._schedule()
+
+    @contextmanager
+    def slot(self):
+        """Mark the current task as one file of this batch; released on submit or on exit."""
+        slot = _BatchSlot(self)
+        self._active += 1
+        token = _current_slot.set(slot)
+        try:
+            yield slot
+        finally:
+            _current_slot.reset(token)
+            slot.release()
+
+    def close(self) -> None:
+        if self._active:
+            self._active = 0
+            self._coalescer._schedule()
+
+    def __enter__(self) -> "WriteBatch":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class NullWriteBatch:
+    """WriteBatch stand-in for stores that write each file on its own."""
+
+    @contextmanager
+    def slot(self):
+        yield self
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "NullWriteBatch":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+class WriteCoalescer:
+    """Collects form/question/option inserts and flushes each collection in one bulk write."""
+
+    def __init__(
+        self,
+        forms_collection,
+        questions_collection,
+        options_collection,
+        window_ms: float = WRITE_COALESCE_WINDOW_MS,
+        max_wait_ms: float = WRITE_COALESCE_MAX_WAIT_MS,
+        max_docs: int = WRITE_COALESCE_MAX_DOCS,
+        after_flush: Optional[Callable[[List[Any]], Awaitable[None]]] = None,
+    ):
+        self._forms = forms_collection
+        self._questions = questions_collection
+        self._options = options_collection
+        self._window = window_ms / 1000
+        self._max_wait = max_wait_ms / 1000
+        self._max_docs = max_docs
+        self._after_flush = after_flush
+        self._pending: List[_PendingWrite] = []
+        self._pending_docs = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    def batch(self) -> WriteBatch:
+        return WriteBatch(self)
+
+    async def submit(self, form: Dict[str, Any], questions: List[Dict[str, Any]], options: List[Dict[str, Any]]) -> Dict[str, float]:
+        """Queue one file's documents (ids already assigned) and wait for them to be flushed.
+
+        Returns the per-stage timings of the flush that wrote them.
+        """
+        loop = asyncio.get_running_loop()
+        slot = _current_slot.get()
+        batch = slot._batch if slot is not None else None
+        pending = _PendingWrite(form, questions, options, loop.create_future(), batch)
+        self._pending.append(pending)
+        self._pending_docs += 1 + len(questions) + len(options)
+
+        if slot is not None:
+            slot.release()
+        self._schedule()
+        try:
+            return await pending.future
+        except asyncio.CancelledError:
+            self._withdraw(pending)
+            raise
+
+    def _withdraw(self, pending: _PendingWrite) -> None:
+        """Skip a cancelled file's write, or undo it if it has already landed"""
+        if pending in self._pending:
+            self._pending.remove(pending)
+            self._pending_docs -= 1 + len(pending.questions) + len(pending.options)
+            self._schedule()
+        elif pending.future.done() and not pending.future.cancelled() and pending.future.exception() is None:
+            # Written and resolved, but the submitter was cancelled before it resumed
+            task = asyncio.get_running_loop().create_task(self._rollback([pending]))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        # Otherwise its flush is in progress and rolls it back (see _flush)
+
+    # ---------------------------------------------------------------------------
+    # Scheduling
+    # ---------------------------------------------------------------------------
+
+    def _deadline(self, pending: _PendingWrite) -> float:
+        """When a queued file's documents must be flushed at the latest"""
+        batch = pending.batch
+        if batch is None:
+            return pending.queued_at + self._window
+        if batch.held:
+            return pending.queued_at + self._max_wait
+        return pending.queued_at  # no file of its batch is still on its way
+
+    def _schedule(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        if self._pending_docs >= self._max_docs:
+            self._flush_now(everything=True)
+            return
+        delay = min(self._deadline(p) for p in self._pending) - time.time()
+        if delay <= 0:
+            self._flush_now()
+            return
+        self._timer = asyncio.get_running_loop().call_later(delay, self._flush_now)
+
+    def _flush_now(self, everything: bool = False) -> None:
+        """Flush every queued file that is due (not held by an incomplete batch)"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        now = time.time()
+        batch: List[_PendingWrite] = []
+        held: List[_PendingWrite] = []
+        for pending in self._pending:
+            due = everything or pending.batch is None or self._deadline(pending) <= now
+            (batch if due else held).append(pending)
+        self._pending = held
+        self._pending_docs = sum(1 + len(p.questions) + len(p.options) for p in held)
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._flush(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        if held:
+            self._schedule()
+
+    # ---------------------------------------------------------------------------
+    # Flushing
+    # ---------------------------------------------------------------------------
+
+    async def _insert_many(self, collection, docs: List[Dict[str, Any]], owners: List[int]) -> Dict[int, Exception]:
+        """Insert docs unordered; return {owner index: error} for every owner with a failed doc."""
+        if not docs:
+            return {}
+        try:
+            await collection.insert_many(docs, ordered=False)
+            return {}
+        except BulkWriteError as e:
+            failed: Dict[int, Exception] = {}
+            for write_error in e.details.get("writeErrors", []):
+                failed.setdefault(owners[write_error["index"]], e)
+            return failed
+        except Exception as e:
+            return {owner: e for owner in set(owners)}
+
+    async def _flush(self, batch: List[_PendingWrite]) -> None:
+        flush_start = time.time()
+        try:
+            failed: Dict[int, Exception] = {}
+
+            start_form = time.time()
+            failed.update(await self._insert_many(self._forms, [p.form for p in batch], list(range(len(batch)))))
+            form_time = time.time() - start_form
+            forms_written = [i for i in range(len(batch)) if i not in failed]
+
+            start_q = time.time()
+            docs, owners = self._collect(batch, failed, "questions")
+            failed.update(await self._insert_many(self._questions, docs, owners))
+            questions_time = time.time() - start_q
+
+            start_o = time.time()
+            docs, owners = self._collect(batch, failed, "options")
+            failed.update(await self._insert_many(self._options, docs, owners))
+            options_time = time.time() - start_o
+
+            # Files whose submitter was cancelled mid-flush are undone like failed ones
+            rollback = [batch[i] for i in forms_written if i in failed or batch[i].future.cancelled()]
+            if rollback:
+                await self._rollback(rollback)
+            if forms_written and self._after_flush is not None:
+                try:
+                    await self._after_flush([batch[i].form["_id"] for i in forms_written])
+                except Exception as e:
+                    # Readers would not see the new forms (the catalogue revision did not move): undo them
+                    undone = [batch[i] for i in forms_written if batch[i] not in rollback]
+                    await self._rollback(undone)
+                    rollback.extend(undone)
+                    for i in forms_written:
+                        failed.setdefault(i, e)
+            late = [batch[i] for i in forms_written if batch[i].future.cancelled() and batch[i] not in rollback]
+            if late:
+                await self._rollback(late)
+                if self._after_flush is not None:
+                    await self._after_flush([p.form["_id"] for p in late])
+
+            logger.info(
+                f"Coalesced write of {len(batch)} forms, {sum(len(p.questions) for p in batch)} questions "
+                f"and {sum(len(p.options) for p in batch)} options ({len(failed)} failed)"
+            )
+            for i, pending in enumerate(batch):
+                if pending.future.done():
+                    continue
+                if i in failed:
+                    pending.future.set_exception(failed[i])
+                else:
+                    pending.future.set_result({
+                        "queued_time": flush_start - pending.queued_at,
+                        "form_time": form_time,
+                        "questions_time": questions_time,
+                        "options_time": options_time,
+                    })
+        except Exception as e:
+            logger.error(f"Coalesced write failed: {e}")
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(e)
+
+    def _collect(self, batch: List[_PendingWrite], failed: Dict[int, Exception], field: str):
+        docs: List[Dict[str, Any]] = []
+        owners: List[int] = []
+        for i, pending in enumerate(batch):
+            if i in failed:
+                continue
+            rows = getattr(pending, field)
+            docs.extend(rows)
+            owners.extend([i] * len(rows))
+        return docs, owners
+
+    async def _rollback(self, batch: List[_PendingWrite]) -> None:
+        form_oids = [p.form["_id"] for p in batch]
+        # Children reference their form by whatever form_id value they were stored with
+        child_refs = [next((row["form_id"] for row in (*p.questions, *p.options)), str(p.form["_id"])) for p in batch]
+        try:
+            await self._forms.delete_many({"_id": {"$in": form_oids}})
+            await self._questions.delete_many({"form_id": {"$in": child_refs}})
+            await self._options.delete_many({"form_id": {"$in": child_refs}})
+        except Exception as e:
+            logger.error(f"Error rolling back coalesced forms {[str(oid) for oid in form_oids]}: {e}")
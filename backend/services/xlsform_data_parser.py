@@ -1,10 +1,25 @@
 import pandas as pd
 from typing import Dict, List, Any
 from models.form import FormGroup, Question
+import hashlib
+import json
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Sheets whose contents identify an upload for deduplication
+FINGERPRINT_SHEETS = ("Forms", "Questions Info", "Answer Options")
+
+
+def _normalise_cell(value: Any) -> str:
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    return str(value).strip()
+
 
 class XLSFormDataParser:
     """Pure DataFrame -> dict transformation, no I/O, no async."""
@@ -59,6 +74,25 @@ class XLSFormDataParser:
             options_data.append(option_data)
         return options_data
 
+    def _fingerprint_workbook(self, df_dict: Dict[str, pd.DataFrame]) -> str:
+        """Hash of the normalised sheet contents.
+
+        Blank rows/columns, column order, cell padding and int-vs-float cells
+        are ignored, so re-saving a workbook in Excel keeps its fingerprint.
+        """
+        digest = hashlib.sha256()
+        for sheet in FINGERPRINT_SHEETS:
+            df = df_dict.get(sheet)
+            if df is None:
+                continue
+            frame = df.dropna(how="all").dropna(axis=1, how="all")
+            frame = frame.rename(columns=lambda c: str(c).strip())
+            frame = frame[sorted(frame.columns)]
+            digest.update(json.dumps([sheet, list(frame.columns)]).encode())
+            for row in frame.itertuples(index=False, name=None):
+                digest.update(json.dumps([_normalise_cell(v) for v in row]).encode())
+        return digest.hexdigest()
+
     def _get_form_title(self, forms_df: pd.DataFrame) -> Dict[str, str]:
         if not forms_df.empty and 'Title' in forms_df.columns:
             title = forms_df.iloc[0]['Title']
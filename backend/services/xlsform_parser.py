@@ -12,12 +12,14 @@ so that main.py and any existing tests continue to work without changes.
 
 import pandas as pd
 from fastapi import UploadFile
-from typing import Dict, List, Any
+from typing import Callable, Dict, List, Any, Optional
 from models.form import ParsedForm
-from services.database_service import DatabaseService
+from services.admission import run_in_lane
+from services.form_repository import DuplicateFormError, get_form_repository
 from services.xlsform_validator import XLSFormValidator
 from services.xlsform_data_parser import XLSFormDataParser
 from services.xlsform_template_builder import XLSFormTemplateBuilder
+import hashlib
 import logging
 import time
 import sys
@@ -28,6 +30,37 @@ from utils import log_metric
 
 logger = logging.getLogger(__name__)
 
+# Return the stored form instead of inserting a copy when an upload's
+# contents are already stored (overridable per call)
+UPLOAD_DEDUP = os.getenv("UPLOAD_DEDUP", "false").strip().lower() in ("1", "true", "yes")
+
+# progress(stage, "started" | "completed" | "failed", seconds) as parse_file moves through its stages
+StageCallback = Callable[[str, str, Optional[float]], None]
+
+
+def _no_progress(stage: str, status: str, seconds: Optional[float] = None) -> None:
+    pass
+
+
+class _StageReporter:
+    """Forwards stage events to a StageCallback and remembers the stages still open."""
+
+    def __init__(self, progress: StageCallback):
+        self._progress = progress
+        self._open: Dict[str, float] = {}
+
+    def __call__(self, stage: str, status: str, seconds: Optional[float] = None) -> None:
+        if status == "started":
+            self._open[stage] = time.time()
+        else:
+            self._open.pop(stage, None)
+        self._progress(stage, status, seconds)
+
+    def close(self, status: str) -> None:
+        """End every open stage with `status`, so each started stage gets a terminal event"""
+        for stage, started in list(self._open.items()):
+            self(stage, status, time.time() - started)
+
 
 class XLSFormParser:
     """Facade that composes XLSFormValidator, XLSFormDataParser, and XLSFormTemplateBuilder."""
@@ -44,7 +77,7 @@ class XLSFormParser:
     VALID_LANGUAGES = XLSFormValidator.VALID_LANGUAGES
 
     def __init__(self):
-        self.db_service = DatabaseService()
+        self.db_service = get_form_repository()
         self._validator = XLSFormValidator()
         self._data_parser = XLSFormDataParser()
         self._template_builder = XLSFormTemplateBuilder()
@@ -56,6 +89,9 @@ class XLSFormParser:
     def _convert_db_to_temp_data_format(self, form, questions, options):
         return self._template_builder._convert_db_to_temp_data_format(form, questions, options)
 
+    async def _convert_db_stream_to_temp_data_format(self, form, questions, options):
+        return await self._template_builder._convert_db_stream_to_temp_data_format(form, questions, options)
+
     def _parse_form_metadata(self, df):
         return self._data_parser._parse_form_metadata(df)
 
@@ -73,34 +109,49 @@ class XLSFormParser:
         """Validate an uploaded XLS/XLSX file and return a structured report."""
         return await self._validator.validate_file(file)
 
-    async def parse_file(self, file: UploadFile) -> ParsedForm:
-        """Parse, validate, and persist an XLSForm file. Returns a ParsedForm."""
+    async def parse_file(
+        self,
+        file: UploadFile,
+        dedup: Optional[bool] = None,
+        progress: Optional[StageCallback] = None,
+    ) -> ParsedForm:
+        """Parse, validate, and persist an XLSForm file. Returns a ParsedForm.
+
+        In dedup mode (UPLOAD_DEDUP unless `dedup` is given) an upload whose
+        bytes or normalised sheet contents match a stored form returns that
+        form instead of being parsed and stored again. `progress` is told when
+        each stage (decode, validate, save_form/questions/options) starts and
+        when it completes or fails, with the stage's time. Stages skipped by a
+        dedup return are reported completed.
+        """
         start_all = time.time()
+        dedup = UPLOAD_DEDUP if dedup is None else dedup
+        progress = _StageReporter(progress or _no_progress)
         try:
-            df_dict = pd.read_excel(file.file, sheet_name=None)
+            progress("decode", "started", None)
+            start_decode = time.time()
+            # ---- Fingerprints: raw bytes (no decode needed) and normalised sheets
+            source_sha256 = await run_in_lane(self._sha256, file.file)
+            if dedup:
+                existing = await self.db_service.find_form_by_fingerprint(source_sha256=source_sha256)
+                if existing:
+                    return self._deduplicated_form(existing, start_all)
+
+            df_dict, fingerprint = await run_in_lane(self._decode_workbook, file.file)
+            progress("decode", "completed", time.time() - start_decode)
+            if dedup:
+                existing = await self.db_service.find_form_by_fingerprint(fingerprint=fingerprint)
+                if existing:
+                    return self._deduplicated_form(existing, start_all)
+
+            progress("validate", "started", None)
+            start_validate = time.time()
 
             forms_df = df_dict["Forms"]
             questions_df = df_dict["Questions Info"]
             options_df = df_dict["Answer Options"]
 
-            all_errors: List[Dict] = []
-            all_warnings: List[Dict] = []
-
-            fe, fw, _ = self._validator._validate_forms_content(forms_df)
-            all_errors.extend(fe)
-            all_warnings.extend(fw)
-
-            qe, qw = self._validator._validate_questions_content(questions_df)
-            all_errors.extend(qe)
-            all_warnings.extend(qw)
-
-            oe, ow = self._validator._validate_options_content(options_df)
-            all_errors.extend(oe)
-            all_warnings.extend(ow)
-
-            cross_errors = self._validator._validate_cross_references(questions_df, options_df)
-            all_errors.extend(cross_errors)
-
+            all_errors, all_warnings = await run_in_lane(self._check_content, forms_df, questions_df, options_df)
             if all_errors:
                 error_messages = []
                 for err in all_errors:
@@ -117,43 +168,55 @@ class XLSFormParser:
                 exc.validation_errors = all_errors  # type: ignore[attr-defined]
                 exc.validation_warnings = all_warnings  # type: ignore[attr-defined]
                 raise exc
-
-            # ---- Persist form -----------------------------------------------
-            start_form = time.time()
-            parsed_metadata = self._data_parser._parse_form_metadata(forms_df)
-            form_id = await self.db_service.save_form(parsed_metadata)
-            form_time = time.time() - start_form
+            progress("validate", "completed", time.time() - start_validate)
+
+            # ---- Persist form, questions and options --------------------------
+            # All three are saved together: on MongoDB through the shared write
+            # coalescer, so files uploaded in the same batch are stored with a
+            # few bulk writes; on SQLite in one transaction per file.
+            for stage in ("save_form", "save_questions", "save_options"):
+                progress(stage, "started", None)
+            (
+                (parsed_metadata, form_parse_time),
+                (questions_data, questions_parse_time),
+                (options_data, options_parse_time),
+            ) = await run_in_lane(self._parse_rows, forms_df, questions_df, options_df)
+
+            parsed_metadata["fingerprint"] = fingerprint
+            parsed_metadata["source_sha256"] = source_sha256
+            try:
+                saved = await self.db_service.save_form_bundle(parsed_metadata, questions_data, options_data)
+            except DuplicateFormError:
+                # Same contents were stored first (possibly by a concurrent upload)
+                existing = await self.db_service.find_form_by_fingerprint(fingerprint=fingerprint) if dedup else None
+                if existing:
+                    return self._deduplicated_form(existing, start_all)
+                # Keep this copy; only one form can hold the unique fingerprint
+                del parsed_metadata["fingerprint"]
+                saved = await self.db_service.save_form_bundle(parsed_metadata, questions_data, options_data)
+            form_id = saved["form_id"]
+            question_ids = saved["question_ids"]
+            option_ids = saved["option_ids"]
+
+            form_time = form_parse_time + saved["form_time"]
             log_metric("form_process_time", form_time)
+            progress("save_form", "completed", form_time)
 
-            try:
-                # ---- Persist questions ---------------------------------------
-                start_q = time.time()
-                questions_data = self._data_parser._parse_questions_data(questions_df)
-                question_ids = await self.db_service.save_questions(questions_data, form_id)
-                questions_time = time.time() - start_q
-                log_metric("questions_process_time", questions_time)
-                if questions_data:
-                    log_metric("avg_one_question_process_time", questions_time / len(questions_data))
-
-                # ---- Persist options -----------------------------------------
-                start_o = time.time()
-                options_data = self._data_parser._parse_options_data(options_df)
-                option_ids = await self.db_service.save_options(options_data, form_id)
-                options_time = time.time() - start_o
-                log_metric("options_process_time", options_time)
-                if options_data:
-                    log_metric("avg_one_option_process_time", options_time / len(options_data))
-
-            except Exception:
-                try:
-                    await self.db_service.delete_form(form_id)
-                except Exception:
-                    pass
-                raise
+            questions_time = questions_parse_time + saved["questions_time"]
+            log_metric("questions_process_time", questions_time)
+            progress("save_questions", "completed", questions_time)
+            if questions_data:
+                log_metric("avg_one_question_process_time", questions_time / len(questions_data))
+
+            options_time = options_parse_time + saved["options_time"]
+            log_metric("options_process_time", options_time)
+            progress("save_options", "completed", options_time)
+            if options_data:
+                log_metric("avg_one_option_process_time", options_time / len(options_data))
 
             form_title = self._data_parser._get_form_title(forms_df)
             form_version = parsed_metadata.get("version", "1.0.0")
-            groups = self._data_parser._parse_questions(questions_df, options_df)
+            groups = await run_in_lane(self._data_parser._parse_questions, questions_df, options_df)
 
             total_time = time.time() - start_all
             log_metric("total_form_upload_time", total_time)
@@ -172,19 +235,94 @@ class XLSFormParser:
                     "form_process_time": form_time,
                     "questions_process_time": questions_time,
                     "options_process_time": options_time,
+                    "write_queue_time": saved["queued_time"],
                     "total_form_upload_time": total_time,
                     "validation_warnings": all_warnings,
                 },
             )
 
-        except Exception as e:
-            logger.error(f"Error parsing file: {str(e)}")
+        except BaseException as e:
+            progress.close("failed")
+            if isinstance(e, Exception):
+                logger.error(f"Error parsing file: {str(e)}")
             raise
         finally:
+            progress.close("completed")
             await file.seek(0)
 
+    # ---------------------------------------------------------------------------
+    # Blocking steps of parse_file, run on the admission lane's threads
+    # ---------------------------------------------------------------------------
+
+    @staticmethod
+    def _sha256(fh) -> str:
+        digest = hashlib.sha256(fh.read()).hexdigest()
+        fh.seek(0)
+        return digest
+
+    def _decode_workbook(self, fh):
+        df_dict = pd.read_excel(fh, sheet_name=None)
+        return df_dict, self._data_parser._fingerprint_workbook(df_dict)
+
+    def _check_content(self, forms_df, questions_df, options_df):
+        all_errors: List[Dict] = []
+        all_warnings: List[Dict] = []
+
+        fe, fw, _ = self._validator._validate_forms_content(forms_df)
+        all_errors.extend(fe)
+        all_warnings.extend(fw)
+
+        qe, qw = self._validator._validate_questions_content(questions_df)
+        all_errors.extend(qe)
+        all_warnings.extend(qw)
+
+        oe, ow = self._validator._validate_options_content(options_df)
+        all_errors.extend(oe)
+        all_warnings.extend(ow)
+
+        all_errors.extend(self._validator._validate_cross_references(questions_df, options_df))
+        return all_errors, all_warnings
+
+    def _parse_rows(self, forms_df, questions_df, options_df):
+        """(result, seconds) for form metadata, questions and options"""
+        timed = []
+        for parse, df in (
+            (self._data_parser._parse_form_metadata, forms_df),
+            (self._data_parser._parse_questions_data, questions_df),
+            (self._data_parser._parse_options_data, options_df),
+        ):
+            start = time.time()
+            timed.append((parse(df), time.time() - start))
+        return timed
+
+    def _deduplicated_form(self, existing: Dict[str, Any], start_all: float) -> ParsedForm:
+        total_time = time.time() - start_all
+        log_metric("deduplicated_upload_time", total_time)
+        logger.info(f"Upload matches stored form {existing['id']}; not storing a copy")
+        return ParsedForm(
+            id=existing["id"],
+            title={"default": existing.get("title", "Untitled Form")},
+            version=existing.get("version", "1.0.0"),
+            groups=[],
+            settings=None,
+            metadata={
+                "deduplicated": True,
+                "questions_count": existing.get("questions_count"),
+                "options_count": existing.get("options_count"),
+                "total_form_upload_time": total_time,
+                "validation_warnings": [],
+            },
+        )
+
     async def parse_file_only(self, file: UploadFile) -> Dict[str, Any]:
         """Parse an XLSForm and return a tempData.json-format schema without saving."""
+        try:
+            return await run_in_lane(self._parse_workbook_only, file)
+        finally:
+            await file.seek(0)
+
+    def _parse_workbook_only(self, file: UploadFile) -> Dict[str, Any]:
+        """parse_file_only's blocking body, run on an admission lane thread"""
         start_all = time.time()
         try:
             # ---- Try to read the workbook ------------------------------------
@@ -307,5 +445,3 @@ class XLSFormParser:
         except Exception as e:
             logger.error(f"Error parsing file {file.filename}: {str(e)}")
             raise
-        finally:
-            await file.seek(0)
@@ -7,6 +7,7 @@ import os
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 from utils import log_metric
+from services.admission import run_in_lane
 
 logger = logging.getLogger(__name__)
 
@@ -36,6 +37,13 @@ class XLSFormValidator:
     VALID_LANGUAGES = ['en', 'fr', 'es', 'de', 'it', 'pt', 'ar', 'zh', 'ja', 'ko', 'hi', 'ru']
 
     async def validate_file(self, file) -> Dict[str, Any]:
+        try:
+            return await run_in_lane(self._validate_workbook, file)
+        finally:
+            await file.seek(0)
+
+    def _validate_workbook(self, file) -> Dict[str, Any]:
+        """Decode and check a workbook (blocking; runs on an admission lane thread)"""
         start_validation = time.time()
         try:
             df_dict = pd.read_excel(file.file, sheet_name=None)
@@ -131,8 +139,6 @@ class XLSFormValidator:
                 'errors': [{'type': 'file_error', 'message': "Unable to read file. It may be corrupted or not a valid Excel file.", 'location': 'file'}],
                 'warnings': []
             }
-        finally:
-            await file.seek(0)
 
     def _validate_sheet(self, df_dict: Dict[str, pd.DataFrame], sheet_name: str, required_columns: List[str]) -> Dict[str, Any]:
         exists = sheet_name in df_dict
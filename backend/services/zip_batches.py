@@ -0,0 +1,79 @@
+"""
+Workbooks read one at a time out of an uploaded ZIP archive.
+
+POST /api/upload/zip takes a single archive instead of hundreds of
+multipart file parts. Members are listed from the archive's central
+directory and each one is decompressed only when it is about to be parsed,
+into a spooled temporary file that stays in memory for small workbooks and
+spills to disk for large ones, so the archive is never extracted as a
+whole.
+"""
+
+import os
+import tempfile
+import zipfile
+import zlib
+from typing import IO, List
+
+# Workbooks accepted in one archive
+ZIP_MAX_FILES = int(os.getenv("ZIP_MAX_FILES", "1000"))
+# Decompressed members up to this size are held in memory, larger ones in a temp file
+ZIP_SPOOL_MEMORY_BYTES = int(os.getenv("ZIP_SPOOL_MEMORY_BYTES", str(4 * 1024 * 1024)))
+
+_BLOCK = 1024 * 1024
+
+
+class ArchiveMemberError(Exception):
+    """A member that cannot be handed to the parser."""
+
+    def __init__(self, error_type: str, message: str):
+        super().__init__(message)
+        self.error_type = error_type
+        self.message = message
+
+
+def workbook_members(archive: zipfile.ZipFile) -> List[zipfile.ZipInfo]:
+    """Files of the archive in stored order, without directories and OS metadata (__MACOSX, dotfiles)"""
+    return [
+        info for info in archive.infolist()
+        if not info.is_dir()
+        and not info.filename.startswith("__MACOSX/")
+        and not os.path.basename(info.filename).startswith(".")
+    ]
+
+
+def extract_member(archive: zipfile.ZipFile, info: zipfile.ZipInfo, max_size: int) -> IO[bytes]:
+    """Decompress one member into a spooled temp file positioned at 0.
+
+    Stops after max_size bytes whatever the header claims, so a forged size
+    in the archive cannot inflate a member past the upload limit.
+    """
+    name = os.path.basename(info.filename)
+    if not name.endswith((".xls", ".xlsx")):
+        raise ArchiveMemberError("INVALID_FILE_FORMAT", f"'{name}' is not an Excel file (.xls, .xlsx).")
+    if info.file_size == 0:
+        raise ArchiveMemberError("EMPTY_FILE", f"The file '{name}' is empty (0 bytes).")
+    if info.file_size > max_size:
+        raise ArchiveMemberError("FILE_TOO_LARGE", f"File exceeds the {max_size // (1024 * 1024)} MB limit.")
+
+    out = tempfile.SpooledTemporaryFile(max_size=ZIP_SPOOL_MEMORY_BYTES)
+    try:
+        with archive.open(info) as member:
+            written = 0
+            for block in iter(lambda: member.read(_BLOCK), b""):
+                written += len(block)
+                if written > max_size:
+                    raise ArchiveMemberError("FILE_TOO_LARGE", f"File exceeds the {max_size // (1024 * 1024)} MB limit.")
+                out.write(block)
+    except (zipfile.BadZipFile, zlib.error, EOFError, NotImplementedError) as e:
+        out.close()
+        raise ArchiveMemberError("CORRUPTED_FILE", f"'{name}' could not be extracted from the archive: {e}")
+    except RuntimeError:
+        # zipfile raises RuntimeError for encrypted members
+        out.close()
+        raise ArchiveMemberError("ENCRYPTED_FILE", f"'{name}' is password-protected.")
+    except BaseException:
+        out.close()
+        raise
+    out.seek(0)
+    return out
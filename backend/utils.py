@@ -1,10 +1,64 @@
-import time
+import glob
 import os
+from typing import Optional
 
-METRICS_FILE = os.path.join(os.path.dirname(__file__), "metrics.txt")
+METRICS_DIR = os.getenv("METRICS_DIR", os.path.dirname(__file__))
+METRICS_FILE = os.path.join(METRICS_DIR, "metrics.txt")
+# With several worker processes each one appends to its own file, which the
+# gunicorn master merges into METRICS_FILE (see gunicorn.conf.py).
+METRICS_PER_WORKER = os.getenv("METRICS_PER_WORKER", "false").strip().lower() in ("1", "true", "yes")
+# A metrics file past this size is moved to <file>.1, replacing the previous one (0 = never)
+METRICS_FILE_MAX_BYTES = int(os.getenv("METRICS_FILE_MAX_BYTES", str(10 * 1024 * 1024)))
+
+
+def worker_metrics_file(pid) -> str:
+    return os.path.join(METRICS_DIR, f"metrics.{pid}.txt")
+
+
+def worker_snapshot_file(pid) -> str:
+    """Registry snapshot of one worker, merged by /metrics (see metrics.py)"""
+    return os.path.join(METRICS_DIR, f"metrics.{pid}.json")
+
+
+def exited_snapshot_file() -> str:
+    return os.path.join(METRICS_DIR, "metrics-exited.json")
+
+
+def metrics_path() -> str:
+    """File this process appends its metric lines to"""
+    return worker_metrics_file(os.getpid()) if METRICS_PER_WORKER else METRICS_FILE
+
+
+def rotate_metrics_file(path: str) -> None:
+    try:
+        if METRICS_FILE_MAX_BYTES and os.path.getsize(path) > METRICS_FILE_MAX_BYTES:
+            os.replace(path, path + ".1")
+    except OSError:
+        pass
 
 
 def log_metric(metric_name: str, value) -> None:
-    timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-    with open(METRICS_FILE, "a") as f:
-        f.write(f"[{timestamp}] {metric_name}: {value}\n")
+    """Record a metric in the in-memory registry; its metrics.txt line is written in the next batch (see metrics.py)"""
+    from metrics import record_legacy  # metrics imports this module
+
+    record_legacy(metric_name, value)
+
+
+def merge_worker_metrics(pid: Optional[int] = None) -> int:
+    """Append per-worker metric files (one pid, or all) to METRICS_FILE in time order; returns lines merged"""
+    paths = [worker_metrics_file(pid)] if pid is not None else glob.glob(worker_metrics_file("*"))
+    lines = []
+    for path in paths:
+        try:
+            with open(path) as f:
+                lines.extend(f.readlines())
+            os.remove(path)
+        except OSError:
+            continue
+    if lines:
+        # Lines start with a sortable [YYYY-mm-dd HH:MM:SS] timestamp
+        lines.sort(key=lambda line: line[:21])
+        with open(METRICS_FILE, "a") as f:
+            f.writelines(lines)
+        rotate_metrics_file(METRICS_FILE)
+    return len(lines)
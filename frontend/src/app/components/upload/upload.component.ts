@@ -7,8 +7,8 @@ import { MatProgressBarModule } from '@angular/material/progress-bar';
 import { MatProgressSpinnerModule } from '@angular/material/progress-spinner';
 import { MatTooltipModule } from '@angular/material/tooltip';
 import { MatSnackBarModule, MatSnackBar } from '@angular/material/snack-bar';
-import { Subject } from 'rxjs';
-import { takeUntil } from 'rxjs/operators';
+import { Subject, of } from 'rxjs';
+import { catchError, debounceTime, map, switchMap, takeUntil } from 'rxjs/operators';
 import { FormService, FormData, FormDetails, OptionData, ParsedSchema } from '../../services/form.service';
 import { FormValidation, ValidationError, ValidationWarning } from '../../models/form.model';
 import { FormPreviewService } from '../../services/form-preview.service';
@@ -1128,8 +1128,11 @@ export class UploadComponent implements OnInit, OnChanges {
   
   // Async upload control
   private cancelSubject$ = new Subject<void>();
+  private searchQuery$ = new Subject<string>();
   private activeUploads = new Set<Promise<any>>();
   private maxConcurrentUploads = 3;
+  // Files per /validate/batch request (the backend's BATCH_MAX_FILES)
+  private validationBatchSize = 50;
   
   // Schema modal properties
   showSchemaModal = false;
@@ -1149,6 +1152,18 @@ export class UploadComponent implements OnInit, OnChanges {
     if (isPlatformBrowser(this.platformId)) {
       this.loadForms();
     }
+
+    // Server-side search; switchMap drops responses to superseded queries
+    this.searchQuery$.pipe(
+      debounceTime(150),
+      switchMap(query => !query ? of(this.parsedForms) : this.formService.searchAllForms(query).pipe(
+        map(hits => hits.map(hit => hit.form)),
+        catchError(() => of(this.filterByTitle(query)))
+      ))
+    ).subscribe(forms => {
+      this.filteredForms = forms;
+      this.cdr.markForCheck();
+    });
     this.restoreUploadState();
 
     // Subscribe to currently previewed form
@@ -1243,34 +1258,38 @@ export class UploadComponent implements OnInit, OnChanges {
     this.validationProgress = { current: 0, total: this.selectedFiles.length };
     let validated = 0;
     let validCount = 0;
-    this.selectedFiles.forEach(file => {
-      this.formService.validateFile(file).subscribe({
-        next: (result) => {
-          this.validationResults[file.name] = result;
-          validated++;
-          this.validationProgress.current = validated;
-          if (result.valid) validCount++;
-          if (validated === this.selectedFiles.length) {
-            this.isValidating = false;
-            this.allValid = validCount === this.selectedFiles.length;
-          }
+    const batchValidated = (count: number) => {
+      validated += count;
+      this.validationProgress.current = validated;
+      if (validated === this.selectedFiles.length) {
+        this.isValidating = false;
+        this.allValid = validCount === this.selectedFiles.length;
+      }
+    };
+    // The backend validates each batch's files in parallel and answers in input order
+    for (let i = 0; i < this.selectedFiles.length; i += this.validationBatchSize) {
+      const batch = this.selectedFiles.slice(i, i + this.validationBatchSize);
+      this.formService.validateFiles(batch).subscribe({
+        next: (results) => {
+          results.forEach((result, index) => {
+            this.validationResults[batch[index].name] = result;
+            if (result.valid) validCount++;
+          });
+          batchValidated(batch.length);
         },
         error: (error: any) => {
-          this.validationResults[file.name] = {
-            valid: false,
-            message: 'Validation failed',
-            errors: [{ type: 'file_error', message: 'Validation failed', location: 'file' }],
-            warnings: []
-          };
-          validated++;
-          this.validationProgress.current = validated;
-          if (validated === this.selectedFiles.length) {
-            this.isValidating = false;
-            this.allValid = validCount === this.selectedFiles.length;
-          }
+          batch.forEach(file => {
+            this.validationResults[file.name] = {
+              valid: false,
+              message: 'Validation failed',
+              errors: [{ type: 'file_error', message: 'Validation failed', location: 'file' }],
+              warnings: []
+            };
+          });
+          batchValidated(batch.length);
         }
       });
-    });
+    }
   }
 
   async uploadFiles() {
@@ -1527,14 +1546,18 @@ export class UploadComponent implements OnInit, OnChanges {
   }
 
   applySearch(): void {
-    const query = this.searchQuery.trim().toLowerCase();
+    const query = this.searchQuery.trim();
     if (!query) {
       this.filteredForms = this.parsedForms;
-    } else {
-      this.filteredForms = this.parsedForms.filter(form =>
-        form.title && form.title.toLowerCase().includes(query)
-      );
     }
+    this.searchQuery$.next(query);
+  }
+
+  private filterByTitle(query: string): FormData[] {
+    const lowered = query.toLowerCase();
+    return this.parsedForms.filter(form =>
+      form.title && form.title.toLowerCase().includes(lowered)
+    );
   }
 
   deleteForm(form: FormData, event?: Event): void {
@@ -1,7 +1,7 @@
 import { Injectable } from '@angular/core';
 import { HttpClient } from '@angular/common/http';
-import { Observable } from 'rxjs';
-import { map } from 'rxjs/operators';
+import { EMPTY, Observable } from 'rxjs';
+import { expand, map, reduce } from 'rxjs/operators';
 import { FormValidation } from '../models/form.model';
 import { getRuntimeConfig } from '../runtime-config';
 
@@ -11,6 +11,8 @@ export interface FormData {
     language: string;
     version: string;
     created_at: string;
+    questions_count?: number;
+    options_count?: number;
 }
 
 export interface QuestionData {
@@ -45,6 +47,27 @@ export interface FormsResponse {
     count: number;
 }
 
+export interface SearchHighlight {
+    field: 'title' | 'question' | 'option';
+    order: number | null;
+    text: string;
+    matches: [number, number][];
+}
+
+export interface SearchHit {
+    form: FormData;
+    score: number;
+    highlights: SearchHighlight[];
+}
+
+export interface SearchResponse {
+    query: string;
+    hits: SearchHit[];
+    count: number;
+    total: number;
+    next_offset: number | null;
+}
+
 export interface ParsedSchema {
     id: string | null;
     title: { default: string };
@@ -79,6 +102,12 @@ export class FormService {
         return this.http.post<FormValidation>(`${this.apiUrl}/validate`, formData);
     }
 
+    validateFiles(files: File[]): Observable<FormValidation[]> {
+        const formData = new FormData();
+        files.forEach(file => formData.append('files', file));
+        return this.http.post<FormValidation[]>(`${this.apiUrl}/validate/batch`, formData);
+    }
+
     uploadFile(file: File): Observable<FormDetails> {
         const formData = new FormData();
         formData.append('files', file);
@@ -105,6 +134,20 @@ export class FormService {
         return this.http.get<FormsResponse>(`${this.apiUrl}/forms`);
     }
 
+    searchForms(query: string, limit = 100, offset = 0): Observable<SearchResponse> {
+        return this.http.get<SearchResponse>(`${this.apiUrl}/forms/search`, {
+            params: { q: query, limit, offset }
+        });
+    }
+
+    /** Every hit for a query, following next_offset one page at a time */
+    searchAllForms(query: string, pageSize = 100): Observable<SearchHit[]> {
+        return this.searchForms(query, pageSize).pipe(
+            expand(page => page.next_offset === null ? EMPTY : this.searchForms(query, pageSize, page.next_offset)),
+            reduce((hits, page) => hits.concat(page.hits), [] as SearchHit[])
+        );
+    }
+
     getFormById(formId: string): Observable<any> {
         return this.http.get<any>(`${this.apiUrl}/forms/${formId}`);
     }
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Convert legacy (v1) forms in MongoDB to the compact v2 document layout.
+
+Runs online: the API keeps serving while forms are converted one at a time,
+and readers see either the complete v1 or the complete v2 rows of a form
+(see services/form_schema.migrate_form). Forms edited mid-conversion are
+skipped and picked up by the next run.
+
+    MONGODB_URL=... python scripts/migrate_schema_v2.py [--pack-options] [--limit N] [--dry-run]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from database import close_mongo_connection, forms_collection, options_collection, questions_collection  # noqa: E402
+from services.form_schema import migrate_form  # noqa: E402
+
+
+def log(msg):
+    print(msg, flush=True)
+
+
+async def run(pack_options: bool, limit: int, dry_run: bool) -> None:
+    try:
+        await migrate(pack_options, limit, dry_run)
+    finally:
+        await close_mongo_connection()
+
+
+async def migrate(pack_options: bool, limit: int, dry_run: bool) -> None:
+    legacy = {"schema_version": {"$ne": 2}}
+    total = await forms_collection.count_documents(legacy)
+    log(f"{total} legacy form(s) to migrate{' (dry run)' if dry_run else ''}")
+    if dry_run:
+        return
+
+    migrated = skipped = 0
+    start = time.perf_counter()
+    cursor = forms_collection.find(legacy, {"revision": 1}).sort("_id", 1)
+    if limit:
+        cursor = cursor.limit(limit)
+    async for form in cursor:
+        if await migrate_form(forms_collection, questions_collection, options_collection, form, pack=pack_options):
+            migrated += 1
+        else:
+            skipped += 1
+        if (migrated + skipped) % 100 == 0:
+            log(f"  {migrated + skipped}/{total} processed")
+    log(f"Migrated {migrated} form(s), skipped {skipped} in {time.perf_counter() - start:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pack-options", action="store_true", help="pack options into their question documents")
+    parser.add_argument("--limit", type=int, default=0, help="migrate at most N forms")
+    parser.add_argument("--dry-run", action="store_true", help="only count legacy forms")
+    args = parser.parse_args()
+    asyncio.run(run(args.pack_options, args.limit, args.dry_run))
+
+
+if __name__ == "__main__":
+    main()
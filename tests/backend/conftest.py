@@ -1,10 +1,14 @@
 import os
 import sys
+import tempfile
 import pytest_asyncio
 import httpx
 
+# Keep metrics.txt out of the source tree; read when utils is imported
+os.environ["METRICS_DIR"] = tempfile.mkdtemp(prefix="mform-test-metrics-")
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend'))
 import main
+from services.write_coalescer import NullWriteBatch
 
 
 @pytest_asyncio.fixture
@@ -18,21 +22,36 @@ async def client():
 async def mock_db_services(monkeypatch):
     """Mock database services to avoid requiring MongoDB"""
     
-    # Mock database connection functions
-    async def mock_connect_to_mongo():
-        pass
-    
-    async def mock_close_mongo_connection():
-        pass
-    
-    monkeypatch.setattr(main, 'connect_to_mongo', mock_connect_to_mongo)
-    monkeypatch.setattr(main, 'close_mongo_connection', mock_close_mongo_connection)
-    
     # Mock database service
     class MockDatabaseService:
-        async def get_all_forms(self):
+        async def connect(self):
+            pass
+
+        async def close(self):
+            pass
+
+        async def get_all_forms(self, fields=None, revision=None):
             return []
+
+        async def get_forms_page(self, limit, cursor=None, fields=None, revision=None):
+            return {"forms": [], "next_cursor": None}
+
+        async def get_catalogue_revision(self):
+            return 0
+
+        async def get_form_changes(self, since):
+            return None
+
+        async def get_form_revision(self, form_id: str):
+            form = await self.get_form_by_id(form_id)
+            return None if form is None else form.get("revision", 0)
+
+        async def count_forms(self):
+            return 0
         
+        async def find_form_by_fingerprint(self, fingerprint=None, source_sha256=None):
+            return None
+
         async def get_form_by_id(self, form_id: str):
             return None  # Simulate form not found
         
@@ -42,6 +61,14 @@ async def mock_db_services(monkeypatch):
         async def get_options_by_form_id(self, form_id: str):
             return []
 
+        async def iter_questions_by_form_id(self, form_id: str):
+            for question in await self.get_questions_by_form_id(form_id):
+                yield question
+
+        async def iter_options_by_form_id(self, form_id: str):
+            for option in await self.get_options_by_form_id(form_id):
+                yield option
+
         async def save_form(self, form_data):
             return "507f1f77bcf86cd799439011"
 
@@ -51,6 +78,20 @@ async def mock_db_services(monkeypatch):
         async def save_options(self, options, form_id):
             return []
 
+        def write_batch(self):
+            return NullWriteBatch()
+
+        async def save_form_bundle(self, form_data, questions, options):
+            return {
+                "form_id": "507f1f77bcf86cd799439011",
+                "question_ids": [],
+                "option_ids": [],
+                "queued_time": 0.0,
+                "form_time": 0.0,
+                "questions_time": 0.0,
+                "options_time": 0.0,
+            }
+
         async def delete_form(self, form_id):
             return True
 
@@ -58,8 +99,12 @@ async def mock_db_services(monkeypatch):
             return {"forms": 1, "questions": 1, "options": 1}
 
         async def update_form(self, form_id, form_data, questions, options):
-            return True
+            changes = {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+            return {"questions": dict(changes), "options": dict(changes)}
     
-    monkeypatch.setattr(main, 'db_service', MockDatabaseService())
+    mock_service = MockDatabaseService()
+    monkeypatch.setattr(main, 'db_service', mock_service)
+    main.form_cache.clear()
+    main.search_index.clear()
     import services.xlsform_parser
-    monkeypatch.setattr(services.xlsform_parser, 'DatabaseService', MockDatabaseService)
+    monkeypatch.setattr(services.xlsform_parser, 'get_form_repository', lambda: mock_service)
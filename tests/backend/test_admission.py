@@ -0,0 +1,164 @@
+import asyncio
+import os
+import threading
+
+import httpx
+import pytest
+
+import main
+from services.admission import LANE_BULK, LANE_INTERACTIVE, AdmissionController, AdmissionRejected
+
+XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+async def _hold(controller, cost, log, name, release):
+    async with controller.admit(cost):
+        log.append(name)
+        await release.wait()
+
+
+@pytest.mark.asyncio
+async def test_admits_in_order_within_concurrency_and_memory_budget():
+    controller = AdmissionController(max_concurrent=2, memory_budget=100, max_queue=10)
+    log, release = [], asyncio.Event()
+    tasks = [asyncio.create_task(_hold(controller, cost, log, name, release)) for name, cost in (("a", 60), ("b", 60), ("c", 10))]
+    await asyncio.sleep(0)
+    # b does not fit next to a, and c may not overtake b
+    assert log == ["a"] and controller.queue_depth() == 2
+    assert controller.snapshot()["memory_in_use_bytes"] == 60
+
+    release.set()
+    await asyncio.gather(*tasks)
+    assert log == ["a", "b", "c"]
+    assert controller.snapshot()["active"] == 0 and controller.snapshot()["admitted"] == 3
+
+
+@pytest.mark.asyncio
+async def test_oversized_file_runs_alone_and_cancelled_waiters_leave_the_queue():
+    controller = AdmissionController(max_concurrent=4, memory_budget=100, max_queue=10)
+    log, release = [], asyncio.Event()
+    big = asyncio.create_task(_hold(controller, 500, log, "big", release))
+    await asyncio.sleep(0)
+    waiting = asyncio.create_task(_hold(controller, 10, log, "small", release))
+    await asyncio.sleep(0)
+    assert log == ["big"] and controller.queue_depth() == 1
+
+    waiting.cancel()
+    await asyncio.gather(waiting, return_exceptions=True)
+    assert controller.queue_depth() == 0
+    release.set()
+    await big
+    assert controller.snapshot()["memory_in_use_bytes"] == 0
+
+
+@pytest.mark.asyncio
+async def test_full_queue_is_rejected_with_retry_after():
+    controller = AdmissionController(max_concurrent=1, memory_budget=0, max_queue=1)
+    controller.check_queue(2)  # one starts, one waits
+    release = asyncio.Event()
+    tasks = [asyncio.create_task(_hold(controller, 0, [], i, release)) for i in range(2)]
+    await asyncio.sleep(0)
+    with pytest.raises(AdmissionRejected) as excinfo:
+        controller.check_queue(1)
+    assert excinfo.value.retry_after >= 1
+    release.set()
+    await asyncio.gather(*tasks)
+
+
+@pytest.mark.asyncio
+async def test_upload_answers_503_when_saturated(client: httpx.AsyncClient, monkeypatch):
+    controller = AdmissionController(max_concurrent=1, memory_budget=0, max_queue=0)
+    monkeypatch.setattr(main, 'admission', controller)
+    release = asyncio.Event()
+    busy = asyncio.create_task(_hold(controller, 0, [], "busy", release))
+    await asyncio.sleep(0)
+
+    test_file = os.path.join(os.path.dirname(__file__), '..', 'test_xlsforms_valid', 'valid_form_1.xlsx')
+    with open(test_file, 'rb') as f:
+        resp = await client.post('/api/upload', files=[('files', ('valid_form_1.xlsx', f.read(), XLSX))])
+    assert resp.status_code == 503
+    assert int(resp.headers['Retry-After']) >= 1
+    assert resp.json()['detail']['error_type'] == 'SERVER_BUSY'
+    release.set()
+    await busy
+
+
+@pytest.mark.asyncio
+async def test_bulk_work_leaves_reserved_slots_to_interactive_work():
+    controller = AdmissionController(max_concurrent=3, memory_budget=0, max_queue=10, interactive_reserved=1)
+    log, release = [], asyncio.Event()
+
+    async def hold(name, lane, client=""):
+        async with controller.admit(0, lane, client):
+            log.append(name)
+            await release.wait()
+
+    bulk = [asyncio.create_task(hold(f"bulk{i}", LANE_BULK, "importer")) for i in range(4)]
+    await asyncio.sleep(0)
+    # Two bulk files run; the third slot stays free for validation
+    assert log == ["bulk0", "bulk1"] and controller.queue_depth(LANE_BULK) == 2
+    interactive = asyncio.create_task(hold("validate", LANE_INTERACTIVE))
+    await asyncio.sleep(0)
+    assert log[-1] == "validate"
+
+    release.set()
+    await asyncio.gather(*bulk, interactive)
+    lanes = controller.snapshot()["lanes"]
+    assert lanes[LANE_BULK]["admitted"] == 4 and lanes[LANE_INTERACTIVE]["admitted"] == 1
+    assert lanes[LANE_BULK]["max_wait_seconds"] > lanes[LANE_INTERACTIVE]["max_wait_seconds"]
+
+
+@pytest.mark.asyncio
+async def test_bulk_clients_take_turns():
+    controller = AdmissionController(max_concurrent=2, memory_budget=0, max_queue=10, interactive_reserved=1)
+    log, gates = [], {}
+
+    async def hold(name, client):
+        async with controller.admit(0, LANE_BULK, client):
+            log.append(name)
+            gates[name] = asyncio.Event()
+            await gates[name].wait()
+
+    tasks = [asyncio.create_task(hold(f"a{i}", "a")) for i in range(3)]
+    await asyncio.sleep(0)
+    tasks.append(asyncio.create_task(hold("b0", "b")))
+    await asyncio.sleep(0)
+    assert log == ["a0"]
+
+    # b's single file goes next, ahead of a's remaining two
+    for expected in ("b0", "a1", "a2"):
+        gates[log[-1]].set()
+        for _ in range(5):
+            await asyncio.sleep(0)
+        assert log[-1] == expected
+    gates[log[-1]].set()
+    await asyncio.gather(*tasks)
+
+
+@pytest.mark.asyncio
+async def test_validate_finishes_while_a_bulk_parse_is_running(client: httpx.AsyncClient, monkeypatch):
+    from services.xlsform_data_parser import XLSFormDataParser
+
+    started, release = threading.Event(), threading.Event()
+    fingerprint = XLSFormDataParser._fingerprint_workbook
+
+    def slow_fingerprint(self, df_dict):
+        # Decoding a large workbook: blocks its bulk lane thread, not the loop
+        started.set()
+        release.wait(10)
+        return fingerprint(self, df_dict)
+
+    monkeypatch.setattr(XLSFormDataParser, '_fingerprint_workbook', slow_fingerprint)
+    test_file = os.path.join(os.path.dirname(__file__), '..', 'test_xlsforms_valid', 'valid_form_1.xlsx')
+    with open(test_file, 'rb') as f:
+        content = f.read()
+
+    upload = asyncio.create_task(client.post('/api/upload', files=[('files', ('valid_form_1.xlsx', content, XLSX))]))
+    try:
+        assert await asyncio.to_thread(started.wait, 10)
+        validate = await asyncio.wait_for(client.post('/api/validate', files={'file': ('valid_form_1.xlsx', content, XLSX)}), 10)
+        assert validate.status_code == 200 and validate.json()['valid'] is True
+        assert not upload.done()
+    finally:
+        release.set()
+    assert (await upload).status_code == 200
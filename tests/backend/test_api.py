@@ -49,6 +49,89 @@ async def test_get_all_forms_empty(client: httpx.AsyncClient):
     assert body['forms'] == []
 
 
+@pytest.mark.asyncio
+async def test_get_forms_page(client: httpx.AsyncClient, monkeypatch):
+    """Test paginated form listing passes limit/cursor/fields through and reports total"""
+    import main
+    calls = []
+
+    async def mock_get_forms_page(limit, cursor=None, fields=None, revision=None):
+        calls.append((limit, cursor, fields))
+        return {"forms": [{"id": "1", "title": "A"}], "next_cursor": "abc"}
+
+    async def mock_count_forms():
+        return 42
+
+    monkeypatch.setattr(main.db_service, 'get_forms_page', mock_get_forms_page)
+    monkeypatch.setattr(main.db_service, 'count_forms', mock_count_forms)
+    resp = await client.get('/api/forms', params={'limit': 1, 'cursor': 'xyz', 'fields': 'title, version'})
+    assert resp.status_code == 200
+    assert resp.json() == {"forms": [{"id": "1", "title": "A"}], "count": 1, "total": 42, "next_cursor": "abc"}
+    assert calls == [(1, 'xyz', ['title', 'version'])]
+
+
+@pytest.mark.asyncio
+async def test_get_forms_invalid_cursor(client: httpx.AsyncClient, monkeypatch):
+    """Test that a malformed cursor is rejected with 400"""
+    import main
+
+    async def mock_get_forms_page(limit, cursor=None, fields=None, revision=None):
+        raise ValueError("Invalid cursor")
+
+    monkeypatch.setattr(main.db_service, 'get_forms_page', mock_get_forms_page)
+    resp = await client.get('/api/forms', params={'cursor': 'not-a-cursor'})
+    assert resp.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_forms_list_conditional_get(client: httpx.AsyncClient, monkeypatch):
+    """Test GET /api/forms answers a matching If-None-Match with 304 and changes ETag on writes"""
+    import main
+    revision = 7
+
+    async def mock_get_catalogue_revision():
+        return revision
+
+    monkeypatch.setattr(main.db_service, 'get_catalogue_revision', mock_get_catalogue_revision)
+    first = await client.get('/api/forms')
+    etag = first.headers['etag']
+    assert first.status_code == 200
+
+    not_modified = await client.get('/api/forms', headers={'If-None-Match': etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers['etag'] == etag
+
+    paged = await client.get('/api/forms', params={'limit': 5}, headers={'If-None-Match': etag})
+    assert paged.status_code == 200
+
+    revision = 8
+    changed = await client.get('/api/forms', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['etag'] != etag
+
+
+@pytest.mark.asyncio
+async def test_form_detail_conditional_get_skips_loading(client: httpx.AsyncClient, monkeypatch):
+    """Test GET /api/forms/<id> answers 304 from the revision alone"""
+    import main
+    loads = []
+
+    async def mock_get_form_revision(fid):
+        return 3
+
+    async def mock_get_form_by_id(fid):
+        loads.append(fid)
+        return {"id": fid, "title": "T", "version": "1", "language": "en"}
+
+    monkeypatch.setattr(main.db_service, 'get_form_revision', mock_get_form_revision)
+    monkeypatch.setattr(main.db_service, 'get_form_by_id', mock_get_form_by_id)
+    form_id = '507f1f77bcf86cd799439011'
+    resp = await client.get(f'/api/forms/{form_id}', headers={'If-None-Match': f'W/"{form_id}-3"'})
+    assert resp.status_code == 304
+    assert resp.headers['etag'] == f'"{form_id}-3"'
+    assert loads == []
+
+
 @pytest.mark.asyncio
 async def test_get_form_by_id_not_found(client: httpx.AsyncClient):
     """Test getting a form by ID when form doesn't exist (mocked)"""
@@ -113,3 +196,14 @@ async def test_validate_with_valid_excel_file(client: httpx.AsyncClient):
         # Skip test if no test file available
         pytest.skip("Test Excel file not found")
 
+
+
+@pytest.mark.asyncio
+async def test_db_metrics(client: httpx.AsyncClient):
+    """Test pool/command instrumentation endpoint shape"""
+    resp = await client.get('/api/metrics/db')
+    assert resp.status_code == 200
+    body = resp.json()
+    assert {'settings', 'pool', 'commands'} <= set(body)
+    assert 'checkout_wait' in body['pool']
+    assert 'tlsCAFile' not in body['settings']
@@ -0,0 +1,76 @@
+import os
+import pytest
+import httpx
+import main
+import metrics
+
+from services.batch_pool import BatchPool
+
+XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+VALID_DIR = os.path.join(os.path.dirname(__file__), '..', 'test_xlsforms_valid')
+INVALID_DIR = os.path.join(os.path.dirname(__file__), '..', 'test_xlsforms_incorrect')
+
+
+def _files(*paths):
+    files = []
+    for path in paths:
+        if not os.path.exists(path):
+            pytest.skip("Test Excel file not found")
+        with open(path, 'rb') as f:
+            files.append(('files', (os.path.basename(path), f.read(), XLSX)))
+    return files
+
+
+@pytest.fixture(params=[0, 2], ids=['threads', 'processes'])
+def pool(request, monkeypatch):
+    batch_pool = BatchPool(workers=request.param)
+    monkeypatch.setattr(main, 'batch_pool', batch_pool)
+    yield batch_pool
+    batch_pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_validate_batch_reports_each_file_in_input_order(client: httpx.AsyncClient, pool):
+    invalid = sorted(os.listdir(INVALID_DIR))[0] if os.path.isdir(INVALID_DIR) else 'missing.xlsx'
+    files = _files(os.path.join(VALID_DIR, 'valid_form_1.xlsx'), os.path.join(INVALID_DIR, invalid))
+    files.append(('files', ('notes.txt', b'hello', 'text/plain')))
+
+    resp = await client.post('/api/validate/batch', files=files)
+    assert resp.status_code == 200
+    reports = resp.json()
+    assert [r['file_name'] for r in reports] == ['valid_form_1.xlsx', invalid, 'notes.txt']
+    assert reports[0]['valid'] is True and reports[0]['questions_count'] > 0
+    assert reports[1]['valid'] is False
+    assert reports[2]['valid'] is False and 'Invalid file format' in reports[2]['message']
+
+
+@pytest.mark.asyncio
+async def test_parse_batch_returns_temp_data_or_error_per_file(client: httpx.AsyncClient, pool):
+    files = _files(os.path.join(VALID_DIR, 'valid_form_1.xlsx'))
+    files.append(('files', ('empty.xlsx', b'', XLSX)))
+
+    resp = await client.post('/api/forms/parse/batch', files=files)
+    assert resp.status_code == 200
+    parsed, empty = resp.json()
+    single = (await client.post('/api/forms/parse', files={'file': files[0][1]})).json()
+    # Same tempData as the single-file endpoint (ids and timestamps are generated per call)
+    assert isinstance(parsed, list) and len(parsed) == len(single)
+    assert [q.get('formId') for q in parsed] == [q.get('formId') for q in single]
+    assert empty['error_type'] == 'EMPTY_FILE' and empty['file_name'] == 'empty.xlsx'
+
+
+@pytest.mark.asyncio
+async def test_batch_over_the_file_limit_is_rejected(client: httpx.AsyncClient, monkeypatch):
+    monkeypatch.setattr(main, 'BATCH_MAX_FILES', 1)
+    files = [('files', ('a.xlsx', b'x', XLSX)), ('files', ('b.xlsx', b'x', XLSX))]
+    resp = await client.post('/api/validate/batch', files=files)
+    assert resp.status_code == 413
+
+
+@pytest.mark.asyncio
+async def test_metrics_logged_in_pool_workers_are_recorded_here(client: httpx.AsyncClient, pool):
+    histogram = metrics.registry.histogram('validation_time_per_form')
+    before = histogram.count()
+    resp = await client.post('/api/validate/batch', files=_files(os.path.join(VALID_DIR, 'valid_form_1.xlsx')))
+    assert resp.status_code == 200 and resp.json()[0]['valid'] is True
+    assert histogram.count() == before + 1
@@ -0,0 +1,50 @@
+import json
+import os
+import subprocess
+import sys
+
+BACKEND = os.path.join(os.path.dirname(__file__), '..', '..', 'backend')
+
+# Runs in a fresh interpreter: this test session has long since imported pandas
+SCRIPT = """
+import asyncio, json, sys
+import httpx
+import main, import_timing
+
+async def read_forms():
+    await main.db_service.connect()
+    saved = await main.db_service.save_form_bundle(
+        {"title": "Survey", "language": "en", "version": "1"},
+        [{"order": 1, "title": "Name", "view_sequence": 1, "input_type": 1}],
+        [{"order": 1, "option_id": 1, "label": "A"}],
+    )
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://testserver") as c:
+        listed = await c.get("/api/forms")
+        detail = await c.get(f"/api/forms/{saved['form_id']}")
+        return [listed.status_code, detail.status_code], detail.json()[0]["language"][0]["question"][0]["answer_option"]
+
+statuses, answer_options = asyncio.run(read_forms())
+print(json.dumps({
+    "statuses": statuses,
+    "answer_options": len(answer_options),
+    "loaded": [m for m in ("pandas", "openpyxl", "services.xlsform_parser") if m in sys.modules],
+    "report": [row["module"] for row in import_timing.report(top=1000)],
+}))
+"""
+
+
+def test_read_endpoints_answer_without_loading_pandas(tmp_path):
+    env = dict(
+        os.environ,
+        STORAGE_BACKEND="sqlite",
+        SQLITE_PATH=str(tmp_path / "forms.sqlite3"),
+        METRICS_DIR=str(tmp_path),
+        IMPORT_TIME_REPORT="true",
+    )
+    out = subprocess.run([sys.executable, "-c", SCRIPT], cwd=BACKEND, env=env, capture_output=True, text=True, check=True)
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+
+    assert result["statuses"] == [200, 200]
+    assert result["answer_options"] == 1
+    assert result["loaded"] == []
+    assert "services.form_repository" in result["report"] and "fastapi" in result["report"]
@@ -0,0 +1,74 @@
+import os
+import zlib
+
+import httpx
+import pytest
+
+from services.compression import CompressionMiddleware, CompressionStats, choose_encoding, encode_etag, strip_etag_encoding
+
+XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+TEST_FILE = os.path.join(os.path.dirname(__file__), '..', 'test_xlsforms_valid', 'valid_form_1.xlsx')
+
+
+def test_encoding_follows_server_preference_within_what_the_client_accepts():
+    assert choose_encoding("gzip, deflate, br", ["br", "gzip"]) == "br"
+    assert choose_encoding("gzip;q=0.5, br;q=0", ["br", "gzip"]) == "gzip"
+    assert choose_encoding("*", ["zstd", "gzip"]) == "zstd"
+    assert choose_encoding("identity", ["gzip"]) is None
+
+
+def test_compressed_representations_get_their_own_etag():
+    assert encode_etag(b'"abc-3"', "gzip") == b'"abc-3-gzip"'
+    assert encode_etag(b'W/"abc-3"', "br") == b'W/"abc-3-br"'
+    assert strip_etag_encoding('W/"abc-3-zstd"') == '"abc-3"'
+    assert strip_etag_encoding('"abc-3"') == '"abc-3"'
+
+
+@pytest.mark.asyncio
+async def test_large_json_is_gzipped_and_small_responses_are_not(client: httpx.AsyncClient):
+    with open(TEST_FILE, 'rb') as f:
+        resp = await client.post('/api/forms/parse', files={'file': ('valid_form_1.xlsx', f.read(), XLSX)})
+    assert resp.status_code == 200
+    assert resp.headers['content-encoding'] == 'gzip'
+    assert 'Accept-Encoding' in resp.headers['vary']
+    assert int(resp.headers['content-length']) < len(resp.content) / 5
+    assert isinstance(resp.json(), list)
+
+    small = await client.get('/api/forms')
+    assert 'content-encoding' not in small.headers
+
+    plain = await client.get('/api/forms', headers={'Accept-Encoding': 'identity'})
+    assert 'content-encoding' not in plain.headers
+    assert plain.headers['vary'] == 'Accept-Encoding'
+
+    metrics = (await client.get('/api/metrics/compression')).json()
+    assert metrics['encodings']['gzip']['responses'] >= 1
+    assert metrics['skipped_below_min_size'] >= 1
+
+
+@pytest.mark.asyncio
+async def test_streamed_chunks_are_compressed_and_flushed_one_by_one():
+    async def streaming_app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/x-ndjson")]})
+        for line in (b'{"n": 1}\n', b'{"n": 2}\n'):
+            await send({"type": "http.response.body", "body": line, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    stats = CompressionStats()
+    app = CompressionMiddleware(streaming_app, minimum_size=1024, encodings=["gzip"], stats=stats)
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "headers": [(b"accept-encoding", b"gzip")]}
+    await app(scope, None, send)
+
+    headers = dict(sent[0]["headers"])
+    assert headers[b"content-encoding"] == b"gzip" and b"content-length" not in headers
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    # Each line can be decoded as soon as its chunk arrives
+    assert decoder.decompress(sent[1]["body"]) == b'{"n": 1}\n'
+    assert decoder.decompress(sent[2]["body"]) == b'{"n": 2}\n'
+    assert decoder.decompress(sent[3]["body"]) == b"" and decoder.eof
+    assert stats.snapshot()["encodings"]["gzip"]["streamed"] == 1
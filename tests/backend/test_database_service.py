@@ -0,0 +1,437 @@
+import math
+import os
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from bson import ObjectId
+from pymongo import DeleteMany, InsertOne, UpdateOne
+
+import services.database_service as database_service
+from services.database_service import DatabaseService, decode_forms_cursor, encode_forms_cursor
+from services.xlsform_template_builder import XLSFormTemplateBuilder
+
+
+def _matches(doc, query):
+    for key, cond in query.items():
+        if key == "$or":
+            if not any(_matches(doc, sub) for sub in cond):
+                return False
+            continue
+        value = doc.get(key)
+        if isinstance(cond, dict):
+            if "$lt" in cond and (value is None or not value < cond["$lt"]):
+                return False
+            if "$in" in cond and value not in cond["$in"]:
+                return False
+            if "$ne" in cond and value == cond["$ne"]:
+                return False
+        elif value != cond:
+            return False
+    return True
+
+
+def _evaluate(doc, expr):
+    """The aggregation expressions used by update pipelines here"""
+    if isinstance(expr, str) and expr.startswith("$"):
+        return doc.get(expr[1:])
+    if isinstance(expr, list):
+        return [_evaluate(doc, e) for e in expr]
+    if isinstance(expr, dict) and len(expr) == 1 and next(iter(expr)).startswith("$"):
+        op, args = next(iter(expr.items()))
+        args = _evaluate(doc, args)
+        if op == "$add":
+            return sum(args)
+        if op == "$ifNull":
+            return args[1] if args[0] is None else args[0]
+        if op == "$concatArrays":
+            return [item for arr in args for item in arr]
+        if op == "$slice":
+            return args[0][args[1]:]
+        raise NotImplementedError(op)
+    if isinstance(expr, dict):
+        return {k: _evaluate(doc, v) for k, v in expr.items()}
+    return expr
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self._docs = docs
+
+    def sort(self, keys, direction=None):
+        if isinstance(keys, str):
+            keys = [(keys, direction)]
+        for key, order in reversed(keys):
+            # None sorts lowest, as in MongoDB
+            self._docs.sort(key=lambda d: (d.get(key) is not None, d.get(key) or ""), reverse=order < 0)
+        return self
+
+    def limit(self, n):
+        self._docs = self._docs[:n]
+        return self
+
+    def batch_size(self, n):
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self._docs:
+            yield dict(doc)
+
+    async def to_list(self, length=None):
+        return [dict(d) for d in self._docs[:length]]
+
+
+class FakeCollection:
+    def __init__(self, docs=None):
+        self.docs = list(docs or [])
+        self.bulk_writes = []
+
+    def find(self, query=None, projection=None):
+        docs = [d for d in self.docs if _matches(d, query or {})]
+        if projection and not any(projection.values()):
+            docs = [{k: v for k, v in d.items() if k not in projection} for d in docs]
+        elif projection:
+            docs = [{k: v for k, v in d.items() if k == "_id" or k in projection} for d in docs]
+        return FakeCursor(docs)
+
+    async def find_one(self, query, projection=None, sort=None):
+        docs = await self.find(query, projection).to_list()
+        return docs[0] if docs else None
+
+    async def insert_many(self, docs, ordered=True):
+        self.insert_calls = getattr(self, "insert_calls", 0) + 1
+        self.docs.extend(dict(d) for d in docs)
+
+    async def delete_many(self, query):
+        self.docs = [d for d in self.docs if not _matches(d, query)]
+
+    async def estimated_document_count(self):
+        return len(self.docs)
+
+    async def update_one(self, query, update, upsert=False):
+        matched = [d for d in self.docs if _matches(d, query)][:1]
+        targets = matched
+        if not matched and upsert:
+            self.docs.append({k: v for k, v in query.items() if not isinstance(v, dict)})
+            targets = self.docs[-1:]
+        for doc in targets:
+            if isinstance(update, list):
+                for stage in update:
+                    doc.update({k: _evaluate(doc, v) for k, v in stage["$set"].items()})
+                continue
+            doc.update(update.get("$set", {}))
+            for key, step in update.get("$inc", {}).items():
+                doc[key] = doc.get(key, 0) + step
+        return SimpleNamespace(matched_count=len(matched))
+
+    async def bulk_write(self, ops, ordered=True):
+        self.bulk_writes.append(ops)
+
+
+def _form(title, created_at):
+    return {"_id": ObjectId(), "title": title, "language": "en", "version": "1", "created_at": created_at}
+
+
+@pytest.fixture
+def forms(monkeypatch):
+    docs = [_form(f"form-{i}", f"2026-01-0{i}T00:00:00") for i in range(1, 6)]
+    docs.append({"_id": ObjectId(), "title": "legacy"})
+    collection = FakeCollection(docs)
+    monkeypatch.setattr(database_service, "forms_collection", collection)
+    return collection
+
+
+def test_forms_cursor_round_trip():
+    oid = ObjectId()
+    assert decode_forms_cursor(encode_forms_cursor("2026-01-01T00:00:00", oid)) == ("2026-01-01T00:00:00", oid)
+    with pytest.raises(ValueError):
+        decode_forms_cursor("garbage")
+
+
+@pytest.mark.asyncio
+async def test_get_forms_page_walks_every_form_in_order(forms):
+    service = DatabaseService()
+    titles, cursor = [], None
+    while True:
+        page = await service.get_forms_page(limit=2, cursor=cursor)
+        titles.extend(f["title"] for f in page["forms"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert titles == ["form-5", "form-4", "form-3", "form-2", "form-1", "legacy"]
+    assert await service.count_forms() == 6
+
+
+@pytest.mark.asyncio
+async def test_get_forms_page_projects_fields(forms):
+    page = await DatabaseService().get_forms_page(limit=1, fields=["title"])
+    assert set(page["forms"][0]) == {"id", "title"}
+    with pytest.raises(ValueError):
+        await DatabaseService().get_forms_page(limit=1, fields=["$where"])
+
+
+@pytest.mark.asyncio
+async def test_streamed_questions_and_options_build_same_template(monkeypatch):
+    form_id = str(ObjectId())
+    questions = [{"_id": ObjectId(), "form_id": form_id, "order": o, "title": f"Q{o}", "view_sequence": o, "input_type": 2} for o in (3, 1, 2)]
+    # > 10,000 options used to be truncated by to_list(length=10000)
+    options = [{"_id": ObjectId(), "form_id": form_id, "order": 1 + i % 3, "option_id": i, "label": f"L{i}"} for i in range(10500)]
+    options.append({"_id": ObjectId(), "form_id": form_id, "order": 99, "option_id": 1, "label": "orphan"})
+    monkeypatch.setattr(database_service, "forms_collection", FakeCollection())
+    monkeypatch.setattr(database_service, "questions_collection", FakeCollection(questions))
+    monkeypatch.setattr(database_service, "options_collection", FakeCollection(options))
+    service = DatabaseService()
+    builder = XLSFormTemplateBuilder()
+    form = {"id": form_id, "title": "T", "language": "en", "version": "1"}
+
+    streamed = await builder._convert_db_stream_to_temp_data_format(
+        form, service.iter_questions_by_form_id(form_id), service.iter_options_by_form_id(form_id)
+    )
+    listed = builder._convert_db_to_temp_data_format(
+        form, await service.get_questions_by_form_id(form_id), await service.get_options_by_form_id(form_id)
+    )
+
+    def shape(doc):
+        return [(q["order"], [o["_id"] for o in q["answer_option"]]) for q in doc[0]["language"][0]["question"]]
+
+    assert [q["order"] for q in streamed[0]["question"]] == ["1", "2", "3"]
+    assert shape(streamed) == shape(listed)
+    assert sum(len(options) for _, options in shape(streamed)) == 10500
+
+
+@pytest.mark.asyncio
+async def test_questions_sharing_an_order_all_get_its_options(monkeypatch):
+    form_id = str(ObjectId())
+    questions = [{"_id": ObjectId(), "form_id": form_id, "order": o, "title": t, "view_sequence": i, "input_type": 2} for i, (o, t) in enumerate([(1, "A"), (1, "B"), (2, "C")])]
+    options = [{"_id": ObjectId(), "form_id": form_id, "order": o, "option_id": i, "label": f"L{o}.{i}"} for o in (1, 2) for i in (1, 2)]
+    monkeypatch.setattr(database_service, "forms_collection", FakeCollection())
+    monkeypatch.setattr(database_service, "questions_collection", FakeCollection(questions))
+    monkeypatch.setattr(database_service, "options_collection", FakeCollection(options))
+    service = DatabaseService()
+    builder = XLSFormTemplateBuilder()
+    form = {"id": form_id, "title": "T", "language": "en", "version": "1"}
+
+    streamed = await builder._convert_db_stream_to_temp_data_format(
+        form, service.iter_questions_by_form_id(form_id), service.iter_options_by_form_id(form_id)
+    )
+    listed = builder._convert_db_to_temp_data_format(
+        form, await service.get_questions_by_form_id(form_id), await service.get_options_by_form_id(form_id)
+    )
+
+    def labels(doc):
+        return [[o["name"] for o in q["answer_option"]] for q in doc[0]["language"][0]["question"]]
+
+    assert labels(streamed) == labels(listed) == [["L1.1", "L1.2"], ["L1.1", "L1.2"], ["L2.1", "L2.2"]]
+
+
+@pytest.mark.asyncio
+async def test_update_form_writes_only_changed_rows(monkeypatch):
+    form_id = str(ObjectId())
+    stored_questions = [{"_id": ObjectId(), "form_id": form_id, "order": o, "title": f"Q{o}", "view_sequence": o, "input_type": 1} for o in range(1, 101)]
+    stored_options = [{"_id": ObjectId(), "form_id": form_id, "order": 1, "option_id": i, "label": f"L{i}"} for i in (1, 2, 3)]
+    questions, options = FakeCollection(stored_questions), FakeCollection(stored_options)
+    monkeypatch.setattr(database_service, "forms_collection", FakeCollection([{"_id": ObjectId(form_id), "title": "T", "revision": 1}]))
+    monkeypatch.setattr(database_service, "counters_collection", FakeCollection())
+    monkeypatch.setattr(database_service, "questions_collection", questions)
+    monkeypatch.setattr(database_service, "options_collection", options)
+
+    new_questions = [{"order": o, "title": f"Q{o}", "view_sequence": o, "input_type": 1} for o in range(1, 101)]
+    new_questions[4]["title"] = "Renamed"
+    new_options = [{"order": 1, "option_id": 1, "label": "L1"}, {"order": 1, "option_id": 2, "label": "L2"}, {"order": 1, "option_id": 4, "label": "L4"}]
+
+    changes = await DatabaseService().update_form(form_id, {"title": "T"}, new_questions, new_options)
+
+    assert changes["questions"] == {"inserted": 0, "updated": 1, "deleted": 0, "unchanged": 99}
+    assert changes["options"] == {"inserted": 1, "updated": 0, "deleted": 1, "unchanged": 2}
+    assert [type(op) for op in questions.bulk_writes[0]] == [UpdateOne]
+    assert [type(op) for op in options.bulk_writes[0]] == [InsertOne, DeleteMany]
+
+
+@pytest.mark.asyncio
+async def test_update_of_missing_form_writes_nothing(monkeypatch):
+    forms, questions, options, counters = FakeCollection(), FakeCollection(), FakeCollection(), FakeCollection()
+    for name, collection in (("forms", forms), ("questions", questions), ("options", options), ("counters", counters)):
+        monkeypatch.setattr(database_service, f"{name}_collection", collection)
+
+    rows = [{"order": 1, "title": "Q1", "view_sequence": 1, "input_type": 1}]
+    options_rows = [{"order": 1, "option_id": 1, "label": "L1"}]
+    assert await DatabaseService().update_form(str(ObjectId()), {"title": "T"}, rows, options_rows) is None
+
+    assert forms.docs == questions.docs == options.docs == counters.docs == []
+
+
+def test_client_options_from_environment(monkeypatch):
+    import database
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    monkeypatch.setattr(database, "MONGO_MAX_POOL_SIZE", "25")
+    monkeypatch.setattr(database, "MONGO_WAIT_QUEUE_TIMEOUT_MS", "2000")
+    monkeypatch.setattr(database, "MONGO_COMPRESSORS", "bogus, zlib")
+    options = database.client_options()
+    assert options["maxPoolSize"] == 25
+    assert options["waitQueueTimeoutMS"] == 2000
+    assert options["compressors"] == "zlib"
+    assert "minPoolSize" not in options
+
+    client = AsyncIOMotorClient("mongodb://localhost:27017", connect=False, **options)
+    assert client.options.pool_options.max_pool_size == 25
+    client.close()
+
+
+@pytest.fixture
+def compact_store(monkeypatch):
+    """DatabaseService over in-memory collections, writing packed v2 documents"""
+    from services import form_schema
+    from services.write_coalescer import WriteCoalescer
+
+    forms, questions, options = FakeCollection(), FakeCollection(), FakeCollection()
+    for name, collection in (("forms", forms), ("questions", questions), ("options", options), ("counters", FakeCollection())):
+        monkeypatch.setattr(database_service, f"{name}_collection", collection)
+    monkeypatch.setattr(database_service, "_write_coalescer", WriteCoalescer(forms, questions, options, window_ms=0))
+    monkeypatch.setattr(form_schema, "MONGO_SCHEMA_VERSION", 2)
+    monkeypatch.setattr(form_schema, "MONGO_PACK_OPTIONS", True)
+    return forms, questions, options
+
+
+def _rows():
+    questions = [{"order": o, "title": f"Q{o}", "view_sequence": o, "input_type": 2, "created_at": "2026-01-01"} for o in (1, 2)]
+    options = [{"order": o, "option_id": i, "label": f"L{o}.{i}", "created_at": "2026-01-01"} for o in (1, 2) for i in (2, 1)]
+    return questions, options
+
+
+@pytest.mark.asyncio
+async def test_packed_v2_bundle_reads_back_like_v1(compact_store):
+    forms, questions, options = compact_store
+    service = DatabaseService()
+    saved = await service.save_form_bundle({"title": "T"}, *_rows())
+    form_id = saved["form_id"]
+
+    assert forms.docs[0]["schema_version"] == 2 and forms.docs[0]["options_packed"] is True
+    assert forms.docs[0]["input_type_counts"] == {"2": 2} and forms.docs[0]["options_count"] == 4
+    assert options.docs == []
+    assert all(q["form_id"] == ObjectId(form_id) and "created_at" not in q for q in questions.docs)
+    assert questions.docs[0]["options"] == [[2, "L1.2"], [1, "L1.1"]]
+    assert len(saved["option_ids"]) == 4
+
+    read = [(o["order"], o["option_id"], o["label"]) for o in await service.get_options_by_form_id(form_id)]
+    assert read == [(o["order"], o["option_id"], o["label"]) for o in _rows()[1]]
+    assert [q["title"] for q in await service.get_questions_by_form_id(form_id)] == ["Q1", "Q2"]
+    assert "schema_version" not in await service.get_form_by_id(form_id)
+
+
+@pytest.mark.asyncio
+async def test_packed_update_rewrites_only_changed_option_arrays(compact_store):
+    _, questions, _ = compact_store
+    service = DatabaseService()
+    form_id = (await service.save_form_bundle({"title": "T"}, *_rows()))["form_id"]
+    new_questions, new_options = _rows()
+    new_options[0]["label"] = "changed"
+
+    changes = await service.update_form(form_id, {"title": "T"}, new_questions, new_options)
+
+    assert changes["questions"]["unchanged"] == 2
+    assert changes["options"] == {"inserted": 0, "updated": 1, "deleted": 0, "unchanged": 3}
+    (ops,) = questions.bulk_writes
+    assert len(ops) == 1 and ops[0]._doc == {"$set": {"options": [[2, "changed"], [1, "L1.1"]]}}
+
+    # An orphan option is dropped from a packed form, so it is not counted either
+    new_options.append({"order": 9, "option_id": 1, "label": "orphan"})
+    await service.update_form(form_id, {"title": "T"}, new_questions[:1], new_options)
+    form = await service.get_form_by_id(form_id)
+    assert (form["questions_count"], form["options_count"], form["input_type_counts"]) == (1, 2, {"2": 1})
+
+
+@pytest.mark.asyncio
+async def test_migrate_form_switches_layout_atomically(compact_store):
+    from services.form_schema import migrate_form
+
+    forms, questions, options = compact_store
+    form_oid = ObjectId()
+    form_id = str(form_oid)
+    forms.docs.append({"_id": form_oid, "title": "legacy", "revision": 3})
+    legacy_questions, legacy_options = _rows()
+    questions.docs.extend({"_id": ObjectId(), "form_id": form_id, **q} for q in legacy_questions)
+    options.docs.extend({"_id": ObjectId(), "form_id": form_id, **o} for o in legacy_options)
+    service = DatabaseService()
+    before = [(o["order"], o["option_id"], o["label"]) for o in await service.get_options_by_form_id(form_id)]
+
+    stale = dict(forms.docs[0], revision=2)
+    assert await migrate_form(forms, questions, options, stale, pack=True) is False
+    assert len(questions.docs) == 2 and len(options.docs) == 4  # v2 copies discarded
+
+    catalogue_revision = await service.get_catalogue_revision()
+    assert await migrate_form(forms, questions, options, dict(forms.docs[0]), pack=True) is True
+    assert forms.docs[0]["revision"] == 4
+    assert await service.get_catalogue_revision() == catalogue_revision + 1
+    assert await service.get_form_changes(catalogue_revision) == [form_id]
+    assert (forms.docs[0]["questions_count"], forms.docs[0]["options_count"]) == (2, 4)
+    assert options.docs == [] and all(q["form_id"] == form_oid for q in questions.docs)
+    after = [(o["order"], o["option_id"], o["label"]) for o in await service.get_options_by_form_id(form_id)]
+    assert after == before
+
+
+@pytest.mark.asyncio
+async def test_update_form_rereads_layout_when_migrated_underneath(compact_store, monkeypatch):
+    from services.form_schema import migrate_form
+
+    forms, questions, options = compact_store
+    form_oid = ObjectId()
+    form_id = str(form_oid)
+    forms.docs.append({"_id": form_oid, "title": "legacy", "revision": 3})
+    legacy_questions, legacy_options = _rows()
+    questions.docs.extend({"_id": ObjectId(), "form_id": form_id, **q} for q in legacy_questions)
+    options.docs.extend({"_id": ObjectId(), "form_id": form_id, **o} for o in legacy_options)
+
+    # The migration switches the form after update_form has read the v1 layout
+    find_one = forms.find_one
+    migrated = []
+
+    async def find_then_migrate(query, projection=None, sort=None):
+        form = await find_one(query, projection, sort)
+        if not migrated:
+            migrated.append(await migrate_form(forms, questions, options, dict(forms.docs[0]), pack=False))
+        return form
+
+    monkeypatch.setattr(forms, "find_one", find_then_migrate)
+    new_questions, new_options = _rows()
+    new_questions[0]["title"] = "Renamed"
+    changes = await DatabaseService().update_form(form_id, {"title": "T"}, new_questions, new_options)
+
+    assert migrated == [True] and changes["questions"]["updated"] == 1
+    assert forms.docs[0]["schema_version"] == 2 and forms.docs[0]["revision"] == 5
+    (ops,) = questions.bulk_writes
+    (update,) = ops
+    assert update._filter["_id"] in {q["_id"] for q in questions.docs if q["form_id"] == form_oid}
+
+
+@pytest.mark.asyncio
+async def test_many_file_upload_is_written_in_waves(client: httpx.AsyncClient, monkeypatch):
+    import main
+    import services.xlsform_parser
+    from services.write_coalescer import WriteCoalescer
+
+    test_file_path = os.path.join(os.path.dirname(__file__), '..', 'test_xlsforms_valid', 'valid_form_1.xlsx')
+    if not os.path.exists(test_file_path):
+        pytest.skip("Test Excel file not found")
+    forms, questions, options = FakeCollection(), FakeCollection(), FakeCollection()
+    for name, collection in (("forms", forms), ("questions", questions), ("options", options), ("counters", FakeCollection())):
+        monkeypatch.setattr(database_service, f"{name}_collection", collection)
+    coalescer = WriteCoalescer(forms, questions, options, after_flush=database_service.bump_catalogue_revision)
+    monkeypatch.setattr(database_service, "_write_coalescer", coalescer)
+    service = DatabaseService()
+    monkeypatch.setattr(main, 'db_service', service)
+    monkeypatch.setattr(services.xlsform_parser, 'get_form_repository', lambda: service)
+
+    with open(test_file_path, 'rb') as f:
+        content = f.read()
+    files = [('files', (f'form_{i}.xlsx', content, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')) for i in range(12)]
+    resp = await client.post('/api/upload', params={'dedup': 'false'}, files=files)
+
+    assert resp.status_code == 200
+    assert all('id' in r for r in resp.json())
+    assert len(forms.docs) == 12
+    # One write per wave of UPLOAD_REQUEST_CONCURRENCY files, not one per file
+    assert forms.insert_calls <= math.ceil(12 / main.UPLOAD_REQUEST_CONCURRENCY)
@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import main
+
+
+class FakeRequest:
+    method = "POST"
+
+    def __init__(self, disconnect_after):
+        self.url = type("URL", (), {"path": "/api/upload"})()
+        self._polls = 0
+        self._disconnect_after = disconnect_after
+
+    async def is_disconnected(self):
+        self._polls += 1
+        return self._polls > self._disconnect_after
+
+
+@pytest.mark.asyncio
+async def test_work_is_cancelled_with_499_when_the_client_disconnects(monkeypatch):
+    monkeypatch.setattr(main, "DISCONNECT_POLL_SECONDS", 0.01)
+    cancelled = asyncio.Event()
+
+    async def work():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    with pytest.raises(HTTPException) as excinfo:
+        async with main._cancel_on_disconnect(FakeRequest(disconnect_after=2)):
+            await work()
+    assert excinfo.value.status_code == 499
+    assert cancelled.is_set()
+    assert asyncio.current_task().cancelling() == 0
+
+
+@pytest.mark.asyncio
+async def test_work_finishes_while_the_client_stays_connected(monkeypatch):
+    monkeypatch.setattr(main, "DISCONNECT_POLL_SECONDS", 0.01)
+    async with main._cancel_on_disconnect(FakeRequest(disconnect_after=1000)):
+        await asyncio.sleep(0.05)
+        result = "done"
+    assert result == "done"
+    await asyncio.sleep(0.03)  # the watcher is gone and cancels nothing later
@@ -122,3 +122,25 @@ async def test_update_form_valid(client: httpx.AsyncClient, monkeypatch):
     body = resp.json()
     assert 'form' in body
     assert body['form']['formId'] == 'valid_form_1'
+
+
+@pytest.mark.asyncio
+async def test_update_missing_form_is_404(client: httpx.AsyncClient, monkeypatch):
+    """Test PUT /api/forms/<id>/update for a form that does not exist"""
+    test_file_path = os.path.join(os.path.dirname(__file__), '..', 'test_xlsforms_valid', 'valid_form_1.xlsx')
+    if not os.path.exists(test_file_path):
+        pytest.skip("Test Excel file not found")
+
+    async def mock_update_form(*args):
+        return None
+    async def mock_get_form(form_id):
+        return None
+
+    monkeypatch.setattr(main.db_service, 'update_form', mock_update_form)
+    monkeypatch.setattr(main.db_service, 'get_form_by_id', mock_get_form)
+
+    with open(test_file_path, 'rb') as f:
+        files = {'file': ('valid_form_1.xlsx', f, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')}
+        resp = await client.put('/api/forms/507f1f77bcf86cd799439011/update', files=files)
+
+    assert resp.status_code == 404
@@ -0,0 +1,105 @@
+import asyncio
+import pytest
+import httpx
+import main
+
+from services.form_cache import FormCache, LRUCacheBackend, SQLiteCacheBackend
+
+
+def test_lru_backend_evicts_least_recently_used():
+    backend = LRUCacheBackend(max_entries=2)
+    backend.set("a", 1, ttl=60)
+    backend.set("b", 2, ttl=60)
+    backend.get("a")
+    backend.set("c", 3, ttl=60)
+    assert backend.get("a") == 1
+    assert backend.get("b") is None
+    backend.set("d", 4, ttl=-1)
+    assert backend.get("d") is None
+
+
+def test_sqlite_backend_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    writer, reader = SQLiteCacheBackend(path), SQLiteCacheBackend(path)
+    writer.set("forms:all:", [{"id": "1"}], ttl=60)
+    writer.set("form:1", {"title": "x"}, ttl=60)
+    assert reader.get("forms:all:") == [{"id": "1"}]
+    reader.delete_prefix("forms:")
+    assert writer.get("forms:all:") is None
+    assert writer.get("form:1") == {"title": "x"}
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_load():
+    cache = FormCache(LRUCacheBackend(), ttl=60)
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"value": calls}
+
+    results = await asyncio.gather(*(cache.get_or_load("form:1", loader) for _ in range(5)))
+    assert calls == 1
+    assert all(r == {"value": 1} for r in results)
+    assert await cache.get_or_load("form:1", loader) == {"value": 1}
+
+
+@pytest.mark.asyncio
+async def test_followers_take_over_when_the_loading_caller_is_cancelled():
+    cache = FormCache(LRUCacheBackend(), ttl=60)
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"value": calls}
+
+    leader = asyncio.create_task(cache.get_or_load("form:1", loader))
+    await asyncio.sleep(0)
+    followers = [asyncio.create_task(cache.get_or_load("form:1", loader)) for _ in range(3)]
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await asyncio.gather(*followers) == [{"value": 2}] * 3
+    assert calls == 2
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+
+
+@pytest.mark.asyncio
+async def test_load_racing_an_invalidation_is_not_cached():
+    cache = FormCache(LRUCacheBackend(), ttl=60)
+
+    async def loader():
+        cache.invalidate_form("1")
+        return {"stale": True}
+
+    await cache.get_or_load("form:1", loader)
+    assert await cache.get_or_load("form:1", lambda: asyncio.sleep(0, result={"fresh": True})) == {"fresh": True}
+
+
+@pytest.mark.asyncio
+async def test_form_detail_is_served_from_cache(client: httpx.AsyncClient, monkeypatch):
+    calls = []
+
+    async def mock_get_form_by_id(fid):
+        calls.append(fid)
+        return {"id": fid, "title": "Cached", "version": "1", "language": "en"}
+
+    async def mock_get_form_revision(fid):
+        return 1
+
+    monkeypatch.setattr(main.db_service, 'get_form_by_id', mock_get_form_by_id)
+    monkeypatch.setattr(main.db_service, 'get_form_revision', mock_get_form_revision)
+    first = await client.get('/api/forms/507f1f77bcf86cd799439011')
+    second = await client.get('/api/forms/507f1f77bcf86cd799439011')
+    assert first.status_code == second.status_code == 200
+    assert first.json() == second.json()
+    assert len(calls) == 1
+
+    main.form_cache.invalidate_form('507f1f77bcf86cd799439011')
+    await client.get('/api/forms/507f1f77bcf86cd799439011')
+    assert len(calls) == 2
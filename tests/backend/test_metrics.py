@@ -0,0 +1,104 @@
+import asyncio
+import os
+
+import httpx
+import pytest
+
+import metrics
+import utils
+from metrics import MetricsRegistry
+
+
+@pytest.fixture
+def metrics_file(tmp_path, monkeypatch):
+    path = tmp_path / "metrics.txt"
+    monkeypatch.setattr(utils, "METRICS_FILE", str(path))
+    monkeypatch.setattr(utils, "METRICS_PER_WORKER", False)
+    return path
+
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry()
+    registry.counter("uploads", "Files uploaded").inc(3)
+    registry.gauge("queue_depth").set(2, {"lane": "bulk"})
+    histogram = registry.histogram("parse_seconds", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value)
+
+    text = registry.render_prometheus()
+    assert "# TYPE mform_uploads counter\nmform_uploads_total 3\n" in text
+    assert 'mform_queue_depth{lane="bulk"} 2' in text
+    assert 'mform_parse_seconds_bucket{le="0.1"} 1' in text
+    assert 'mform_parse_seconds_bucket{le="1"} 2' in text
+    assert 'mform_parse_seconds_bucket{le="+Inf"} 3' in text
+    assert "mform_parse_seconds_sum 5.55" in text and "mform_parse_seconds_count 3" in text
+    with pytest.raises(ValueError):
+        registry.gauge("uploads")
+
+
+def test_log_metric_is_buffered_until_flushed(metrics_file):
+    metrics.registry.flush()  # lines left by earlier tests
+    metrics_file.unlink(missing_ok=True)
+    before = metrics.registry.counter("total_forms").value()
+    utils.log_metric("total_forms", 4)
+    utils.log_metric("form_process_time", 0.2)
+    assert metrics.registry.counter("total_forms").value() == before + 4
+    assert metrics.registry.histogram("form_process_time").count() >= 1
+    assert not metrics_file.exists()
+
+    metrics.registry.flush()
+    lines = metrics_file.read_text().splitlines()
+    assert any(line.endswith("] total_forms: 4") for line in lines)
+    assert any(line.endswith("] form_process_time: 0.2") for line in lines)
+
+
+@pytest.mark.asyncio
+async def test_background_task_flushes_batches(metrics_file):
+    registry = MetricsRegistry(flush_interval=0.01, flush_lines=1000)
+    registry.start()
+    try:
+        registry.record_line("a", 1)
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if metrics_file.exists():
+                break
+        assert metrics_file.read_text().endswith("] a: 1\n")
+        registry.record_line("b", 2)
+    finally:
+        await registry.stop()
+    assert metrics_file.read_text().endswith("] b: 2\n")
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint(client: httpx.AsyncClient):
+    resp = await client.get('/metrics')
+    assert resp.status_code == 200
+    assert resp.headers['content-type'].startswith('text/plain; version=0.0.4')
+    assert 'mform_admission_active_files{lane="interactive"} 0' in resp.text
+
+
+def test_scrape_merges_the_snapshots_of_every_worker(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "METRICS_DIR", str(tmp_path))
+    monkeypatch.setattr(utils, "METRICS_PER_WORKER", True)
+    other = MetricsRegistry()
+    other.counter("total_forms").inc(2)
+    other.gauge("warmup_time").set(1.5)
+    other.histogram("parse_seconds", buckets=(1.0,)).observe(0.5)
+    metrics._write_json(utils.worker_snapshot_file(4242), {**other.snapshot(), "pid": 4242})
+
+    registry = MetricsRegistry()
+    registry.counter("total_forms").inc(3)
+    registry.gauge("warmup_time").set(0.5)
+    registry.histogram("parse_seconds", buckets=(1.0,)).observe(2.0)
+    text = registry.render_prometheus()
+    assert "mform_total_forms_total 5" in text
+    assert 'mform_warmup_time{worker="4242"} 1.5' in text
+    assert f'mform_warmup_time{{worker="{os.getpid()}"}} 0.5' in text
+    assert 'mform_parse_seconds_bucket{le="1"} 1' in text and "mform_parse_seconds_count 2" in text
+
+    # An exited worker's counters stay in the totals; its gauges go
+    metrics.retire_worker_snapshot(4242)
+    text = registry.render_prometheus()
+    assert "mform_total_forms_total 5" in text
+    assert 'worker="4242"' not in text
+    assert not os.path.exists(utils.worker_snapshot_file(4242))
@@ -0,0 +1,111 @@
+import fcntl
+import hashlib
+import os
+import pytest
+import httpx
+import main
+
+from services.resumable_uploads import ResumableUploadManager
+
+VALID_FORM = os.path.join(os.path.dirname(__file__), '..', 'test_xlsforms_valid', 'valid_form_1.xlsx')
+
+
+@pytest.fixture
+def uploads(tmp_path, monkeypatch):
+    manager = ResumableUploadManager(str(tmp_path), max_file_size=main.MAX_FILE_SIZE, max_chunk_size=4096)
+    monkeypatch.setattr(main, 'resumable_uploads', manager)
+    return manager
+
+
+@pytest.mark.asyncio
+async def test_chunked_upload_resumes_and_is_parsed_on_finalize(client: httpx.AsyncClient, uploads, tmp_path):
+    if not os.path.exists(VALID_FORM):
+        pytest.skip("Test Excel file not found")
+    with open(VALID_FORM, 'rb') as f:
+        data = f.read()
+
+    resp = await client.post('/api/uploads', json={'filename': 'valid_form_1.xlsx', 'size': len(data), 'sha256': hashlib.sha256(data).hexdigest()})
+    assert resp.status_code == 201
+    upload_id = resp.json()['upload_id']
+    assert resp.headers['location'] == f'/api/uploads/{upload_id}'
+
+    # A corrupted chunk is discarded, and a chunk at the wrong offset names the right one
+    resp = await client.put(f'/api/uploads/{upload_id}?offset=0', content=data[:4096], headers={'X-Chunk-SHA256': '0' * 64})
+    assert resp.status_code == 400 and resp.json()['detail']['error_type'] == 'CHECKSUM_MISMATCH'
+    resp = await client.put(f'/api/uploads/{upload_id}?offset=10', content=data[10:100])
+    assert resp.status_code == 409 and resp.json()['detail']['offset'] == 0
+
+    resp = await client.post(f'/api/uploads/{upload_id}/finalize')
+    assert resp.status_code == 409 and resp.json()['detail']['error_type'] == 'UPLOAD_INCOMPLETE'
+
+    for start in range(0, len(data), 4096):
+        chunk = data[start:start + 4096]
+        offset = (await client.get(f'/api/uploads/{upload_id}')).json()['offset']
+        assert offset == start
+        resp = await client.put(f'/api/uploads/{upload_id}?offset={offset}', content=chunk, headers={'X-Chunk-SHA256': hashlib.sha256(chunk).hexdigest()})
+        assert resp.status_code == 200
+    assert resp.json()['complete'] is True
+
+    resp = await client.post(f'/api/uploads/{upload_id}/finalize')
+    assert resp.status_code == 200
+    assert resp.json()['id'] == '507f1f77bcf86cd799439011'
+    assert os.listdir(tmp_path) == []
+    assert (await client.get(f'/api/uploads/{upload_id}')).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_finalize_rejects_file_not_matching_announced_checksum(client: httpx.AsyncClient, uploads, tmp_path):
+    resp = await client.post('/api/uploads', json={'filename': 'form.xlsx', 'size': 3, 'sha256': hashlib.sha256(b'abc').hexdigest()})
+    upload_id = resp.json()['upload_id']
+    assert (await client.put(f'/api/uploads/{upload_id}?offset=0', content=b'abd')).status_code == 200
+
+    resp = await client.post(f'/api/uploads/{upload_id}/finalize')
+    assert resp.status_code == 400 and resp.json()['detail']['error_type'] == 'CHECKSUM_MISMATCH'
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.asyncio
+async def test_create_rejects_oversized_and_non_excel_files(client: httpx.AsyncClient, uploads):
+    resp = await client.post('/api/uploads', json={'filename': 'form.xlsx', 'size': main.MAX_FILE_SIZE + 1})
+    assert resp.status_code == 413
+    resp = await client.post('/api/uploads', json={'filename': 'form.csv', 'size': 10})
+    assert resp.status_code == 400 and resp.json()['detail']['error_type'] == 'INVALID_FILE_FORMAT'
+
+
+@pytest.mark.asyncio
+async def test_failed_processing_keeps_the_upload_for_another_finalize(client: httpx.AsyncClient, uploads, tmp_path, monkeypatch):
+    if not os.path.exists(VALID_FORM):
+        pytest.skip("Test Excel file not found")
+    with open(VALID_FORM, 'rb') as f:
+        data = f.read()
+    upload_id = (await client.post('/api/uploads', json={'filename': 'valid_form_1.xlsx', 'size': len(data)})).json()['upload_id']
+    for start in range(0, len(data), 4096):
+        assert (await client.put(f'/api/uploads/{upload_id}?offset={start}', content=data[start:start + 4096])).status_code == 200
+
+    process_upload = main._process_upload
+
+    async def failing(parser, file, dedup=None, progress=None):
+        return {"error": "Processing failed", "filename": file.filename, "error_type": "PROCESSING_ERROR"}
+
+    monkeypatch.setattr(main, '_process_upload', failing)
+    resp = await client.post(f'/api/uploads/{upload_id}/finalize')
+    assert resp.status_code == 500
+    status = (await client.get(f'/api/uploads/{upload_id}')).json()
+    assert status['offset'] == len(data) and status['complete'] is True
+
+    monkeypatch.setattr(main, '_process_upload', process_upload)
+    resp = await client.post(f'/api/uploads/{upload_id}/finalize')
+    assert resp.status_code == 200
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.asyncio
+async def test_chunk_is_refused_while_another_process_holds_the_upload(client: httpx.AsyncClient, uploads, tmp_path):
+    upload_id = (await client.post('/api/uploads', json={'filename': 'form.xlsx', 'size': 3})).json()['upload_id']
+    with open(tmp_path / f'{upload_id}.part', 'r+b') as other:
+        fcntl.flock(other.fileno(), fcntl.LOCK_EX)
+        resp = await client.put(f'/api/uploads/{upload_id}?offset=0', content=b'abc')
+        assert resp.status_code == 409 and resp.json()['detail']['error_type'] == 'UPLOAD_BUSY'
+        resp = await client.post(f'/api/uploads/{upload_id}/finalize')
+        assert resp.status_code == 409 and resp.json()['detail']['error_type'] == 'UPLOAD_BUSY'
+    assert (await client.put(f'/api/uploads/{upload_id}?offset=0', content=b'abc')).status_code == 200
@@ -0,0 +1,85 @@
+import pytest
+import httpx
+import pytest_asyncio
+
+import main
+from services.search_index import SearchIndex, tokenize
+from services.sqlite_repository import SQLiteFormRepository
+
+
+@pytest_asyncio.fixture
+async def repo(tmp_path, monkeypatch):
+    repository = SQLiteFormRepository(str(tmp_path / "forms.sqlite3"))
+    await repository.connect()
+    monkeypatch.setattr(main, 'db_service', repository)
+    yield repository
+    await repository.close()
+
+
+async def _save(repo, title, questions=(), options=()):
+    saved = await repo.save_form_bundle(
+        {"title": title, "language": "en", "created_at": "2026-01-01T00:00:00"},
+        [{"order": i + 1, "title": t, "view_sequence": i + 1, "input_type": 1} for i, t in enumerate(questions)],
+        [{"order": 1, "option_id": i + 1, "label": label} for i, label in enumerate(options)],
+    )
+    return saved["form_id"]
+
+
+def test_tokenize_keeps_offsets():
+    assert tokenize("Household Size?") == [("household", 0, 9), ("size", 10, 14)]
+
+
+@pytest.mark.asyncio
+async def test_search_ranks_title_matches_first_and_highlights(repo):
+    index = SearchIndex()
+    in_question = await _save(repo, "Baseline survey", questions=["Household income", "Household size"])
+    in_title = await _save(repo, "Household roster", questions=["Name"])
+    in_option = await _save(repo, "Water access", questions=["Source"], options=["Shared household tap"])
+    await _save(repo, "Unrelated", questions=["Age"])
+    await index.sync(repo)
+
+    result = index.search("househ")
+    assert [hit["form"]["id"] for hit in result["hits"]] == [in_title, in_question, in_option]
+    assert result["total"] == 3 and result["next_offset"] is None
+    top = result["hits"][0]
+    assert top["form"]["title"] == "Household roster" and top["form"]["questions_count"] == 1
+    assert top["highlights"] == [{"field": "title", "order": None, "text": "Household roster", "matches": [[0, 9]]}]
+    assert [h["order"] for h in result["hits"][1]["highlights"]] == [1, 2]
+
+    assert [hit["form"]["id"] for hit in index.search("household income")["hits"]] == [in_question]
+    assert index.search("income roster")["total"] == 0
+    page = index.search("household", limit=2)
+    assert page["count"] == 2 and page["next_offset"] == 2
+
+
+@pytest.mark.asyncio
+async def test_sync_follows_updates_and_deletes(repo, monkeypatch):
+    index = SearchIndex()
+    form_id = await _save(repo, "Clinic intake", questions=["Temperature"])
+    other = await _save(repo, "Clinic exit", questions=["Referral"])
+    await index.sync(repo)
+    assert index.search("temperature")["total"] == 1
+
+    await repo.update_form(form_id, {"title": "Clinic intake"}, [{"order": 1, "title": "Blood pressure", "view_sequence": 1, "input_type": 1}], [])
+    await repo.delete_form(other)
+
+    async def no_listing(*args, **kwargs):
+        raise AssertionError("an incremental sync re-listed the catalogue")
+
+    monkeypatch.setattr(repo, "get_forms_page", no_listing)
+    await index.sync(repo)
+    assert index.search("temperature")["total"] == 0
+    assert [hit["form"]["id"] for hit in index.search("clinic blood")["hits"]] == [form_id]
+    assert len(index) == 1
+
+
+@pytest.mark.asyncio
+async def test_search_endpoint(client: httpx.AsyncClient, repo):
+    form_id = await _save(repo, "Nutrition survey", questions=["Meals per day"])
+    resp = await client.get('/api/forms/search', params={"q": "meals"})
+    assert resp.status_code == 200
+    body = resp.json()
+    assert [hit["form"]["id"] for hit in body["hits"]] == [form_id]
+    assert body["hits"][0]["highlights"][0]["field"] == "question"
+
+    assert (await client.get('/api/forms/search', params={"q": ""})).status_code == 422
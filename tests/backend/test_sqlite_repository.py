@@ -0,0 +1,168 @@
+import asyncio
+import os
+import sqlite3
+import pytest
+import httpx
+import pytest_asyncio
+
+import main
+import services.xlsform_parser
+from services.form_repository import create_form_repository
+from services.sqlite_repository import SQLiteFormRepository
+
+
+@pytest_asyncio.fixture
+async def repo(tmp_path):
+    repository = SQLiteFormRepository(str(tmp_path / "forms.sqlite3"))
+    await repository.connect()
+    yield repository
+    await repository.close()
+
+
+def _bundle(title="Survey", created_at="2024-01-01T00:00:00"):
+    form = {"title": title, "language": "en", "version": "2", "created_at": created_at}
+    questions = [
+        {"order": 2, "title": "Age", "view_sequence": 2, "input_type": 3, "created_at": created_at},
+        {"order": 1, "title": "Name", "view_sequence": 1, "input_type": 1, "created_at": created_at},
+    ]
+    options = [
+        {"order": 1, "option_id": 2, "label": "B", "created_at": created_at},
+        {"order": 1, "option_id": 1, "label": "A", "created_at": created_at},
+    ]
+    return form, questions, options
+
+
+def test_factory_rejects_unknown_backend():
+    assert isinstance(create_form_repository("sqlite"), SQLiteFormRepository)
+    with pytest.raises(ValueError):
+        create_form_repository("cassandra")
+
+
+@pytest.mark.asyncio
+async def test_bundle_round_trip(repo):
+    saved = await repo.save_form_bundle(*_bundle())
+    assert len(saved["question_ids"]) == 2 and len(saved["option_ids"]) == 2
+    assert saved["queued_time"] >= 0
+
+    form = await repo.get_form_by_id(saved["form_id"])
+    assert form["title"] == "Survey" and form["version"] == "2" and form["revision"] == 1
+    assert (form["questions_count"], form["options_count"], form["input_type_counts"]) == (2, 2, {"3": 1, "1": 1})
+    questions = await repo.get_questions_by_form_id(saved["form_id"])
+    assert [q["title"] for q in questions] == ["Name", "Age"]
+    assert questions[0]["form_id"] == saved["form_id"]
+    options = [o async for o in repo.iter_options_by_form_id(saved["form_id"])]
+    assert [o["label"] for o in options] == ["B", "A"]  # insertion order within an order
+    assert await repo.get_catalogue_revision() == 1
+    assert await repo.get_form_by_id("507f1f77bcf86cd799439011") is None
+
+
+@pytest.mark.asyncio
+async def test_forms_page_walks_keyset(repo):
+    for day in range(1, 6):
+        await repo.save_form_bundle(*_bundle(f"Form {day}", f"2024-01-0{day}T00:00:00"))
+    await repo.save_form_bundle({"title": "Undated", "created_at": None}, [], [])
+
+    titles, cursor = [], None
+    while True:
+        page = await repo.get_forms_page(limit=2, cursor=cursor, fields=["title"])
+        titles.extend(f["title"] for f in page["forms"])
+        assert all(set(f) == {"id", "title"} for f in page["forms"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert titles == ["Form 5", "Form 4", "Form 3", "Form 2", "Form 1", "Undated"]
+    assert await repo.count_forms() == 6
+    with pytest.raises(ValueError):
+        await repo.get_forms_page(cursor="not-a-cursor")
+
+
+@pytest.mark.asyncio
+async def test_update_applies_row_diff(repo):
+    saved = await repo.save_form_bundle(*_bundle())
+    form_id = saved["form_id"]
+    questions = [
+        {"order": 1, "title": "Full name", "view_sequence": 1, "input_type": 1},
+        {"order": 3, "title": "City", "view_sequence": 3, "input_type": 1},
+    ]
+    options = [{"order": 1, "option_id": 1, "label": "A"}]
+
+    changes = await repo.update_form(form_id, {"title": "Renamed"}, questions, options)
+    assert changes["questions"] == {"inserted": 1, "updated": 1, "deleted": 1, "unchanged": 0}
+    assert changes["options"] == {"inserted": 0, "updated": 0, "deleted": 1, "unchanged": 1}
+    assert await repo.get_form_revision(form_id) == 2
+    form = await repo.get_form_by_id(form_id)
+    assert form["title"] == "Renamed"
+    assert (form["questions_count"], form["options_count"], form["input_type_counts"]) == (2, 1, {"1": 2})
+    assert [q["title"] for q in await repo.get_questions_by_form_id(form_id)] == ["Full name", "City"]
+
+    assert await repo.delete_form(form_id) is True
+    assert await repo.get_form_revision(form_id) is None
+    assert await repo.get_options_by_form_id(form_id) == []
+
+
+@pytest.mark.asyncio
+async def test_update_of_missing_form_writes_nothing(repo):
+    revision = await repo.get_catalogue_revision()
+    _, questions, options = _bundle()
+    assert await repo.update_form("404", {"title": "Ghost"}, questions, options) is None
+    assert await repo.get_questions_by_form_id("404") == []
+    assert await repo.get_options_by_form_id("404") == []
+    assert await repo.get_catalogue_revision() == revision
+
+
+@pytest.mark.asyncio
+async def test_counters_follow_incremental_writes(repo):
+    form, questions, options = _bundle()
+    form_id = await repo.save_form(form)
+    await repo.save_questions(questions, form_id)
+    await repo.save_options(options, form_id)
+    await repo.save_questions([{"order": 3, "title": "City", "view_sequence": 3, "input_type": 1}], form_id)
+
+    form = await repo.get_form_by_id(form_id)
+    assert (form["questions_count"], form["options_count"], form["input_type_counts"]) == (3, 2, {"3": 1, "1": 2})
+    page = await repo.get_forms_page(limit=1, fields=["questions_count", "options_count"])
+    assert page["forms"] == [{"id": form_id, "questions_count": 3, "options_count": 2}]
+
+
+@pytest.mark.asyncio
+async def test_reads_do_not_wait_for_a_write_in_progress(repo, tmp_path):
+    saved = await repo.save_form_bundle(*_bundle())
+    # Another process holds the write lock, so the next write waits on the write thread
+    blocker = sqlite3.connect(str(tmp_path / "forms.sqlite3"), isolation_level=None)
+    blocker.execute("BEGIN IMMEDIATE")
+    try:
+        write = asyncio.create_task(repo.save_form_bundle(*_bundle("Second")))
+        await asyncio.sleep(0.1)
+        assert not write.done()
+        form = await asyncio.wait_for(repo.get_form_by_id(saved["form_id"]), 1)
+        assert form["title"] == "Survey"
+        assert await asyncio.wait_for(repo.get_catalogue_revision(), 1) == 1
+    finally:
+        blocker.execute("ROLLBACK")
+        blocker.close()
+    await write
+    assert await repo.get_catalogue_revision() == 2
+
+
+@pytest.mark.asyncio
+async def test_upload_and_read_back_through_api(client: httpx.AsyncClient, repo, monkeypatch):
+    test_file_path = os.path.join(os.path.dirname(__file__), '..', 'test_xlsforms_valid', 'valid_form_1.xlsx')
+    if not os.path.exists(test_file_path):
+        pytest.skip("Test Excel file not found")
+    monkeypatch.setattr(main, 'db_service', repo)
+    monkeypatch.setattr(services.xlsform_parser, 'get_form_repository', lambda: repo)
+
+    with open(test_file_path, 'rb') as f:
+        files = [('files', ('valid_form_1.xlsx', f, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'))]
+        resp = await client.post('/api/upload', files=files)
+    assert resp.status_code == 200
+    form_id = resp.json()[0]['id']
+
+    listing = await client.get('/api/forms')
+    assert [f['id'] for f in listing.json()['forms']] == [form_id]
+    detail = await client.get(f'/api/forms/{form_id}')
+    assert detail.status_code == 200
+    assert detail.headers['etag'] == f'"{form_id}-1-gzip"'
+    assert 'Accept-Encoding' in detail.headers['vary']
+    again = await client.get(f'/api/forms/{form_id}', headers={'If-None-Match': detail.headers['etag']})
+    assert again.status_code == 304 and again.headers['etag'] == detail.headers['etag']
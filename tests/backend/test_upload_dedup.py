@@ -0,0 +1,100 @@
+import os
+import pandas as pd
+import pytest
+import httpx
+import pytest_asyncio
+from pymongo.errors import BulkWriteError
+
+import main
+import services.xlsform_parser
+from services.database_service import _is_fingerprint_conflict
+from services.form_repository import DuplicateFormError
+from services.sqlite_repository import SQLiteFormRepository
+from services.xlsform_data_parser import XLSFormDataParser
+
+XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+TEST_FILE = os.path.join(os.path.dirname(__file__), '..', 'test_xlsforms_valid', 'valid_form_1.xlsx')
+
+
+@pytest_asyncio.fixture
+async def repo(tmp_path, monkeypatch):
+    repository = SQLiteFormRepository(str(tmp_path / "forms.sqlite3"))
+    await repository.connect()
+    monkeypatch.setattr(main, 'db_service', repository)
+    monkeypatch.setattr(services.xlsform_parser, 'get_form_repository', lambda: repository)
+    yield repository
+    await repository.close()
+
+
+def _workbook(**overrides):
+    sheets = {
+        "Forms": pd.DataFrame({"Title": ["Survey"], "Language": ["en"]}),
+        "Questions Info": pd.DataFrame({"Order": [1, 2], "Title": ["Name", "Age"], "Input Type": [1, 4], "View Sequence": [1, 2]}),
+        "Answer Options": pd.DataFrame({"Order": [], "Id": [], "Label": []}),
+    }
+    sheets.update(overrides)
+    return sheets
+
+
+def test_fingerprint_ignores_formatting_differences():
+    parser = XLSFormDataParser()
+    resaved = _workbook(**{"Questions Info": pd.DataFrame({
+        "View Sequence": [1.0, 2.0], "Title": [" Name", "Age "], "Order": [1.0, 2.0], "Input Type": [1.0, 4.0], "Unnamed: 4": [None, None],
+    })})
+    assert parser._fingerprint_workbook(_workbook()) == parser._fingerprint_workbook(resaved)
+    edited = _workbook(**{"Forms": pd.DataFrame({"Title": ["Survey v2"], "Language": ["en"]})})
+    assert parser._fingerprint_workbook(_workbook()) != parser._fingerprint_workbook(edited)
+
+
+def test_fingerprint_conflict_is_matched_to_its_own_form():
+    error = BulkWriteError({"writeErrors": [{"index": 1, "code": 11000, "keyValue": {"fingerprint": "abc"}}]})
+    assert _is_fingerprint_conflict(error, "abc")
+    assert not _is_fingerprint_conflict(error, "other")
+    assert not _is_fingerprint_conflict(error, None)
+
+
+@pytest.mark.asyncio
+async def test_repository_rejects_second_form_with_same_fingerprint(repo):
+    await repo.save_form_bundle({"title": "A", "fingerprint": "f1"}, [], [])
+    with pytest.raises(DuplicateFormError):
+        await repo.save_form_bundle({"title": "B", "fingerprint": "f1"}, [], [])
+    assert (await repo.find_form_by_fingerprint(fingerprint="f1"))["title"] == "A"
+    assert await repo.count_forms() == 1
+
+
+async def _upload(client, dedup=None):
+    params = {} if dedup is None else {"dedup": str(dedup).lower()}
+    with open(TEST_FILE, 'rb') as f:
+        resp = await client.post('/api/upload', params=params, files=[('files', ('valid_form_1.xlsx', f.read(), XLSX))])
+    assert resp.status_code == 200
+    return resp.json()[0]
+
+
+@pytest.mark.asyncio
+async def test_repeat_upload_returns_existing_form_in_dedup_mode(client: httpx.AsyncClient, repo):
+    if not os.path.exists(TEST_FILE):
+        pytest.skip("Test Excel file not found")
+    first = await _upload(client)
+    copy = await _upload(client, dedup=False)
+    assert copy['id'] != first['id']
+    assert 'fingerprint' not in await repo.get_form_by_id(copy['id'])
+
+    again = await _upload(client, dedup=True)
+    assert again['id'] == first['id']
+    assert again['metadata']['deduplicated'] is True
+    assert await repo.count_forms() == 2
+
+
+@pytest.mark.asyncio
+async def test_deduplicated_upload_ends_every_stage_it_started(client: httpx.AsyncClient, repo):
+    if not os.path.exists(TEST_FILE):
+        pytest.skip("Test Excel file not found")
+    await _upload(client)
+    with open(TEST_FILE, 'rb') as f:
+        files = [('files', ('valid_form_1.xlsx', f.read(), XLSX))]
+    resp = await client.post('/api/upload', params={'dedup': 'true', 'progress_id': 'dedup-stages'}, files=files)
+    assert resp.json()[0]['metadata']['deduplicated'] is True
+
+    channel = main.upload_progress.channel('dedup-stages')
+    stages = [(data['stage'], data['status']) for _, event, data in channel.events_after(0) if event == 'stage']
+    assert stages == [('size_check', 'started'), ('size_check', 'completed'), ('decode', 'started'), ('decode', 'completed')]
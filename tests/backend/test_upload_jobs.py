@@ -0,0 +1,61 @@
+import asyncio
+import os
+import pytest
+import httpx
+import pytest_asyncio
+import main
+
+from services.upload_jobs import UploadJobManager
+
+XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+@pytest_asyncio.fixture
+async def jobs(tmp_path, monkeypatch):
+    manager = UploadJobManager(main._process_job_file, precheck=main._precheck_job_file, workers=2, spool_dir=str(tmp_path))
+    monkeypatch.setattr(main, 'upload_jobs', manager)
+    yield manager
+    await manager.stop()
+
+
+async def _wait_for_job(client, job_id):
+    for _ in range(200):
+        body = (await client.get(f'/api/jobs/{job_id}')).json()
+        if body['status'] == 'completed':
+            return body
+        await asyncio.sleep(0.01)
+    raise AssertionError("job did not complete")
+
+
+@pytest.mark.asyncio
+async def test_job_accepts_files_and_reports_per_file_status(client: httpx.AsyncClient, jobs, tmp_path):
+    test_file_path = os.path.join(os.path.dirname(__file__), '..', 'test_xlsforms_valid', 'valid_form_1.xlsx')
+    if not os.path.exists(test_file_path):
+        pytest.skip("Test Excel file not found")
+
+    with open(test_file_path, 'rb') as f:
+        files = [
+            ('files', ('valid_form_1.xlsx', f.read(), XLSX)),
+            ('files', ('empty.xlsx', b'', XLSX)),
+        ]
+    resp = await client.post('/api/jobs', files=files)
+    assert resp.status_code == 202
+    job_id = resp.json()['job_id']
+    assert resp.headers['location'] == f'/api/jobs/{job_id}'
+    assert resp.json()['total'] == 2
+
+    body = await _wait_for_job(client, job_id)
+    assert (body['succeeded'], body['failed']) == (1, 1)
+    done, empty = body['files']
+    assert done['status'] == 'completed' and done['form_id'] == '507f1f77bcf86cd799439011'
+    assert {'queue_time', 'form_process_time', 'write_queue_time', 'total_form_upload_time'} <= set(done['timings'])
+    assert empty['status'] == 'failed' and empty['error']['error_type'] == 'FILE_ERROR'
+    assert not os.path.exists(tmp_path / job_id)  # spooled files are cleaned up
+    # Another worker process sharing the spool dir answers polls too
+    assert UploadJobManager(main._process_job_file, spool_dir=str(tmp_path)).get_status(job_id) == body
+
+
+@pytest.mark.asyncio
+async def test_unknown_job_returns_404(client: httpx.AsyncClient, jobs):
+    resp = await client.get('/api/jobs/does-not-exist')
+    assert resp.status_code == 404
@@ -0,0 +1,98 @@
+import asyncio
+import json
+import os
+import pytest
+import httpx
+
+from services.upload_progress import UploadProgressBroker
+
+VALID_FORM = os.path.join(os.path.dirname(__file__), '..', 'test_xlsforms_valid', 'valid_form_1.xlsx')
+XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def _events(text):
+    events = []
+    for block in text.split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines() if ': ' in line and not line.startswith(':'))
+        if 'event' in fields:
+            events.append((int(fields['id']), fields['event'], json.loads(fields['data'])))
+    return events
+
+
+@pytest.mark.asyncio
+async def test_upload_publishes_stage_events_replayed_to_late_subscribers(client: httpx.AsyncClient):
+    if not os.path.exists(VALID_FORM):
+        pytest.skip("Test Excel file not found")
+    with open(VALID_FORM, 'rb') as f:
+        files = [('files', ('valid_form_1.xlsx', f.read(), XLSX)), ('files', ('empty.xlsx', b'', XLSX))]
+
+    resp = await client.post('/api/upload?progress_id=batch-0001', files=files)
+    assert resp.status_code == 200
+
+    resp = await client.get('/api/upload/progress/batch-0001')
+    assert resp.headers['content-type'].startswith('text/event-stream')
+    events = _events(resp.text)
+    assert events[0][1] == 'batch_started' and events[-1][1] == 'batch_completed'
+    assert events[-1][2]['succeeded'] == 1 and events[-1][2]['failed'] == 1
+
+    completed = [data['stage'] for _, event, data in events if event == 'stage' and data['index'] == 0 and data['status'] == 'completed']
+    assert completed == ['size_check', 'decode', 'validate', 'save_form', 'save_questions', 'save_options']
+    for index in (0, 1):
+        statuses = [(data['stage'], data['status']) for _, event, data in events if event == 'stage' and data['index'] == index]
+        assert {s for s, status in statuses if status == 'started'} == {s for s, status in statuses if status != 'started'}
+    assert ('size_check', 'failed') in [(data['stage'], data['status']) for _, event, data in events if event == 'stage' and data['index'] == 1]
+    done = {data['index']: data for _, event, data in events if event == 'file_completed'}
+    assert done[0]['status'] == 'completed' and 'total_form_upload_time' in done[0]['timings']
+    assert done[1]['status'] == 'failed' and done[1]['error_type'] == 'FILE_ERROR'
+
+    # Reconnecting with Last-Event-ID only replays what came after it
+    resp = await client.get('/api/upload/progress/batch-0001', headers={'Last-Event-ID': str(events[-2][0])})
+    assert [event for _, event, _ in _events(resp.text)] == ['batch_completed']
+
+
+@pytest.mark.asyncio
+async def test_subscriber_connected_before_the_batch_receives_events_live():
+    broker = UploadProgressBroker()
+    received = []
+
+    async def subscribe():
+        async for chunk in broker.stream('early-subscriber'):
+            received.extend(_events(chunk))
+
+    task = asyncio.create_task(subscribe())
+    await asyncio.sleep(0)
+    channel = broker.start('early-subscriber')
+    channel.stage(0, 'a.xlsx', 'decode', 'completed', 0.5)
+    for _ in range(100):
+        if received:
+            break
+        await asyncio.sleep(0.01)
+    assert received and received[0][2]['time'] == 0.5
+    channel.finish({'total': 1})
+    await asyncio.wait_for(task, 1)
+    assert [event for _, event, _ in received] == ['stage', 'batch_completed']
+
+
+@pytest.mark.asyncio
+async def test_stream_follows_a_batch_run_by_another_worker(tmp_path):
+    path = str(tmp_path / "progress.sqlite3")
+    running, answering = UploadProgressBroker(path=path), UploadProgressBroker(path=path)
+    received = []
+
+    async def subscribe():
+        async for chunk in answering.stream('other-worker'):
+            received.extend(_events(chunk))
+
+    task = asyncio.create_task(subscribe())
+    await asyncio.sleep(0)
+    channel = running.start('other-worker')
+    channel.stage(0, 'a.xlsx', 'decode', 'completed', 0.5)
+    channel.finish({'total': 1})
+    await asyncio.wait_for(task, 2)
+    assert [event for _, event, _ in received] == ['stage', 'batch_completed']
+    assert received[0][2]['time'] == 0.5
+
+
+@pytest.mark.asyncio
+async def test_invalid_progress_id_is_rejected(client: httpx.AsyncClient):
+    assert (await client.get('/api/upload/progress/x')).status_code == 400
@@ -0,0 +1,58 @@
+import httpx
+import pytest
+
+import main
+from services.sqlite_repository import SQLiteFormRepository
+from services.warmup import FAILED, OK, Warmup
+
+
+@pytest.mark.asyncio
+async def test_warmup_runs_the_bundled_workbook_and_reports_ready(client: httpx.AsyncClient, monkeypatch, tmp_path):
+    state = Warmup(enabled=True)
+    monkeypatch.setattr(main, 'warmup', state)
+    assert (await client.get('/api/ready')).status_code == 503
+
+    repository = SQLiteFormRepository(str(tmp_path / "forms.sqlite3"))
+    await repository.connect()
+    try:
+        await state.connected(repository, main._parser)
+    finally:
+        await repository.close()
+
+    resp = await client.get('/api/ready')
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["ready"] is True
+    assert body["steps"] == {"database": OK, "parser": OK, "pool": OK, "search": OK}
+    assert body["warmup_time"] is not None
+
+
+@pytest.mark.asyncio
+async def test_failed_warmup_step_does_not_block_readiness(tmp_path):
+    state = Warmup(enabled=True, workbook=str(tmp_path / "missing.xlsx"))
+    repository = SQLiteFormRepository(str(tmp_path / "forms.sqlite3"))
+    await repository.connect()
+    try:
+        await state.connected(repository, main._parser)
+    finally:
+        await repository.close()
+    assert state.ready and state.steps["parser"] == FAILED and state.steps["pool"] == OK
+
+
+@pytest.mark.asyncio
+async def test_readiness_probe_retries_a_failed_startup_connection(client: httpx.AsyncClient, monkeypatch):
+    state = Warmup(enabled=True)
+    state.connect_failed()
+    monkeypatch.setattr(main, 'warmup', state)
+
+    attempts = []
+
+    async def connect():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError("unreachable")
+
+    monkeypatch.setattr(main.db_service, 'connect', connect)
+    assert (await client.get('/api/ready')).status_code == 503
+    assert (await client.get('/api/ready')).status_code == 200
+    assert len(attempts) == 2
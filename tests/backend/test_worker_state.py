@@ -0,0 +1,67 @@
+import sqlite3
+import time
+
+from limits import parse, strategies
+from limits.storage import storage_from_string
+
+import utils
+from services.rate_limit_storage import SQLiteRateLimitStorage
+
+
+def test_sqlite_rate_limits_are_shared_between_storages(tmp_path):
+    uri = f"sqlite:///{tmp_path / 'limits.sqlite3'}"
+    first, second = storage_from_string(uri), storage_from_string(uri)
+    assert isinstance(first, SQLiteRateLimitStorage)
+
+    limit = parse("2/minute")
+    assert strategies.FixedWindowRateLimiter(first).hit(limit, "client")
+    assert strategies.FixedWindowRateLimiter(second).hit(limit, "client")
+    # The third hit is refused no matter which worker receives it
+    assert not strategies.FixedWindowRateLimiter(first).hit(limit, "client")
+    assert strategies.FixedWindowRateLimiter(second).hit(limit, "other-client")
+    first.clear(limit.key_for("client"))
+    assert second.get(limit.key_for("client")) == 0
+
+
+def test_worker_metrics_are_merged_in_time_order(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "METRICS_DIR", str(tmp_path))
+    monkeypatch.setattr(utils, "METRICS_FILE", str(tmp_path / "metrics.txt"))
+    (tmp_path / "metrics.101.txt").write_text("[2026-01-01 10:00:02] b: 2\n")
+    (tmp_path / "metrics.102.txt").write_text("[2026-01-01 10:00:01] a: 1\n[2026-01-01 10:00:03] c: 3\n")
+
+    assert utils.merge_worker_metrics(101) == 1
+    assert utils.merge_worker_metrics() == 2
+    assert (tmp_path / "metrics.txt").read_text().splitlines() == [
+        "[2026-01-01 10:00:02] b: 2",
+        "[2026-01-01 10:00:01] a: 1",
+        "[2026-01-01 10:00:03] c: 3",
+    ]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["metrics.txt"]
+
+
+def test_sqlite_rate_limit_hit_does_not_wait_for_a_locked_file(tmp_path, monkeypatch):
+    import services.rate_limit_storage as rate_limit_storage
+
+    monkeypatch.setattr(rate_limit_storage, "RATELIMIT_SYNC_INTERVAL_SECONDS", 0.01)
+    path = tmp_path / "limits.sqlite3"
+    storage = SQLiteRateLimitStorage(f"sqlite:///{path}")
+    limit = parse("2/minute")
+    limiter = strategies.FixedWindowRateLimiter(storage)
+
+    # Another worker holds the write lock
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    start = time.monotonic()
+    assert limiter.hit(limit, "client") and limiter.hit(limit, "client")
+    assert not limiter.hit(limit, "client")
+    assert time.monotonic() - start < 1
+    other.execute("COMMIT")
+
+    # The writer thread then records the hits for the other workers
+    for _ in range(200):
+        row = other.execute("SELECT value FROM limits WHERE key = ?", (limit.key_for("client"),)).fetchone()
+        if row and row[0] == 3:
+            break
+        time.sleep(0.01)
+    assert row[0] == 3
+    assert storage.get(limit.key_for("client")) == 3
@@ -0,0 +1,172 @@
+import asyncio
+import pytest
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from services.write_coalescer import WriteCoalescer
+
+
+class FakeCollection:
+    """Records insert_many/delete_many calls; fails inserts for docs matching `fail_when`"""
+
+    def __init__(self, fail_when=None):
+        self.insert_calls = []
+        self.delete_calls = []
+        self.fail_when = fail_when
+
+    async def insert_many(self, docs, ordered=True):
+        self.insert_calls.append(list(docs))
+        if self.fail_when:
+            errors = [{"index": i, "code": 11000, "errmsg": "failed"} for i, d in enumerate(docs) if self.fail_when(d)]
+            if errors:
+                raise BulkWriteError({"writeErrors": errors, "nInserted": len(docs) - len(errors)})
+
+    async def delete_many(self, query):
+        self.delete_calls.append(query)
+
+
+def _bundle(label):
+    form_oid = ObjectId()
+    form = {"_id": form_oid, "title": label}
+    questions = [{"_id": ObjectId(), "form_id": str(form_oid), "order": 1, "title": label}]
+    options = [{"_id": ObjectId(), "form_id": str(form_oid), "order": 1, "label": label}]
+    return form, questions, options
+
+
+@pytest.mark.asyncio
+async def test_batch_is_flushed_with_one_write_per_collection():
+    forms, questions, options = FakeCollection(), FakeCollection(), FakeCollection()
+    coalescer = WriteCoalescer(forms, questions, options)
+
+    with coalescer.batch() as batch:
+        async def submit(label):
+            with batch.slot():
+                await asyncio.sleep(0)
+                return await coalescer.submit(*_bundle(label))
+
+        results = await asyncio.gather(*(submit(f"form-{i}") for i in range(3)))
+
+    assert len(results) == 3
+    assert [len(call) for call in forms.insert_calls] == [3]
+    assert [len(call) for call in questions.insert_calls] == [3]
+    assert [len(call) for call in options.insert_calls] == [3]
+    assert all("options_time" in r for r in results)
+
+
+@pytest.mark.asyncio
+async def test_failed_file_is_isolated_and_rolled_back():
+    forms, questions = FakeCollection(), FakeCollection()
+    options = FakeCollection(fail_when=lambda d: d["label"] == "bad")
+    coalescer = WriteCoalescer(forms, questions, options)
+    bad_form, bad_questions, bad_options = _bundle("bad")
+
+    with coalescer.batch() as batch:
+        async def submit(bundle):
+            with batch.slot():
+                return await coalescer.submit(*bundle)
+
+        results = await asyncio.gather(
+            submit(_bundle("good")), submit((bad_form, bad_questions, bad_options)), return_exceptions=True
+        )
+
+    assert isinstance(results[0], dict)
+    assert isinstance(results[1], BulkWriteError)
+    assert forms.delete_calls == [{"_id": {"$in": [bad_form["_id"]]}}]
+    assert questions.delete_calls == [{"form_id": {"$in": [str(bad_form["_id"])]}}]
+
+
+@pytest.mark.asyncio
+async def test_writes_outside_a_batch_flush_after_the_window():
+    forms, questions, options = FakeCollection(), FakeCollection(), FakeCollection()
+    coalescer = WriteCoalescer(forms, questions, options, window_ms=5)
+
+    results = await asyncio.gather(coalescer.submit(*_bundle("a")), coalescer.submit(*_bundle("b")))
+
+    assert len(results) == 2
+    assert [len(call) for call in forms.insert_calls] == [2]
+
+
+@pytest.mark.asyncio
+async def test_a_batch_still_parsing_holds_back_only_its_own_writes():
+    forms, questions, options = FakeCollection(), FakeCollection(), FakeCollection()
+    coalescer = WriteCoalescer(forms, questions, options, window_ms=5, max_wait_ms=5000)
+
+    with coalescer.batch() as slow, coalescer.batch() as quick:
+        async def submit(batch, label, parsed=None):
+            with batch.slot():
+                if parsed is not None:
+                    await parsed.wait()
+                return await coalescer.submit(*_bundle(label))
+
+        parsed = asyncio.Event()
+        parsing = asyncio.create_task(submit(slow, "slow-2", parsed))
+        held = asyncio.create_task(submit(slow, "slow-1"))
+        await asyncio.sleep(0)
+        await asyncio.wait_for(asyncio.gather(submit(quick, "quick"), coalescer.submit(*_bundle("loose"))), 1)
+        assert not held.done()
+        assert sorted(doc["title"] for call in forms.insert_calls for doc in call) == ["loose", "quick"]
+
+        parsed.set()
+        await asyncio.gather(held, parsing)
+
+    assert [sorted(doc["title"] for doc in call) for call in forms.insert_calls][-1] == ["slow-1", "slow-2"]
+
+
+@pytest.mark.asyncio
+async def test_files_are_failed_and_undone_when_the_revision_bump_fails():
+    forms, questions, options = FakeCollection(), FakeCollection(), FakeCollection()
+
+    async def bump(form_ids):
+        raise RuntimeError("counter unavailable")
+
+    coalescer = WriteCoalescer(forms, questions, options, window_ms=0, after_flush=bump)
+    form, form_questions, form_options = _bundle("a")
+
+    with pytest.raises(RuntimeError):
+        await coalescer.submit(form, form_questions, form_options)
+    assert forms.delete_calls == [{"_id": {"$in": [form["_id"]]}}]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_submitter_is_dropped_before_the_flush():
+    forms, questions, options = FakeCollection(), FakeCollection(), FakeCollection()
+    coalescer = WriteCoalescer(forms, questions, options, window_ms=5)
+
+    cancelled = asyncio.create_task(coalescer.submit(*_bundle("gone")))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+    result = await coalescer.submit(*_bundle("kept"))
+
+    assert result is not None
+    assert [[d["title"] for d in call] for call in forms.insert_calls] == [["kept"]]
+    assert forms.delete_calls == []
+
+
+class SlowCollection(FakeCollection):
+    def __init__(self):
+        super().__init__()
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def insert_many(self, docs, ordered=True):
+        self.started.set()
+        await self.release.wait()
+        await super().insert_many(docs, ordered)
+
+
+@pytest.mark.asyncio
+async def test_submitter_cancelled_mid_flush_is_rolled_back():
+    forms, questions, options = FakeCollection(), FakeCollection(), SlowCollection()
+    coalescer = WriteCoalescer(forms, questions, options, window_ms=1)
+    gone_form, _, _ = gone = _bundle("gone")
+
+    cancelled = asyncio.create_task(coalescer.submit(*gone))
+    kept = asyncio.create_task(coalescer.submit(*_bundle("kept")))
+    await options.started.wait()
+    cancelled.cancel()
+    options.release.set()
+
+    assert await kept is not None
+    with pytest.raises(asyncio.CancelledError):
+        await cancelled
+    assert forms.delete_calls == [{"_id": {"$in": [gone_form["_id"]]}}]
@@ -0,0 +1,52 @@
+import io
+import json
+import os
+import zipfile
+import pytest
+import httpx
+
+VALID_FORM = os.path.join(os.path.dirname(__file__), '..', 'test_xlsforms_valid', 'valid_form_1.xlsx')
+
+
+def _archive(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for name, data in members:
+            zf.writestr(name, data)
+    return buffer.getvalue()
+
+
+@pytest.mark.asyncio
+async def test_zip_upload_streams_one_line_per_workbook_and_a_summary(client: httpx.AsyncClient):
+    if not os.path.exists(VALID_FORM):
+        pytest.skip("Test Excel file not found")
+    with open(VALID_FORM, 'rb') as f:
+        workbook = f.read()
+    archive = _archive([
+        ('forms/a.xlsx', workbook),
+        ('forms/b.xlsx', workbook),
+        ('forms/notes.txt', b'not a workbook'),
+        ('__MACOSX/forms/._a.xlsx', b'resource fork'),
+    ])
+
+    resp = await client.post('/api/upload/zip', files={'file': ('batch.zip', archive, 'application/zip')})
+    assert resp.status_code == 200
+    assert resp.headers['content-type'].startswith('application/x-ndjson')
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+
+    files, summary = lines[:-1], lines[-1]
+    assert sorted(line['index'] for line in files) == [0, 1, 2]
+    by_name = {line['filename']: line for line in files}
+    assert by_name['a.xlsx']['status'] == 'completed' and by_name['a.xlsx']['form_id']
+    assert 'total_form_upload_time' in by_name['b.xlsx']['timings']
+    assert by_name['notes.txt']['status'] == 'failed'
+    assert by_name['notes.txt']['error']['error_type'] == 'INVALID_FILE_FORMAT'
+    assert summary['type'] == 'summary'
+    assert (summary['total'], summary['succeeded'], summary['failed']) == (3, 2, 1)
+
+
+@pytest.mark.asyncio
+async def test_zip_upload_rejects_non_archive(client: httpx.AsyncClient):
+    resp = await client.post('/api/upload/zip', files={'file': ('batch.zip', b'plain bytes', 'application/zip')})
+    assert resp.status_code == 400
+    assert resp.json()['detail']['error_type'] == 'INVALID_ARCHIVE'